@@ -0,0 +1,347 @@
+"""
+Admission Control untuk Inference API
+Adaptive concurrency limit, bounded wait queue and per-client rate limits
+in front of /predict
+
+  - at most ``limit`` requests run at once; the limit adapts to the
+    observed serving latency (AIMD): +1 per ``limit`` fast calls while the
+    limit is in use, x``backoff`` when a serving call failed or when the
+    median latency of an interval (``interval_rtts`` round trips, at
+    least ``min_interval_samples`` calls) is over the latency target;
+    at most one decrease per interval, so single slow calls (jitter)
+    never lower the limit
+  - the latency target is ADMISSION_LATENCY_TARGET_MS, or ``tolerance``
+    times the lowest interval median of the last ``baseline_seconds``
+    (the no-load round trip) when that is 0
+  - requests over the limit wait in a FIFO queue of ``max_queue`` entries
+    for at most ``queue_timeout``; a full queue or an expired wait is
+    answered with 429 and Retry-After right away
+  - optional per-client token buckets (X-Client-Id header, else the
+    remote address)
+
+Limits are per process: with prefork workers, spam_detector_admission_limit
+is the sum over the workers.
+"""
+
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+
+from prometheus_client import Counter, Gauge, Histogram
+
+
+# ==================================================================
+# ADMISSION METRICS
+# ==================================================================
+
+admission_limit_gauge = Gauge(
+    'spam_detector_admission_limit',
+    'Current adaptive concurrency limit for /predict',
+    multiprocess_mode='livesum'
+)
+
+admission_queue_gauge = Gauge(
+    'spam_detector_admission_queue_depth',
+    'Requests waiting for an admission slot',
+    multiprocess_mode='livesum'
+)
+
+admission_rejections_counter = Counter(
+    'spam_detector_admission_rejections_total',
+    'Requests rejected with 429 by the admission controller',
+    ['reason']  # label: queue_full/queue_timeout/rate_limited
+)
+
+admission_queue_wait_histogram = Histogram(
+    'spam_detector_admission_queue_wait_seconds',
+    'Time an admitted request waited in the admission queue',
+    buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0]
+)
+
+
+class Rejected(Exception):
+    """Request not admitted; ``retry_after`` is in whole seconds"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+# ==================================================================
+# ADAPTIVE CONCURRENCY LIMIT
+# ==================================================================
+
+class _Waiter:
+    __slots__ = ('event', 'future', 'loop', 'granted')
+
+    def __init__(self, loop=None):
+        self.loop = loop
+        self.future = loop.create_future() if loop is not None else None
+        self.event = threading.Event() if loop is None else None
+        self.granted = False
+
+    def wake(self):
+        if self.future is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(True)
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit with a bounded FIFO wait queue"""
+
+    def __init__(self, initial_limit=20, min_limit=2, max_limit=200, max_queue=50,
+                 queue_timeout=0.5, latency_target=None, tolerance=2.0,
+                 backoff=0.9, percentile=50, interval_rtts=5,
+                 min_interval_samples=10, baseline_seconds=60.0):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(self.max_limit, max(self.min_limit, initial_limit)))
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.latency_target = latency_target or None
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.percentile = percentile
+        self.interval_rtts = interval_rtts
+        self.min_interval_samples = max(1, min_interval_samples)
+        self.baseline_seconds = baseline_seconds
+
+        self.in_flight = 0
+        self.latency_ewma = None
+        self._target = self.latency_target
+        self._interval = []
+        self._interval_start = time.monotonic()
+        self._baselines = deque()  # (interval end, interval percentile)
+        self._last_decrease = 0.0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+        admission_limit_gauge.set(int(self.limit))
+
+    # -- admission ------------------------------------------------------
+
+    def _try_admit(self):
+        # Caller holds the lock; queued requests go first
+        if not self._waiters and self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return True
+        return False
+
+    def _enqueue(self, loop=None):
+        if len(self._waiters) >= self.max_queue:
+            raise Rejected('queue_full', self.retry_after())
+        waiter = _Waiter(loop)
+        self._waiters.append(waiter)
+        admission_queue_gauge.set(len(self._waiters))
+        return waiter
+
+    def _abandon(self, waiter):
+        """Timed out: leave the queue unless a slot was handed over meanwhile"""
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+            admission_queue_gauge.set(len(self._waiters))
+            retry_after = self.retry_after()
+        raise Rejected('queue_timeout', retry_after)
+
+    def acquire(self):
+        """Take a slot, waiting up to ``queue_timeout``; raises Rejected"""
+        with self._lock:
+            if self._try_admit():
+                return
+            waiter = self._enqueue()
+        start = time.perf_counter()
+        if not waiter.event.wait(self.queue_timeout):
+            self._abandon(waiter)
+        admission_queue_wait_histogram.observe(time.perf_counter() - start)
+
+    async def acquire_async(self):
+        """acquire() for coroutines: waits on a future instead of a thread"""
+        with self._lock:
+            if self._try_admit():
+                return
+            waiter = self._enqueue(asyncio.get_running_loop())
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+        except asyncio.CancelledError:
+            # Client went away: give back a slot that was already handed over
+            if self._abandon_quietly(waiter):
+                self.release()
+            raise
+        admission_queue_wait_histogram.observe(time.perf_counter() - start)
+
+    def _abandon_quietly(self, waiter):
+        try:
+            return self._abandon(waiter)
+        except Rejected:
+            return False
+
+    def release(self):
+        """Free a slot and hand it to the oldest waiting request"""
+        with self._lock:
+            self.in_flight -= 1
+            woken = []
+            while self._waiters and self.in_flight < int(self.limit):
+                waiter = self._waiters.popleft()
+                waiter.granted = True
+                self.in_flight += 1
+                woken.append(waiter)
+            if woken:
+                admission_queue_gauge.set(len(self._waiters))
+        for waiter in woken:
+            waiter.wake()
+
+    def retry_after(self):
+        """Seconds until the queue has likely drained (at least 1)"""
+        latency = self.latency_ewma or 0.0
+        backlog = (len(self._waiters) + 1) / max(1.0, self.limit)
+        return max(1, math.ceil(backlog * latency))
+
+    # -- limit adaptation -----------------------------------------------
+
+    def observe(self, latency):
+        """Feed one serving call latency (seconds) into the limit"""
+        now = time.monotonic()
+        with self._lock:
+            self.latency_ewma = latency if self.latency_ewma is None else (
+                0.9 * self.latency_ewma + 0.1 * latency
+            )
+            self._interval.append(latency)
+            if (len(self._interval) >= self.min_interval_samples
+                    and now - self._interval_start >= self.interval_rtts * self.latency_ewma):
+                self._close_interval(now)
+            elif (self._target is None or latency <= self._target) and self.in_flight * 2 >= self.limit:
+                # Only grow while the limit is actually being used
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            limit = int(self.limit)
+        admission_limit_gauge.set(limit)
+
+    def observe_failure(self):
+        """A failed or timed out serving call counts as congestion"""
+        now = time.monotonic()
+        with self._lock:
+            self._decrease(now)
+            limit = int(self.limit)
+        admission_limit_gauge.set(limit)
+
+    def _close_interval(self, now):
+        samples = sorted(self._interval)
+        observed = samples[min(len(samples) - 1, int(len(samples) * self.percentile / 100))]
+        self._interval = []
+        self._interval_start = now
+
+        baselines = self._baselines
+        while baselines and now - baselines[0][0] > self.baseline_seconds:
+            baselines.popleft()
+        baselines.append((now, observed))
+        self._target = self.latency_target or self.tolerance * min(b for _, b in baselines)
+        if observed > self._target:
+            self._decrease(now)
+
+    def _decrease(self, now):
+        # At most one decrease per interval of several round trips, so the
+        # calls that were all sent under the old limit do not collapse it
+        if now - self._last_decrease < self.interval_rtts * (self.latency_ewma or 0.0):
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * self.backoff)
+
+
+# ==================================================================
+# PER-CLIENT RATE LIMIT
+# ==================================================================
+
+class TokenBucket:
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, tokens, now):
+        self.tokens = tokens
+        self.updated = now
+
+
+class ClientRateLimiter:
+    """Token bucket per client id (``rate`` per second, ``burst`` deep), LRU bounded"""
+
+    def __init__(self, rate, burst=20, max_clients=10000):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, client):
+        """Take one token for ``client``; raises Rejected when it has none left"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = TokenBucket(self.burst, now)
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client)
+                bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+                bucket.updated = now
+            if bucket.tokens >= 1.0:
+                bucket.tokens -= 1.0
+                return
+            wait = (1.0 - bucket.tokens) / self.rate
+        raise Rejected('rate_limited', max(1, math.ceil(wait)))
+
+
+# ==================================================================
+# CONTROLLER
+# ==================================================================
+
+class AdmissionController:
+    """Rate limit check plus concurrency slot for one request"""
+
+    def __init__(self, limiter, rate_limiter=None):
+        self.limiter = limiter
+        self.rate_limiter = rate_limiter
+
+    def _check_rate(self, client):
+        if self.rate_limiter is not None:
+            self.rate_limiter.check(client)
+
+    def admit(self, client):
+        """Raises Rejected (and counts it), else the caller must release()"""
+        try:
+            self._check_rate(client)
+            self.limiter.acquire()
+        except Rejected as e:
+            admission_rejections_counter.labels(reason=e.reason).inc()
+            raise
+
+    async def admit_async(self, client):
+        try:
+            self._check_rate(client)
+            await self.limiter.acquire_async()
+        except Rejected as e:
+            admission_rejections_counter.labels(reason=e.reason).inc()
+            raise
+
+    def release(self):
+        self.limiter.release()
+
+    def observe(self, latency):
+        self.limiter.observe(latency)
+
+    def observe_failure(self):
+        self.limiter.observe_failure()
+
+
+def client_id(headers, remote_addr):
+    return headers.get('X-Client-Id') or remote_addr or 'unknown'
@@ -0,0 +1,283 @@
+"""
+Offline Batch Scoring untuk Spam Detection Model
+Rescores message archives with the same joblib artifacts as serve_model.py
+
+Input is read in chunks (CSV, JSONL or Parquet), chunks are scored in
+parallel across a process pool and written out in input order. A
+checkpoint file makes interrupted runs resumable.
+
+Usage:
+  python batch_score.py messages.csv scored.csv --text-column text
+  python batch_score.py archive.parquet scored.jsonl --workers 8 --resume
+  python batch_score.py messages.jsonl scored.csv --textfile batch_score.prom
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from model_runtime import ModelBundle
+from wire_format import dumps_json
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_MODEL_PATH = os.getenv(
+    'MODEL_PATH', os.path.join(BASE_DIR, 'models', 'spam_detection_model.joblib')
+)
+DEFAULT_VECTORIZER_PATH = os.getenv(
+    'VECTORIZER_PATH', os.path.join(BASE_DIR, 'vectorizer.joblib')
+)
+
+
+# ==================================================================
+# CHUNKED INPUT / OUTPUT
+# ==================================================================
+
+def detect_format(path):
+    name = path.lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if name.endswith('.parquet'):
+        return 'parquet'
+    raise ValueError(f"Unsupported file type: {path} (expected .csv, .jsonl or .parquet)")
+
+
+def read_chunks(path, chunk_size):
+    """Yield DataFrames of at most ``chunk_size`` rows"""
+    fmt = detect_format(path)
+    if fmt == 'csv':
+        yield from pd.read_csv(path, chunksize=chunk_size)
+    elif fmt == 'jsonl':
+        yield from pd.read_json(path, lines=True, chunksize=chunk_size)
+    else:
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet input requires pyarrow: pip install pyarrow")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+
+
+SCORE_COLUMNS = ['prediction', 'confidence', 'probability_ham', 'probability_spam']
+
+
+def write_chunk(handle, fmt, frame, header):
+    if fmt == 'csv':
+        frame.to_csv(handle, index=False, header=header)
+    else:
+        # pandas' JSON writer rounds floats to at most 15 digits: only the
+        # input columns go through it, the scores are written exactly like
+        # CSV and /invocations do
+        records = json.loads(frame.drop(columns=SCORE_COLUMNS).to_json(
+            orient='records', double_precision=15, force_ascii=False))
+        scores = frame[SCORE_COLUMNS].to_dict(orient='list')
+        for row, record in enumerate(records):
+            for column in SCORE_COLUMNS:
+                record[column] = scores[column][row]
+        handle.write(''.join(dumps_json(record).decode('utf-8') + '\n' for record in records))
+
+
+# ==================================================================
+# CHECKPOINT
+# ==================================================================
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, state):
+    """Write atomically so a crash never leaves a half-written checkpoint"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+# ==================================================================
+# WORKER PROCESSES
+# ==================================================================
+
+_bundle = None
+
+
+def _init_worker(model_path, vectorizer_path):
+    global _bundle
+    _bundle = ModelBundle.load(model_path, vectorizer_path)
+
+
+def _score_chunk(texts):
+    start = time.perf_counter()
+    predictions, probabilities = _bundle.score(texts)
+    return predictions, probabilities, time.perf_counter() - start
+
+
+# ==================================================================
+# PROMETHEUS TEXTFILE
+# ==================================================================
+
+class TextfileReporter:
+    """Progress gauges for the node_exporter textfile collector"""
+
+    def __init__(self, path):
+        from prometheus_client import CollectorRegistry, Gauge
+
+        self.path = path
+        self.registry = CollectorRegistry()
+        self.rows = Gauge('spam_batch_rows_scored', 'Rows scored in this run',
+                          registry=self.registry)
+        self.chunks = Gauge('spam_batch_chunks_scored', 'Chunks scored in this run',
+                            registry=self.registry)
+        self.rows_per_second = Gauge('spam_batch_rows_per_second', 'Overall scoring throughput',
+                                     registry=self.registry)
+        self.chunk_seconds = Gauge('spam_batch_last_chunk_seconds', 'Latency of the last scored chunk',
+                                   registry=self.registry)
+        self.last_update = Gauge('spam_batch_last_update_timestamp_seconds', 'Time of the last progress update',
+                                 registry=self.registry)
+
+    def update(self, rows, chunks, rows_per_second, chunk_seconds):
+        from prometheus_client import write_to_textfile
+
+        self.rows.set(rows)
+        self.chunks.set(chunks)
+        self.rows_per_second.set(rows_per_second)
+        self.chunk_seconds.set(chunk_seconds)
+        self.last_update.set_to_current_time()
+        write_to_textfile(self.path, self.registry)
+
+
+# ==================================================================
+# MAIN
+# ==================================================================
+
+def score_file(args):
+    out_format = detect_format(args.output)
+    if out_format == 'parquet':
+        raise SystemExit("Parquet output is not supported (use .csv or .jsonl)")
+
+    checkpoint_path = args.checkpoint or args.output + '.checkpoint.json'
+    state = load_checkpoint(checkpoint_path) if args.resume else None
+    if state is not None and (state['input'] != os.path.abspath(args.input)
+                              or state['chunk_size'] != args.chunk_size):
+        raise SystemExit("Checkpoint was written for a different input or chunk size")
+
+    chunks_done = state['chunks_done'] if state else 0
+    rows_done = state['rows_done'] if state else 0
+
+    # Drop anything written after the last checkpoint (e.g. a partial chunk)
+    mode = 'r+' if state and os.path.exists(args.output) else 'w'
+    handle = open(args.output, mode, encoding='utf-8', newline='')
+    if state:
+        handle.truncate(state['output_bytes'])
+        handle.seek(state['output_bytes'])
+
+    print("=" * 70)
+    print("BATCH SCORING - SPAM DETECTION MODEL")
+    print("=" * 70)
+    print(f"Input: {args.input}")
+    print(f"Output: {args.output}")
+    print(f"Chunk size: {args.chunk_size} | Workers: {args.workers}")
+    if state:
+        print(f"Resuming after chunk {chunks_done} ({rows_done} rows)")
+    print("=" * 70)
+
+    reporter = TextfileReporter(args.textfile) if args.textfile else None
+    started = time.perf_counter()
+    rows_this_run = 0
+
+    executor = ProcessPoolExecutor(
+        max_workers=args.workers,
+        initializer=_init_worker,
+        initargs=(args.model, args.vectorizer),
+    )
+    pending = deque()  # (chunk_index, frame, future), in input order
+
+    def write_next():
+        nonlocal chunks_done, rows_done, rows_this_run
+        chunk_index, frame, future = pending.popleft()
+        predictions, probabilities, chunk_seconds = future.result()
+
+        frame = frame.copy()
+        frame['prediction'] = np.where(predictions == 1, 'spam', 'ham')
+        frame['confidence'] = probabilities.max(axis=1)
+        frame['probability_ham'] = probabilities[:, 0]
+        frame['probability_spam'] = probabilities[:, 1]
+        write_chunk(handle, out_format, frame, header=(chunk_index == 0))
+        handle.flush()
+
+        chunks_done = chunk_index + 1
+        rows_done += len(frame)
+        rows_this_run += len(frame)
+        save_checkpoint(checkpoint_path, {
+            'input': os.path.abspath(args.input),
+            'chunk_size': args.chunk_size,
+            'chunks_done': chunks_done,
+            'rows_done': rows_done,
+            'output_bytes': handle.tell(),
+        })
+
+        elapsed = time.perf_counter() - started
+        rows_per_second = rows_this_run / elapsed if elapsed > 0 else 0.0
+        print(f"[chunk {chunks_done}] {len(frame)} rows in {chunk_seconds * 1000:.0f} ms | "
+              f"total {rows_done} rows | {rows_per_second:.0f} rows/sec")
+        if reporter is not None:
+            reporter.update(rows_done, chunks_done, rows_per_second, chunk_seconds)
+
+    try:
+        for chunk_index, frame in enumerate(read_chunks(args.input, args.chunk_size)):
+            if chunk_index < chunks_done:
+                continue
+            if args.text_column not in frame.columns:
+                raise SystemExit(f"Column '{args.text_column}' not found in {args.input}")
+            texts = frame[args.text_column].fillna('').astype(str).tolist()
+            pending.append((chunk_index, frame, executor.submit(_score_chunk, texts)))
+
+            # Bound the number of chunks held in memory
+            while len(pending) >= args.workers * 2:
+                write_next()
+
+        while pending:
+            write_next()
+    finally:
+        executor.shutdown(cancel_futures=True)
+        handle.close()
+
+    elapsed = time.perf_counter() - started
+    print("=" * 70)
+    print(f"Done: {rows_this_run} rows scored in {elapsed:.2f}s "
+          f"({rows_this_run / elapsed if elapsed > 0 else 0:.0f} rows/sec)")
+    print("=" * 70)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline batch scoring for the spam detection model')
+    parser.add_argument('input', help='input file (.csv, .jsonl or .parquet)')
+    parser.add_argument('output', help='output file (.csv or .jsonl)')
+    parser.add_argument('--text-column', default='text')
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--vectorizer', default=DEFAULT_VECTORIZER_PATH)
+    parser.add_argument('--checkpoint', help='checkpoint path (default: <output>.checkpoint.json)')
+    parser.add_argument('--resume', action='store_true', help='continue from the checkpoint')
+    parser.add_argument('--textfile', help='write Prometheus textfile metrics to this path')
+    args = parser.parse_args()
+
+    score_file(args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
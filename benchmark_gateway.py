@@ -0,0 +1,190 @@
+"""
+Benchmark: Flask inference.py vs async inference_async.py
+
+Starts a stub serving endpoint with a fixed artificial delay (to model a
+slow serving tier), runs both gateways against it and drives /predict
+with increasing numbers of concurrent clients.
+
+Usage:
+  python benchmark_gateway.py
+  python benchmark_gateway.py --delay-ms 500 --concurrency 10 100 1000
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import aiohttp
+import requests
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+STUB_PORT = 5101
+FLASK_PORT = 8101
+ASYNC_PORT = 8102
+
+
+# ==================================================================
+# STUB SERVING ENDPOINT
+# ==================================================================
+
+def run_stub(port, delay_ms):
+    """Serve /health and /invocations with a fixed delay (no model)"""
+    import uvicorn
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse
+    from starlette.routing import Route
+
+    async def health(request):
+        return JSONResponse({'status': 'healthy'})
+
+    async def invocations(request):
+        body = await request.json()
+        await asyncio.sleep(delay_ms / 1000.0)
+        return JSONResponse({
+            'predictions': [
+                {'prediction': 'ham', 'confidence': 0.9,
+                 'probabilities': {'ham': 0.9, 'spam': 0.1}}
+                for _ in body.get('inputs', [])
+            ],
+            'model_version': 'stub',
+        })
+
+    app = Starlette(routes=[
+        Route('/health', health),
+        Route('/invocations', invocations, methods=['POST']),
+    ])
+    uvicorn.run(app, host='127.0.0.1', port=port, log_level='warning',
+                backlog=4096)
+
+
+# ==================================================================
+# LOAD DRIVER
+# ==================================================================
+
+async def drive(url, concurrency, requests_per_client):
+    """Closed-loop load: each client sends its requests back to back"""
+    latencies = []
+    errors = 0
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=60.0)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        async def worker(worker_id):
+            nonlocal errors
+            for i in range(requests_per_client):
+                payload = {'text': f'benchmark message {worker_id}-{i}'}
+                start = time.perf_counter()
+                try:
+                    async with session.post(url, json=payload) as response:
+                        await response.read()
+                        ok = response.status == 200
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    ok = False
+                latencies.append(time.perf_counter() - start)
+                if not ok:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(w) for w in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': len(latencies) / elapsed,
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+    }
+
+
+def wait_for(url, timeout=30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(url, timeout=1.0).status_code < 500:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def start_process(args, env_overrides):
+    env = dict(os.environ)
+    env.update(env_overrides)
+    return subprocess.Popen(
+        [sys.executable] + args, cwd=BASE_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--delay-ms', type=float, default=200.0,
+                        help='artificial serving latency per request')
+    parser.add_argument('--concurrency', type=int, nargs='+',
+                        default=[1, 10, 50, 100, 250, 500])
+    parser.add_argument('--requests-per-client', type=int, default=5)
+    parser.add_argument('--stub', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, default=STUB_PORT, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.stub:
+        run_stub(args.port, args.delay_ms)
+        return 0
+
+    gateway_env = {
+        'SERVING_URL': f'http://127.0.0.1:{STUB_PORT}',
+        'CACHE_ENABLED': 'false',
+        'BATCHING_ENABLED': 'false',
+        'SERVING_POOL_SIZE': str(max(args.concurrency)),
+    }
+    processes = [
+        start_process(['benchmark_gateway.py', '--stub', '--port', str(STUB_PORT),
+                       '--delay-ms', str(args.delay_ms)], {}),
+    ]
+    try:
+        wait_for(f'http://127.0.0.1:{STUB_PORT}/health')
+        processes.append(start_process(
+            ['inference.py'], dict(gateway_env, API_PORT=str(FLASK_PORT))))
+        processes.append(start_process(
+            ['inference_async.py'], dict(gateway_env, API_PORT=str(ASYNC_PORT))))
+        wait_for(f'http://127.0.0.1:{FLASK_PORT}/')
+        wait_for(f'http://127.0.0.1:{ASYNC_PORT}/')
+
+        print("=" * 78)
+        print("GATEWAY BENCHMARK - Flask vs ASGI")
+        print("=" * 78)
+        print(f"Serving delay: {args.delay_ms:.0f} ms, "
+              f"requests per client: {args.requests_per_client}")
+        print("-" * 78)
+        print(f"{'concurrency':>11} | {'gateway':<7} | {'rps':>9} | "
+              f"{'p50 ms':>9} | {'p99 ms':>9} | {'errors':>6}")
+        print("-" * 78)
+
+        for concurrency in args.concurrency:
+            for name, port in (('flask', FLASK_PORT), ('async', ASYNC_PORT)):
+                result = asyncio.run(drive(
+                    f'http://127.0.0.1:{port}/predict',
+                    concurrency, args.requests_per_client
+                ))
+                print(f"{concurrency:>11} | {name:<7} | {result['rps']:>9.1f} | "
+                      f"{result['p50_ms']:>9.1f} | {result['p99_ms']:>9.1f} | "
+                      f"{result['errors']:>6}")
+        print("=" * 78)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""
+Benchmark: /invocations scoring and post-processing
+
+Compares the original serving path (predict + predict_proba, a per-row
+Python loop and jsonify-style json.dumps) with the current one (fused or
+single-pass sklearn scoring per SCORER, column-wise formatting, orjson
+when installed) and with the columnar response shape, across batch sizes.
+
+Usage:
+  python benchmark_serving.py
+  python benchmark_serving.py --batch-sizes 1 100 10000 --repeat 5
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from model_runtime import ModelBundle, format_columnar, format_predictions
+from wire_format import dumps_json, orjson
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_MODEL_PATH = os.path.join(BASE_DIR, 'models', 'spam_detection_model.joblib')
+DEFAULT_VECTORIZER_PATH = os.path.join(BASE_DIR, 'vectorizer.joblib')
+
+SAMPLE_TEXTS = [
+    "CONGRATULATIONS! You have won $1,000,000! Click here to claim your prize!",
+    "Hi, can we meet for coffee tomorrow at 3pm?",
+    "URGENT! Your account will be closed. Verify now at fake-link.com",
+    "Thanks for your email. I'll review the document and get back to you.",
+    "FREE FREE FREE! Click now to win!",
+    "Selamat! Anda memenangkan hadiah, hubungi nomor ini sekarang",
+    "Rapat tim dipindah ke hari Kamis jam 10 pagi",
+]
+
+
+def make_texts(n):
+    return [f"{SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]} #{i}" for i in range(n)]
+
+
+# ==================================================================
+# SERVING PATHS
+# ==================================================================
+
+def legacy_invoke(bundle, texts):
+    """The original /invocations body: two scoring passes and a per-row loop"""
+    X = bundle.vectorizer.transform(texts)
+    predictions = bundle.model.predict(X)
+    probabilities = bundle.model.predict_proba(X)
+    results = []
+    for pred, probs in zip(predictions, probabilities):
+        result = 'spam' if pred == 1 else 'ham'
+        confidence = float(probs[pred])
+        results.append({
+            'prediction': result,
+            'confidence': confidence,
+            'probabilities': {
+                'ham': float(probs[0]),
+                'spam': float(probs[1])
+            }
+        })
+    # Flask's default JSON provider: sorted keys, ASCII escaping
+    return json.dumps({'predictions': results}, sort_keys=True).encode('utf-8')
+
+
+def records_invoke(bundle, texts):
+    predictions, probabilities = bundle.score(texts)
+    return dumps_json({'predictions': format_predictions(predictions, probabilities)})
+
+
+def columnar_invoke(bundle, texts):
+    predictions, probabilities = bundle.score(texts)
+    return dumps_json({'predictions': format_columnar(predictions, probabilities)})
+
+
+PATHS = [
+    ('legacy', legacy_invoke),
+    ('records', records_invoke),
+    ('columnar', columnar_invoke),
+]
+
+
+def check_equivalence(bundle, texts):
+    """The new paths must return the same predictions as the legacy one"""
+    legacy = json.loads(legacy_invoke(bundle, texts))['predictions']
+    records = json.loads(records_invoke(bundle, texts))['predictions']
+    columnar = json.loads(columnar_invoke(bundle, texts))['predictions']
+    for i, (old, new) in enumerate(zip(legacy, records)):
+        if (old['prediction'] != new['prediction']
+                or old['prediction'] != columnar['prediction'][i]
+                or abs(old['confidence'] - new['confidence']) > 1e-12
+                or abs(old['confidence'] - columnar['confidence'][i]) > 1e-12):
+            raise AssertionError(f"Row {i} differs: {old} vs {new}")
+
+
+def time_path(fn, bundle, texts, repeat):
+    """Best-of-N wall time in seconds (one untimed warmup call)"""
+    fn(bundle, texts)
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(bundle, texts)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--batch-sizes', type=int, nargs='+',
+                        default=[1, 10, 100, 1000, 10000])
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--vectorizer', default=DEFAULT_VECTORIZER_PATH)
+    args = parser.parse_args()
+
+    bundle = ModelBundle.load(args.model, args.vectorizer)
+    check_equivalence(bundle, make_texts(1000))
+
+    print("=" * 78)
+    print("SERVING BENCHMARK - /invocations scoring + post-processing")
+    print("=" * 78)
+    print(f"Scorer: {bundle.scorer_name}, "
+          f"JSON encoder: {'orjson' if orjson is not None else 'json (stdlib)'}, "
+          f"best of {args.repeat}")
+    print("-" * 78)
+    print(f"{'batch':>7} | {'path':<8} | {'ms/batch':>10} | {'rows/sec':>11} | "
+          f"{'bytes':>10} | {'speedup':>7}")
+    print("-" * 78)
+
+    for batch_size in args.batch_sizes:
+        texts = make_texts(batch_size)
+        baseline = None
+        for name, fn in PATHS:
+            seconds = time_path(fn, bundle, texts, args.repeat)
+            size = len(fn(bundle, texts))
+            if baseline is None:
+                baseline = seconds
+            print(f"{batch_size:>7} | {name:<8} | {seconds * 1000:>10.3f} | "
+                  f"{batch_size / seconds:>11.0f} | {size:>10} | "
+                  f"{baseline / seconds:>6.2f}x")
+        print("-" * 78)
+
+    print("=" * 78)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
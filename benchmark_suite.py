@@ -0,0 +1,320 @@
+"""
+Microbenchmark Suite: vectorize -> predict -> serialize hot path
+
+Runs in-process (no network): the vectorizer and model directly, the
+fused/sklearn scoring path, JSON serialization, and serve_model
+/invocations end to end through the Flask test client. Cases cover batch
+sizes, text lengths and languages (the EN/ID samples from test_inference.py).
+
+For every case it reports throughput, p50/p99 latency and peak allocation
+per call (tracemalloc), and compares p50 and allocations against the
+stored baseline. Any regression beyond the tolerance exits with status 1.
+
+Latencies are compared relative to a fixed calibration workload timed
+right before each case, so a machine that is uniformly slower or faster
+than when the baseline was recorded (CPU frequency, noisy neighbours)
+does not show up as a regression.
+
+Usage:
+  python benchmark_suite.py                      # compare with benchmark_baseline.json
+  python benchmark_suite.py --update-baseline    # record a new baseline
+  python benchmark_suite.py --filter invocations --tolerance 0.5
+
+Baselines are machine specific: record one on the machine that runs the check.
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# serve_model reads these at import; point them at the repo artifacts
+os.environ.setdefault('MODEL_PATH', os.path.join(BASE_DIR, 'models', 'spam_detection_model.joblib'))
+os.environ.setdefault('VECTORIZER_PATH', os.path.join(BASE_DIR, 'vectorizer.joblib'))
+os.environ.setdefault('MODEL_WATCH_INTERVAL', '0')
+
+from wire_format import dumps_json  # noqa: E402
+from test_inference import HAM_MESSAGES, SPAM_MESSAGES  # noqa: E402
+
+
+DEFAULT_BASELINE = os.path.join(BASE_DIR, 'benchmark_baseline.json')
+
+# The last two messages of each list are Indonesian
+LANGUAGES = {
+    'en': SPAM_MESSAGES[:6] + HAM_MESSAGES[:6],
+    'id': SPAM_MESSAGES[6:] + HAM_MESSAGES[6:],
+    'mixed': SPAM_MESSAGES + HAM_MESSAGES,
+}
+
+# Messages joined per text: SMS-sized, a short email, a long email
+LENGTHS = {'short': 1, 'medium': 3, 'long': 10}
+
+# (language, length, batch size)
+DATASETS = [
+    ('mixed', 'short', 1),
+    ('mixed', 'short', 32),
+    ('mixed', 'short', 256),
+    ('mixed', 'medium', 32),
+    ('mixed', 'long', 32),
+    ('en', 'short', 32),
+    ('id', 'short', 32),
+]
+
+
+def make_texts(language, length, batch_size):
+    messages = LANGUAGES[language]
+    per_text = LENGTHS[length]
+    return [
+        ' '.join(messages[(i * per_text + j) % len(messages)] for j in range(per_text))
+        for i in range(batch_size)
+    ]
+
+
+# ==================================================================
+# STAGES
+# ==================================================================
+
+def build_stages(serve_model):
+    """stage name -> setup(texts) returning a zero-argument callable"""
+    bundle = serve_model.reloader.bundle
+    client = serve_model.app.test_client()
+
+    def vectorize(texts):
+        return lambda: bundle.vectorizer.transform(texts)
+
+    def predict_sklearn(texts):
+        X = bundle.vectorizer.transform(texts)
+        return lambda: bundle.model.predict_proba(X)
+
+    def score(texts):
+        return lambda: bundle.score(texts)
+
+    def serialize(texts):
+        payload = bundle.invoke(texts)
+        return lambda: dumps_json(payload)
+
+    def invocations(texts):
+        body = {'inputs': texts}
+
+        def call():
+            response = client.post('/invocations', json=body)
+            if response.status_code != 200:
+                raise RuntimeError(f"/invocations returned {response.status_code}")
+            return response.data
+        return call
+
+    return {
+        'vectorize': vectorize,
+        'predict_sklearn': predict_sklearn,
+        'score': score,
+        'serialize': serialize,
+        'invocations': invocations,
+    }
+
+
+# ==================================================================
+# MEASUREMENT
+# ==================================================================
+
+_CALIBRATION_TEXT = ' '.join(SPAM_MESSAGES + HAM_MESSAGES) * 4
+_CALIBRATION_PATTERN = re.compile(r'(?u)\b\w\w+\b')
+
+
+def _calibration_workload():
+    """Tokenize, count and bincount: the same kind of work as the hot path, without repo code"""
+    counts = {}
+    for token in _CALIBRATION_PATTERN.findall(_CALIBRATION_TEXT.lower()):
+        counts[token] = counts.get(token, 0) + 1
+    values = np.fromiter(counts.values(), dtype=np.float64)
+    return np.bincount(np.arange(len(values)) % 7, weights=values)
+
+
+def calibrate(repeat=31):
+    """Median time of the calibration workload in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _calibration_workload()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000
+
+
+def percentile(sorted_values, q):
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure(fn, batch_size, min_time=0.3, rounds=5, min_iterations=10, warmup=3):
+    """
+    Latency distribution over repeated calls plus peak allocation of one call
+
+    The time is split into rounds and the median of the per-round p50s is
+    reported, so a burst of interference from other processes (or a lucky
+    quiet stretch) in one round does not move the result. p99 is taken
+    over all calls.
+    """
+    for _ in range(warmup):
+        fn()
+
+    all_latencies = []
+    round_p50s = []
+    for _ in range(rounds):
+        latencies = []
+        started = time.perf_counter()
+        while len(latencies) < min_iterations or time.perf_counter() - started < min_time / rounds:
+            start = time.perf_counter()
+            fn()
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        round_p50s.append(percentile(latencies, 0.50))
+        all_latencies.extend(latencies)
+    all_latencies.sort()
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    round_p50s.sort()
+    p50 = round_p50s[len(round_p50s) // 2]
+    return {
+        'p50_ms': round(p50 * 1000, 4),
+        'p99_ms': round(percentile(all_latencies, 0.99) * 1000, 4),
+        'rows_per_sec': round(batch_size / p50, 1),
+        'alloc_kib': round(peak / 1024, 1),
+        'iterations': len(all_latencies),
+    }
+
+
+def measure_case(fn, batch_size, min_time):
+    """measure() bracketed by calibration runs"""
+    calibration_ms = calibrate()
+    result = measure(fn, batch_size, min_time=min_time)
+    result['calibration_ms'] = round((calibration_ms + calibrate()) / 2, 4)
+    return result
+
+
+def compare(name, result, baseline, tolerance, alloc_tolerance, min_delta_ms=0.02):
+    """'' when within tolerance, otherwise a description of the change"""
+    if baseline is None:
+        return 'new'
+    notes = []
+    # Baseline p50 as it would run on this machine right now
+    speed = result['calibration_ms'] / baseline['calibration_ms']
+    base_p50 = baseline['p50_ms'] * speed
+    if result['p50_ms'] - base_p50 > max(tolerance * base_p50, min_delta_ms):
+        notes.append(f"REGRESSION p50 {base_p50:.3f} -> {result['p50_ms']:.3f} ms "
+                     f"(x{result['p50_ms'] / base_p50:.2f})")
+    base_alloc = baseline['alloc_kib']
+    if result['alloc_kib'] - base_alloc > max(alloc_tolerance * base_alloc, 1.0):
+        notes.append(f"REGRESSION alloc {base_alloc:.1f} -> {result['alloc_kib']:.1f} KiB")
+    if not notes and base_p50 - result['p50_ms'] > max(tolerance * base_p50, min_delta_ms):
+        notes.append('faster than baseline')
+    return '; '.join(notes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Microbenchmarks for the serving hot path')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='write the results as the new baseline instead of comparing')
+    parser.add_argument('--tolerance', type=float, default=0.50,
+                        help='allowed relative p50 slowdown (default 0.50 = 50%%)')
+    parser.add_argument('--alloc-tolerance', type=float, default=0.25,
+                        help='allowed relative growth of peak allocation per call')
+    parser.add_argument('--confirm', type=int, default=2,
+                        help='re-measure a regressed case up to N times before failing')
+    parser.add_argument('--filter', help='only run cases whose name contains this string')
+    parser.add_argument('--min-time', type=float, default=0.3,
+                        help='minimum measuring time per case (seconds)')
+    args = parser.parse_args()
+
+    import serve_model
+    if not serve_model.wait_for_model():
+        print("❌ Model could not be loaded")
+        return 1
+    stages = build_stages(serve_model)
+
+    baseline = {}
+    if not args.update_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)['cases']
+
+    print("=" * 100)
+    print("MICROBENCHMARK SUITE - vectorize -> predict -> serialize")
+    print("=" * 100)
+    print(f"Python {platform.python_version()} on {platform.machine()}, "
+          f"scorer: {serve_model.reloader.bundle.scorer_name}")
+    print(f"Baseline: {args.baseline if baseline else '(none)'}")
+    print("-" * 100)
+    print(f"{'case':<38} | {'rows/sec':>10} | {'p50 ms':>8} | {'p99 ms':>8} | "
+          f"{'alloc KiB':>9} | vs baseline")
+    print("-" * 100)
+
+    results = {}
+    regressions = 0
+    for language, length, batch_size in DATASETS:
+        texts = make_texts(language, length, batch_size)
+        for stage, setup in stages.items():
+            name = f"{stage}/{language}/{length}/b{batch_size}"
+            if args.filter and args.filter not in name:
+                continue
+            fn = setup(texts)
+            result = measure_case(fn, batch_size, args.min_time)
+            note = '' if args.update_baseline else compare(
+                name, result, baseline.get(name), args.tolerance, args.alloc_tolerance)
+
+            # Re-measure before reporting a regression, a single noisy
+            # measurement should not fail the suite
+            for _ in range(args.confirm):
+                if 'REGRESSION' not in note:
+                    break
+                result = measure_case(fn, batch_size, args.min_time)
+                note = compare(name, result, baseline.get(name),
+                               args.tolerance, args.alloc_tolerance)
+
+            results[name] = result
+            if 'REGRESSION' in note:
+                regressions += 1
+            print(f"{name:<38} | {result['rows_per_sec']:>10.0f} | {result['p50_ms']:>8.3f} | "
+                  f"{result['p99_ms']:>8.3f} | {result['alloc_kib']:>9.1f} | {note or 'ok'}")
+
+    print("=" * 100)
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({
+                'meta': {
+                    'created': datetime.now().isoformat(timespec='seconds'),
+                    'python': platform.python_version(),
+                    'machine': platform.machine(),
+                    'scorer': serve_model.reloader.bundle.scorer_name,
+                },
+                'cases': results,
+            }, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Baseline written to {args.baseline} ({len(results)} cases)")
+        return 0
+
+    if regressions:
+        print(f"❌ {regressions} regression(s) beyond tolerance "
+              f"(p50 +{args.tolerance:.0%}, alloc +{args.alloc_tolerance:.0%})")
+        return 1
+    print("✓ No regressions against the baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+Benchmark: /invocations wire formats
+
+Bytes on the wire and encode (serving) / decode (gateway) CPU per batch
+for each response encoding in wire_format.py, with and without gzip.
+Encoding starts from the scored (predictions, probabilities) arrays, so it
+includes building the response payload; decoding ends with the payload
+the gateway reads (records shape).
+
+Usage:
+  python benchmark_wire.py
+  python benchmark_wire.py --batch-sizes 1 32 1000 --gzip-level 1
+"""
+
+import argparse
+import gzip
+import sys
+import time
+from datetime import datetime
+
+from benchmark_serving import DEFAULT_MODEL_PATH, DEFAULT_VECTORIZER_PATH, make_texts
+from model_runtime import ModelBundle, format_columnar, format_predictions
+from wire_format import (COLUMNAR, JSON, MEDIA_TYPES, MSGPACK, available_formats,
+                         decode_body, decode_columnar, encode_columnar, encode_payload)
+
+
+def encoders(bundle):
+    """(name, media type, encode(predictions, probabilities) -> bytes)"""
+    def payload(predictions, probabilities, formatter):
+        return {
+            'predictions': formatter(predictions, probabilities),
+            'model_version': bundle.version,
+            'timestamp': datetime.now().isoformat()
+        }
+
+    paths = [
+        ('json', MEDIA_TYPES[JSON],
+         lambda p, q: encode_payload(payload(p, q, format_predictions), JSON)),
+        ('json-col', MEDIA_TYPES[JSON],
+         lambda p, q: encode_payload(payload(p, q, format_columnar), JSON)),
+    ]
+    if MSGPACK in available_formats():
+        paths.append(('msgpack', MEDIA_TYPES[MSGPACK],
+                      lambda p, q: encode_payload(payload(p, q, format_predictions), MSGPACK)))
+    paths.append(('columnar', MEDIA_TYPES[COLUMNAR],
+                  lambda p, q: encode_columnar(p, q, bundle.version, datetime.now().isoformat())))
+    return paths
+
+
+def best_time(fn, repeat):
+    """Best-of-N seconds per call, with enough calls per sample for small batches"""
+    fn()
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        if time.perf_counter() - start >= 0.01 or loops >= 10000:
+            break
+        loops *= 10
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        best = min(best, (time.perf_counter() - start) / loops)
+    return best
+
+
+def check_roundtrip(bundle, predictions, probabilities):
+    """The binary layout must decode to exactly the JSON records"""
+    expected = format_predictions(predictions, probabilities)
+    decoded = decode_columnar(encode_columnar(predictions, probabilities, bundle.version, 'now'))
+    if decoded['predictions'] != expected:
+        raise AssertionError("Columnar wire format does not round-trip the JSON records")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 32, 1000, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--gzip-level', type=int, default=1)
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--vectorizer', default=DEFAULT_VECTORIZER_PATH)
+    args = parser.parse_args()
+
+    bundle = ModelBundle.load(args.model, args.vectorizer)
+    paths = encoders(bundle)
+
+    print("=" * 92)
+    print("WIRE FORMAT BENCHMARK - /invocations response encodings")
+    print("=" * 92)
+    print(f"Formats: {', '.join(name for name, _, _ in paths)} "
+          f"(gzip level {args.gzip_level}), best of {args.repeat}")
+    print("-" * 92)
+    print(f"{'batch':>6} | {'format':<9} | {'bytes':>9} | {'B/row':>6} | {'enc us':>9} | "
+          f"{'dec us':>9} | {'gz bytes':>9} | {'gz enc us':>9} | {'gz dec us':>9}")
+    print("-" * 92)
+
+    for batch_size in args.batch_sizes:
+        predictions, probabilities = bundle.score(make_texts(batch_size))
+        check_roundtrip(bundle, predictions, probabilities)
+        for name, media_type, encode in paths:
+            body = encode(predictions, probabilities)
+            packed = gzip.compress(body, compresslevel=args.gzip_level)
+            encode_s = best_time(lambda: encode(predictions, probabilities), args.repeat)
+            decode_s = best_time(lambda: decode_body(body, media_type), args.repeat)
+            gz_encode_s = best_time(
+                lambda: gzip.compress(body, compresslevel=args.gzip_level), args.repeat)
+            gz_decode_s = best_time(lambda: gzip.decompress(packed), args.repeat)
+            print(f"{batch_size:>6} | {name:<9} | {len(body):>9} | {len(body) / batch_size:>6.1f} | "
+                  f"{encode_s * 1e6:>9.1f} | {decode_s * 1e6:>9.1f} | {len(packed):>9} | "
+                  f"{(encode_s + gz_encode_s) * 1e6:>9.1f} | {(decode_s + gz_decode_s) * 1e6:>9.1f}")
+        print("-" * 92)
+
+    print("=" * 92)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
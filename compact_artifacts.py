@@ -0,0 +1,574 @@
+"""
+Compact Artifacts untuk Spam Detection Model
+Turns vectorizer.joblib + spam_detection_model.joblib into one directory of
+flat, memory-mappable arrays that serve_model.py loads without sklearn,
+scipy or joblib
+
+  manifest.json      analyzer settings, norm/link, classes, equivalence report
+  terms.npy          uint8, every vocabulary term (utf-8) back to back
+  offsets.npy        uint32[n + 1], term i is terms[offsets[i]:offsets[i + 1]]
+  displace.npy       uint32[buckets], hash-and-displace perfect hash:
+                     slot = crc32(term, displace[crc32(term) % buckets]) % n
+  table.npy          float32[n, outputs], idf * model weights, row per slot
+  idf.npy            float32[n]
+  bias.npy           float64[outputs]
+
+Term slot == table row, so a lookup is two crc32 calls and one byte compare
+and there is no per-term Python object. For MultinomialNB each table row is
+centered (softmax ignores a shift shared by every class), which keeps the
+float32 values small and makes terms that do not favour any class exactly
+zero; --prune drops terms whose centered weights stay below a threshold.
+
+The compact scorer is checked against vectorizer.transform + predict_proba
+before anything is written: no label may change and max |dp| must stay
+within --atol. --report starts one process per format, loads and warms it
+up like a serving worker and prints the resident memory of each.
+
+Usage:
+  python compact_artifacts.py models/compact
+  python compact_artifacts.py models/compact --prune 0.01 --atol 1e-3
+  python compact_artifacts.py models/compact --report --replicas 4
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+import unicodedata
+from datetime import datetime
+from zlib import crc32
+
+import numpy as np
+
+from fused_scorer import FusedScorer
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+COMPACT_FORMAT = 'spam-compact-v1'
+MANIFEST = 'manifest.json'
+ARRAYS = ('terms', 'offsets', 'displace', 'table', 'idf', 'bias')
+
+
+class CompactFormatError(ValueError):
+    """The directory is not a usable compact artifact"""
+
+
+def is_compact(path):
+    """True when ``path`` is a compact artifact directory (or its manifest)"""
+    if os.path.basename(path) == MANIFEST:
+        path = os.path.dirname(path)
+    return os.path.isfile(os.path.join(path, MANIFEST))
+
+
+# ==================================================================
+# ANALYZER (sklearn-free)
+# ==================================================================
+
+def _strip_accents_unicode(text):
+    try:
+        text.encode('ASCII', errors='strict')
+        return text
+    except UnicodeEncodeError:
+        normalized = unicodedata.normalize('NFKD', text)
+        return ''.join(c for c in normalized if not unicodedata.combining(c))
+
+
+def _strip_accents_ascii(text):
+    normalized = unicodedata.normalize('NFKD', text)
+    return normalized.encode('ASCII', 'ignore').decode('ASCII')
+
+
+class WordAnalyzer:
+    """Same tokens as CountVectorizer(analyzer='word').build_analyzer()"""
+
+    def __init__(self, token_pattern, lowercase=True, strip_accents=None,
+                 stop_words=None, ngram_range=(1, 1)):
+        self.token_pattern = token_pattern
+        self.lowercase = lowercase
+        self.strip_accents = strip_accents
+        self.stop_words = frozenset(stop_words) if stop_words else None
+        self.ngram_range = tuple(ngram_range)
+
+        self._findall = re.compile(token_pattern).findall
+        self._strip = {
+            None: None,
+            'ascii': _strip_accents_ascii,
+            'unicode': _strip_accents_unicode,
+        }[strip_accents]
+
+    @classmethod
+    def from_vectorizer(cls, vectorizer):
+        from fused_scorer import UnsupportedModelError
+
+        if (vectorizer.analyzer != 'word' or vectorizer.preprocessor is not None
+                or vectorizer.tokenizer is not None or vectorizer.input != 'content'
+                or vectorizer.strip_accents not in (None, 'ascii', 'unicode')):
+            raise UnsupportedModelError(
+                "Only the built-in word analyzer (no custom preprocessor, tokenizer "
+                "or strip_accents callable) can be compacted"
+            )
+        if re.compile(vectorizer.token_pattern).groups > 1:
+            raise UnsupportedModelError("token_pattern has more than one capturing group")
+        stop_words = vectorizer.get_stop_words()
+        return cls(vectorizer.token_pattern, vectorizer.lowercase, vectorizer.strip_accents,
+                   sorted(stop_words) if stop_words else None, vectorizer.ngram_range)
+
+    def config(self):
+        return {
+            'token_pattern': self.token_pattern,
+            'lowercase': self.lowercase,
+            'strip_accents': self.strip_accents,
+            'stop_words': sorted(self.stop_words) if self.stop_words else None,
+            'ngram_range': list(self.ngram_range),
+        }
+
+    def __call__(self, doc):
+        if self.lowercase:
+            doc = doc.lower()
+        if self._strip is not None:
+            doc = self._strip(doc)
+        tokens = self._findall(doc)
+        if self.stop_words is not None:
+            tokens = [w for w in tokens if w not in self.stop_words]
+
+        min_n, max_n = self.ngram_range
+        if max_n == 1:
+            return tokens
+        original = tokens
+        n_original = len(original)
+        if min_n == 1:
+            tokens = list(original)
+            min_n += 1
+        else:
+            tokens = []
+        for n in range(min_n, min(max_n + 1, n_original + 1)):
+            for i in range(n_original - n + 1):
+                tokens.append(' '.join(original[i:i + n]))
+        return tokens
+
+
+# ==================================================================
+# PERFECT-HASH VOCABULARY
+# ==================================================================
+
+def build_perfect_hash(keys, bucket_size=4, max_displacement=1 << 20):
+    """
+    Hash-and-displace over byte-string ``keys``
+
+    Returns (displace, slots): displace[bucket] is the crc32 seed of that
+    bucket, slots[s] the index in ``keys`` of the key stored at slot s.
+    """
+    n = len(keys)
+    n_buckets = max(1, n // bucket_size)
+    buckets = [[] for _ in range(n_buckets)]
+    for index, key in enumerate(keys):
+        buckets[crc32(key) % n_buckets].append(index)
+
+    displace = [0] * n_buckets
+    slots = [-1] * n
+    # Biggest buckets first, while most slots are still free
+    for bucket in sorted(range(n_buckets), key=lambda b: -len(buckets[b])):
+        members = buckets[bucket]
+        if not members:
+            continue
+        for seed in range(1, max_displacement):
+            positions = [crc32(keys[i], seed) % n for i in members]
+            if (len(set(positions)) == len(positions)
+                    and all(slots[p] < 0 for p in positions)):
+                break
+        else:
+            raise CompactFormatError(f"No perfect hash found for bucket of {len(members)} keys")
+        displace[bucket] = seed
+        for index, position in zip(members, positions):
+            slots[position] = index
+    return displace, slots
+
+
+class CompactVocabulary:
+    """Read-only term -> column mapping over the flat perfect-hash arrays"""
+
+    def __init__(self, terms, offsets, displace):
+        # memoryviews: indexing returns plain ints/bytes without numpy scalars
+        self._terms = memoryview(np.ascontiguousarray(terms)).cast('B')
+        self._offsets = memoryview(np.ascontiguousarray(offsets, dtype=np.uint32)).cast('B').cast('I')
+        self._displace = memoryview(np.ascontiguousarray(displace, dtype=np.uint32)).cast('B').cast('I')
+        self._size = len(self._offsets) - 1
+        self._buckets = len(self._displace)
+
+    def get(self, term, default=None):
+        key = term.encode('utf-8')
+        slot = crc32(key, self._displace[crc32(key) % self._buckets]) % self._size
+        if self._terms[self._offsets[slot]:self._offsets[slot + 1]] == key:
+            return slot
+        return default
+
+    def __contains__(self, term):
+        return self.get(term) is not None
+
+    def __getitem__(self, term):
+        column = self.get(term)
+        if column is None:
+            raise KeyError(term)
+        return column
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        for slot in range(self._size):
+            yield bytes(self._terms[self._offsets[slot]:self._offsets[slot + 1]]).decode('utf-8')
+
+
+# ==================================================================
+# LOADED ARTIFACT
+# ==================================================================
+
+class CompactScorer(FusedScorer):
+    """FusedScorer over a CompactVocabulary"""
+
+    def term_counts(self, texts):
+        # A perfect-hash lookup costs several dict lookups, so each distinct
+        # term is looked up once per batch and counted by string first
+        rows, columns, counts = [], [], []
+        lookup = {}
+        vocabulary_get = self.vocabulary.get
+        for row, text in enumerate(texts):
+            terms = {}
+            for term in self.analyzer(text):
+                terms[term] = terms.get(term, 0) + 1
+            for term, count in terms.items():
+                column = lookup.get(term, -1)
+                if column == -1:
+                    column = lookup[term] = vocabulary_get(term)
+                if column is not None:
+                    rows.append(row)
+                    columns.append(column)
+                    counts.append(count)
+        return (np.array(rows, dtype=np.intp),
+                np.array(columns, dtype=np.intp),
+                np.array(counts, dtype=np.float64))
+
+
+class CompactFeatures:
+    """transform() output of a compact vectorizer: term counts, not a tf-idf matrix"""
+
+    def __init__(self, term_counts, n_rows, n_features):
+        self.term_counts = term_counts
+        self.shape = (n_rows, n_features)
+
+
+class CompactVectorizer:
+    """The parts of a fitted vectorizer the serving path reads (drift monitor)"""
+
+    def __init__(self, analyzer, vocabulary, scorer):
+        self._analyzer = analyzer
+        self.vocabulary_ = vocabulary
+        self._scorer = scorer
+
+    def build_analyzer(self):
+        return self._analyzer
+
+    def transform(self, texts):
+        """CompactFeatures for CompactModel.predict_proba (there is no tf-idf matrix)"""
+        return CompactFeatures(self._scorer.term_counts(texts), len(texts), len(self.vocabulary_))
+
+
+class CompactModel:
+    """classes_ plus the ready-made FusedScorer of a compact artifact"""
+
+    def __init__(self, classes, fused_scorer, manifest, path):
+        self.classes_ = classes
+        self.fused_scorer = fused_scorer
+        self.manifest = manifest
+        self.path = path
+
+    def predict_proba(self, features):
+        """Probabilities for CompactVectorizer.transform() output, via the fused scorer"""
+        if not isinstance(features, CompactFeatures):
+            raise TypeError("Compact models only score CompactVectorizer.transform() output, "
+                            f"not {type(features).__name__}")
+        return self.fused_scorer.proba_from_counts(features.term_counts, features.shape[0])
+
+
+def load_compact(path, mmap=True):
+    """(CompactModel, CompactVectorizer) for a compact artifact directory"""
+    if os.path.basename(path) == MANIFEST:
+        path = os.path.dirname(path)
+    try:
+        with open(os.path.join(path, MANIFEST), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise CompactFormatError(f"Cannot read {MANIFEST} in {path}: {e}") from e
+    if manifest.get('format') != COMPACT_FORMAT:
+        raise CompactFormatError(f"Unknown compact format: {manifest.get('format')}")
+
+    # Read-only mappings: pages are shared by every process mapping the
+    # same files and can be dropped by the kernel instead of swapped
+    mmap_mode = 'r' if mmap else None
+    # (as plain ndarray views: np.memmap adds overhead to every indexing op)
+    arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode).view(np.ndarray)
+              for name in ARRAYS}
+
+    vocabulary = CompactVocabulary(arrays['terms'], arrays['offsets'], arrays['displace'])
+    if len(vocabulary) != manifest['n_features'] or arrays['table'].shape[0] != len(vocabulary):
+        raise CompactFormatError(f"Array sizes in {path} do not match the manifest")
+
+    analyzer = WordAnalyzer(**manifest['analyzer'])
+    scorer = CompactScorer(
+        analyzer, vocabulary, arrays['idf'], arrays['table'],
+        np.asarray(arrays['bias'], dtype=np.float64), manifest['link'],
+        norm=manifest['norm'], sublinear_tf=manifest['sublinear_tf'], binary=manifest['binary']
+    )
+    model = CompactModel(np.asarray(manifest['classes']), scorer, manifest, path)
+    return model, CompactVectorizer(analyzer, vocabulary, scorer)
+
+
+# ==================================================================
+# BUILD
+# ==================================================================
+
+def compact_arrays(vectorizer, model, prune=0.0, dtype=np.float32):
+    """Flat arrays + manifest fields for a fitted (vectorizer, model) pair"""
+    from fused_scorer import _compile_features, _compile_model
+
+    analyzer = WordAnalyzer.from_vectorizer(vectorizer)
+    _, vocabulary, idf, norm, sublinear_tf, binary = _compile_features(vectorizer)
+    weights, bias, link = _compile_model(model, len(vocabulary))
+
+    table = idf[:, None] * weights
+    if link == 'softmax':
+        table -= table.mean(axis=1, keepdims=True)
+    keep = np.abs(table).max(axis=1) > prune
+    if not keep.any():
+        raise CompactFormatError(f"--prune {prune} would drop every term")
+
+    terms = sorted((term for term, column in vocabulary.items() if keep[column]),
+                   key=vocabulary.get)
+    columns = np.array([vocabulary[term] for term in terms], dtype=np.intp)
+    keys = [term.encode('utf-8') for term in terms]
+    displace, slots = build_perfect_hash(keys)
+    # Reorder everything by slot so the slot is the table row
+    keys = [keys[i] for i in slots]
+    columns = columns[slots]
+
+    offsets = np.zeros(len(keys) + 1, dtype=np.uint32)
+    offsets[1:] = np.cumsum([len(key) for key in keys])
+    arrays = {
+        'terms': np.frombuffer(b''.join(keys), dtype=np.uint8),
+        'offsets': offsets,
+        'displace': np.array(displace, dtype=np.uint32),
+        'table': np.ascontiguousarray(table[columns], dtype=dtype),
+        'idf': np.ascontiguousarray(idf[columns], dtype=dtype),
+        'bias': np.asarray(bias, dtype=np.float64),
+    }
+    manifest = {
+        'format': COMPACT_FORMAT,
+        'analyzer': analyzer.config(),
+        'norm': norm,
+        'sublinear_tf': bool(sublinear_tf),
+        'binary': bool(binary),
+        'link': link,
+        'classes': np.asarray(model.classes_).tolist(),
+        'dtype': np.dtype(dtype).name,
+        'n_features': len(keys),
+        'n_features_original': len(vocabulary),
+        'prune': prune,
+    }
+    return arrays, manifest
+
+
+def check_equivalence(model, vectorizer, compact_model, texts):
+    """Compare the compact scorer with vectorizer.transform + predict_proba"""
+    expected = model.predict_proba(vectorizer.transform(texts))
+    actual = compact_model.fused_scorer.predict_proba(texts)
+    expected_labels = model.classes_.take(expected.argmax(axis=1))
+    actual_labels = compact_model.classes_.take(actual.argmax(axis=1))
+    mismatched = int(np.sum(expected_labels != actual_labels))
+    return {
+        'texts': len(texts),
+        'label_mismatches': mismatched,
+        'agreement': 1.0 - mismatched / len(texts),
+        'max_abs_diff': float(np.max(np.abs(expected - actual))),
+        'mean_abs_diff': float(np.mean(np.abs(expected - actual))),
+    }
+
+
+def write_arrays(directory, arrays, manifest):
+    os.makedirs(directory)
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, f'{name}.npy'), array)
+    write_manifest(directory, manifest)
+
+
+def write_manifest(directory, manifest):
+    with open(os.path.join(directory, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+
+def swap_in(tmp_dir, out_dir):
+    """Replace ``out_dir`` with ``tmp_dir`` by rename"""
+    # A running server keeps its mappings of the old files: they are
+    # unlinked, not truncated, so swapping the directory is safe
+    old_dir = None
+    if os.path.exists(out_dir):
+        old_dir = os.path.abspath(out_dir) + f'.{os.getpid()}.old'
+        os.rename(out_dir, old_dir)
+    os.rename(tmp_dir, out_dir)
+    if old_dir is not None:
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def directory_bytes(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path)
+
+
+# ==================================================================
+# FOOTPRINT REPORT
+# ==================================================================
+
+def measure_replica(model_path, vectorizer_path):
+    """Load + warm up like a serving worker; memory of this process in bytes"""
+    import psutil
+
+    process = psutil.Process()
+    before = process.memory_full_info()
+    start = time.perf_counter()
+
+    from model_reloader import warmup
+    from model_runtime import ModelBundle
+
+    bundle = ModelBundle.load(model_path, vectorizer_path)
+    load_seconds = time.perf_counter() - start
+    warmup(bundle)
+    after = process.memory_full_info()
+    return {
+        'rss': after.rss,
+        'uss': after.uss,
+        'load_rss': after.rss - before.rss,
+        'load_seconds': load_seconds,
+        'scorer': bundle.scorer_name,
+        'sklearn_imported': 'sklearn' in sys.modules,
+    }
+
+
+def measure_in_subprocess(model_path, vectorizer_path):
+    """measure_replica() in a fresh interpreter, so imports are counted too"""
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--measure', model_path, vectorizer_path],
+        check=True, capture_output=True, text=True, cwd=BASE_DIR
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def footprint_report(model_path, vectorizer_path, compact_dir, replicas):
+    mb = 1024 * 1024
+    rows = [
+        ('joblib', directory_bytes(model_path) + directory_bytes(vectorizer_path),
+         measure_in_subprocess(model_path, vectorizer_path)),
+        ('compact', directory_bytes(compact_dir),
+         measure_in_subprocess(compact_dir, vectorizer_path)),
+    ]
+
+    print("-" * 78)
+    print(f"{'format':<8} | {'on disk KB':>10} | {'load s':>7} | {'RSS MB':>7} | "
+          f"{'USS MB':>7} | {'load MB':>7} | {'sklearn':>7} | {f'x{replicas} MB':>8}")
+    print("-" * 78)
+    for name, disk, m in rows:
+        print(f"{name:<8} | {disk / 1024:>10.1f} | {m['load_seconds']:>7.2f} | "
+              f"{m['rss'] / mb:>7.1f} | {m['uss'] / mb:>7.1f} | {m['load_rss'] / mb:>7.1f} | "
+              f"{'yes' if m['sklearn_imported'] else 'no':>7} | {m['rss'] * replicas / mb:>8.1f}")
+    print("-" * 78)
+    saved = rows[0][2]['rss'] - rows[1][2]['rss']
+    print(f"RSS per replica: {rows[0][2]['rss'] / mb:.1f} MB -> {rows[1][2]['rss'] / mb:.1f} MB "
+          f"({saved / mb:+.1f} MB saved, {saved * replicas / mb:.1f} MB over {replicas} replicas)")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build compact, memory-mappable model artifacts')
+    parser.add_argument('out_dir', nargs='?', default=os.path.join(BASE_DIR, 'models', 'compact'))
+    parser.add_argument('--model', default=os.path.join(BASE_DIR, 'models', 'spam_detection_model.joblib'))
+    parser.add_argument('--vectorizer', default=os.path.join(BASE_DIR, 'vectorizer.joblib'))
+    parser.add_argument('--prune', type=float, default=0.0,
+                        help='drop terms whose centered |idf * weight| is at most this')
+    parser.add_argument('--dtype', choices=['float32', 'float64'], default='float32')
+    parser.add_argument('--atol', type=float, default=1e-4,
+                        help='largest allowed |p_compact - p_original|')
+    parser.add_argument('--texts', help='file with one text per line to check equivalence on')
+    parser.add_argument('--report', action='store_true',
+                        help='measure per-replica RSS of both formats')
+    parser.add_argument('--replicas', type=int, default=int(os.getenv('SERVING_WORKERS', '2')))
+    parser.add_argument('--measure', nargs=2, metavar=('MODEL', 'VECTORIZER'),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure_replica(*args.measure)))
+        return 0
+
+    import joblib
+
+    from fused_scorer import UnsupportedModelError, verification_texts
+
+    model = joblib.load(args.model)
+    vectorizer = joblib.load(args.vectorizer)
+    try:
+        arrays, manifest = compact_arrays(vectorizer, model, args.prune, np.dtype(args.dtype))
+    except (UnsupportedModelError, CompactFormatError) as e:
+        print(f"✗ Cannot compact these artifacts: {e}")
+        return 1
+
+    if args.texts:
+        with open(args.texts, encoding='utf-8') as f:
+            texts = [line.rstrip('\n') for line in f]
+    else:
+        texts = verification_texts(vectorizer, n=2000)
+
+    # Written next to out_dir and checked through the loader, so the
+    # exact bytes that get swapped in are the ones verified
+    out_dir = os.path.abspath(args.out_dir)
+    os.makedirs(os.path.dirname(out_dir), exist_ok=True)
+    tmp_dir = out_dir + f'.{os.getpid()}.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    write_arrays(tmp_dir, arrays, manifest)
+    try:
+        compact_model, _ = load_compact(tmp_dir)
+        equivalence = check_equivalence(model, vectorizer, compact_model, texts)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    print(f"Terms: {manifest['n_features_original']} -> {manifest['n_features']} "
+          f"(prune {args.prune}), {args.dtype} table")
+    print(f"Equivalence on {equivalence['texts']} texts: "
+          f"{equivalence['label_mismatches']} label mismatch(es), "
+          f"max |dp| = {equivalence['max_abs_diff']:.3g}")
+    if equivalence['label_mismatches'] or equivalence['max_abs_diff'] > args.atol:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        print(f"✗ Not equivalent (atol {args.atol}), nothing written")
+        return 1
+
+    manifest['equivalence'] = dict(equivalence, atol=args.atol)
+    manifest['source'] = {
+        'model': os.path.abspath(args.model),
+        'vectorizer': os.path.abspath(args.vectorizer),
+        'built_at': datetime.now().isoformat(),
+    }
+    write_manifest(tmp_dir, manifest)
+    swap_in(tmp_dir, args.out_dir)
+    print(f"✓ Wrote {args.out_dir} ({directory_bytes(args.out_dir) / 1024:.1f} KB)")
+
+    if args.report:
+        footprint_report(args.model, args.vectorizer, args.out_dir, args.replicas)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,419 @@
+"""
+Drift Monitor untuk Model Serving Endpoint
+Constant-memory streaming statistics of the inputs and predictions of
+/invocations, exported as Prometheus metrics
+
+  confidence / text length  quantiles (p50/p90/p99) from log-bucketed
+                            sketches over a sliding window
+  OOV rate                  share of analyzer tokens that are not in the
+                            vectorizer vocabulary, per 1m/5m/15m window
+  heavy hitters             most frequent tokens from a count-min sketch
+                            (halved every window, so old traffic fades)
+  spam ratio                share of spam predictions per 1m/5m/15m window
+
+The request path only counts the predicted labels and, for a sampled
+fraction of requests (DRIFT_SAMPLE_RATE, at most DRIFT_MAX_ROWS rows
+each), enqueues the texts and confidences. Tokenizing and updating the
+sketches happens on a background thread; when its bounded queue is full
+the sample is dropped and counted. Memory is fixed by the sketch sizes,
+independent of traffic.
+
+Heavy-hitter tokens are label values that change all the time, so
+Prometheus only gets their share by rank; the tokens themselves are in
+the /drift JSON of the serving endpoint.
+"""
+
+import math
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from window_stats import SlidingWindowCounter
+
+
+# ==================================================================
+# DRIFT METRICS
+# ==================================================================
+
+drift_quantile_gauge = Gauge(
+    'spam_serving_drift_quantile',
+    'Sliding-window quantiles of input/prediction features',
+    ['feature', 'quantile'],  # label: confidence/text_length, 0.5/0.9/0.99
+    multiprocess_mode='mostrecent'
+)
+
+drift_oov_rate_gauge = Gauge(
+    'spam_serving_drift_oov_rate',
+    'Share of sampled tokens not in the vectorizer vocabulary',
+    ['window'],  # label: 1m/5m/15m
+    multiprocess_mode='mostrecent'
+)
+
+drift_spam_ratio_gauge = Gauge(
+    'spam_serving_drift_spam_ratio',
+    'Share of spam predictions',
+    ['window'],  # label: 1m/5m/15m
+    multiprocess_mode='mostrecent'
+)
+
+drift_heavy_hitter_gauge = Gauge(
+    'spam_serving_drift_heavy_hitter_share',
+    'Estimated share of sampled tokens taken by the heavy hitter of each rank',
+    ['rank'],
+    multiprocess_mode='mostrecent'
+)
+
+drift_samples_counter = Counter(
+    'spam_serving_drift_samples_total',
+    'Requests seen by the drift monitor by outcome',
+    ['result']  # label: sampled/sampled_out/dropped
+)
+
+drift_update_histogram = Histogram(
+    'spam_serving_drift_update_seconds',
+    'Background time to fold one sampled request into the sketches',
+    buckets=[0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01]
+)
+
+drift_memory_gauge = Gauge(
+    'spam_serving_drift_memory_bytes',
+    'Approximate memory held by the drift sketches',
+    multiprocess_mode='livesum'
+)
+
+
+QUANTILES = (0.5, 0.9, 0.99)
+WINDOWS = {'1m': 60, '5m': 300, '15m': 900}
+
+
+# ==================================================================
+# SKETCHES
+# ==================================================================
+
+class QuantileSketch:
+    """
+    Log-bucketed quantile sketch (DDSketch style)
+
+    Values land in buckets of relative width ``relative_accuracy``, so any
+    quantile is returned within that relative error. At most ``max_bins``
+    buckets are kept; beyond that the lowest ones are merged, which only
+    costs accuracy in the far low tail.
+    """
+
+    __slots__ = ('gamma', '_log_gamma', 'max_bins', 'bins', 'zero_count', 'count')
+
+    def __init__(self, relative_accuracy=0.01, max_bins=512):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.max_bins = max_bins
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value):
+        self.count += 1
+        if value <= 0:
+            self.zero_count += 1
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        bins = self.bins
+        bins[key] = bins.get(key, 0) + 1
+        if len(bins) > self.max_bins:
+            lowest, second = sorted(bins)[:2]
+            bins[second] += bins.pop(lowest)
+
+    def merge(self, other):
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        while len(self.bins) > self.max_bins:
+            lowest, second = sorted(self.bins)[:2]
+            self.bins[second] += self.bins.pop(lowest)
+
+    def quantile(self, q):
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        running = self.zero_count
+        if rank < running:
+            return 0.0
+        for key in sorted(self.bins):
+            running += self.bins[key]
+            if running > rank:
+                # Midpoint of the bucket (gamma^(key-1), gamma^key]
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+    def clear(self):
+        self.bins.clear()
+        self.zero_count = 0
+        self.count = 0
+
+
+class WindowedSketch:
+    """Quantiles over a sliding window: a ring of ``slots`` sketches, one per window/slots"""
+
+    def __init__(self, window_seconds=900, slots=5, relative_accuracy=0.01, max_bins=512):
+        self.slot_seconds = window_seconds / slots
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.sketches = [QuantileSketch(relative_accuracy, max_bins) for _ in range(slots)]
+        self._head = None
+
+    def _advance(self, now):
+        index = int(now // self.slot_seconds)
+        if self._head is None:
+            self._head = index
+        elif index > self._head:
+            for i in range(1, min(index - self._head, len(self.sketches)) + 1):
+                self.sketches[(self._head + i) % len(self.sketches)].clear()
+            self._head = index
+        return self.sketches[self._head % len(self.sketches)]
+
+    def add(self, now, value):
+        self._advance(now).add(value)
+
+    def quantiles(self, now, quantiles=QUANTILES):
+        self._advance(now)
+        merged = QuantileSketch(self.relative_accuracy, self.max_bins)
+        for sketch in self.sketches:
+            merged.merge(sketch)
+        return {q: merged.quantile(q) for q in quantiles}
+
+
+class HeavyHitters:
+    """
+    Count-min sketch with a top-k candidate table
+
+    ``depth`` rows of ``width`` counters; a token's count is the minimum
+    over its row cells (never under-estimated). Counts are halved by
+    ``decay()`` so the ranking follows recent traffic.
+    """
+
+    def __init__(self, width=2048, depth=4, k=20):
+        self.width = width
+        self.depth = depth
+        self.k = k
+        self.rows = [[0] * width for _ in range(depth)]
+        self.top = {}  # token -> estimated count
+        self.total = 0
+
+    def _cells(self, token):
+        h = hash(token)
+        h1, h2 = h & 0xFFFFFFFF, ((h >> 32) & 0xFFFFFFFF) | 1
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def add(self, token, count=1):
+        self.total += count
+        estimate = None
+        for row, cell in zip(self.rows, self._cells(token)):
+            row[cell] += count
+            if estimate is None or row[cell] < estimate:
+                estimate = row[cell]
+
+        top = self.top
+        if token in top or len(top) < self.k:
+            top[token] = estimate
+            return
+        smallest = min(top, key=top.get)
+        if estimate > top[smallest]:
+            del top[smallest]
+            top[token] = estimate
+
+    def decay(self):
+        for row in self.rows:
+            for i, value in enumerate(row):
+                if value:
+                    row[i] = value >> 1
+        self.top = {token: count >> 1 for token, count in self.top.items() if count > 1}
+        self.total >>= 1
+
+    def most_common(self):
+        return sorted(self.top.items(), key=lambda item: item[1], reverse=True)
+
+
+# ==================================================================
+# MONITOR
+# ==================================================================
+
+class DriftMonitor:
+    """Sampled, background-updated drift statistics for /invocations"""
+
+    def __init__(self, sample_rate=0.1, max_rows=32, max_queue=1000, window_seconds=900,
+                 slots=5, top_k=20, export_interval=15.0, clock=time.monotonic):
+        self.sample_rate = min(1.0, max(0.0, sample_rate))
+        self.max_rows = max(1, max_rows)
+        self.max_queue = max_queue
+        self.window_seconds = window_seconds
+        self.export_interval = export_interval
+        self._clock = clock
+
+        self.confidence = WindowedSketch(window_seconds, slots, relative_accuracy=0.001)
+        self.text_length = WindowedSketch(window_seconds, slots, relative_accuracy=0.01)
+        self.heavy_hitters = HeavyHitters(k=top_k)
+        longest = max(WINDOWS.values())
+        self._tokens = SlidingWindowCounter(longest, bucket_seconds=5.0)
+        self._oov = SlidingWindowCounter(longest, bucket_seconds=5.0)
+        self._predictions = SlidingWindowCounter(longest, bucket_seconds=1.0)
+        self._spam = SlidingWindowCounter(longest, bucket_seconds=1.0)
+
+        self._analyzers = {}  # id(vectorizer) -> (vectorizer, analyzer, vocabulary)
+        self._last_decay = clock()
+        self._last_export = 0.0
+        self._lock = threading.Lock()  # sketches (background thread vs snapshot)
+        self._count_lock = threading.Lock()  # label counters (request threads)
+        self._pid = None
+        self._sampled = drift_samples_counter.labels(result='sampled')
+        self._sampled_out = drift_samples_counter.labels(result='sampled_out')
+        self._dropped = drift_samples_counter.labels(result='dropped')
+        self._start()
+
+    def _start(self):
+        # Threads do not survive a fork: a prefork worker starts its own
+        self._pid = os.getpid()
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._thread = threading.Thread(target=self._run, name='drift-monitor', daemon=True)
+        self._thread.start()
+
+    # -- request path ---------------------------------------------------
+
+    def observe(self, vectorizer, texts, predictions, probabilities):
+        """Count the labels of one request and maybe enqueue it for the sketches"""
+        now = self._clock()
+        spam = int(predictions.sum())
+        with self._count_lock:
+            self._predictions.add(now, len(predictions))
+            self._spam.add(now, spam)
+
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            self._sampled_out.inc()
+            return
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._start()
+
+        step = max(1, math.ceil(len(texts) / self.max_rows))
+        sample = texts[::step]
+        confidences = probabilities[::step].max(axis=1).tolist()
+        try:
+            self._queue.put_nowait((vectorizer, sample, confidences))
+        except queue.Full:
+            self._dropped.inc()
+            return
+        self._sampled.inc()
+
+    # -- background thread ----------------------------------------------
+
+    def _analyzer(self, vectorizer):
+        entry = self._analyzers.get(id(vectorizer))
+        if entry is None or entry[0] is not vectorizer:
+            # Hot reload brings a new vectorizer; only the current one is kept
+            entry = (vectorizer, vectorizer.build_analyzer(), vectorizer.vocabulary_)
+            self._analyzers = {id(vectorizer): entry}
+        return entry[1], entry[2]
+
+    def _update(self, vectorizer, texts, confidences):
+        start = time.perf_counter()
+        analyzer, vocabulary = self._analyzer(vectorizer)
+        now = self._clock()
+        tokens = oov = 0
+        with self._lock:
+            for text, confidence in zip(texts, confidences):
+                self.confidence.add(now, confidence)
+                self.text_length.add(now, len(text))
+                for token in analyzer(text):
+                    tokens += 1
+                    if token not in vocabulary:
+                        oov += 1
+                    self.heavy_hitters.add(token)
+            self._tokens.add(now, tokens)
+            self._oov.add(now, oov)
+            if now - self._last_decay >= self.window_seconds:
+                self._last_decay = now
+                self.heavy_hitters.decay()
+        drift_update_histogram.observe(time.perf_counter() - start)
+
+    def _run(self):
+        own_queue = self._queue
+        while True:
+            try:
+                item = own_queue.get(timeout=self.export_interval)
+            except queue.Empty:
+                item = None
+            if item is not None:
+                try:
+                    self._update(*item)
+                except Exception as e:
+                    print(f"Drift monitor update failed: {e}")
+            if time.monotonic() - self._last_export >= self.export_interval:
+                self._last_export = time.monotonic()
+                self.export()
+
+    # -- export ---------------------------------------------------------
+
+    def snapshot(self):
+        """Current statistics (also served as /drift)"""
+        now = self._clock()
+        with self._count_lock:
+            predictions = {name: self._predictions.total(now, s) for name, s in WINDOWS.items()}
+            spam = {name: self._spam.total(now, s) for name, s in WINDOWS.items()}
+        with self._lock:
+            tokens = {name: self._tokens.total(now, s) for name, s in WINDOWS.items()}
+            oov = {name: self._oov.total(now, s) for name, s in WINDOWS.items()}
+            confidence = self.confidence.quantiles(now)
+            text_length = self.text_length.quantiles(now)
+            total = self.heavy_hitters.total
+            heavy_hitters = [
+                {'token': token, 'count': count, 'share': count / total if total else 0.0}
+                for token, count in self.heavy_hitters.most_common()
+            ]
+        return {
+            'quantiles': {
+                'confidence': {str(q): v for q, v in confidence.items()},
+                'text_length': {str(q): v for q, v in text_length.items()},
+            },
+            'oov_rate': {name: _ratio(oov[name], tokens[name]) for name in WINDOWS},
+            'spam_ratio': {name: _ratio(spam[name], predictions[name]) for name in WINDOWS},
+            'predictions': predictions,
+            'heavy_hitters': heavy_hitters,
+            'sample_rate': self.sample_rate,
+            'memory_bytes': self.memory_bytes(),
+        }
+
+    def export(self):
+        """Copy the snapshot into the Prometheus gauges"""
+        snapshot = self.snapshot()
+        for feature, values in snapshot['quantiles'].items():
+            for q, value in values.items():
+                if value is not None:
+                    drift_quantile_gauge.labels(feature=feature, quantile=q).set(value)
+        for window in WINDOWS:
+            drift_oov_rate_gauge.labels(window=window).set(snapshot['oov_rate'][window])
+            drift_spam_ratio_gauge.labels(window=window).set(snapshot['spam_ratio'][window])
+        hitters = snapshot['heavy_hitters']
+        for rank in range(1, self.heavy_hitters.k + 1):
+            share = hitters[rank - 1]['share'] if rank <= len(hitters) else 0.0
+            drift_heavy_hitter_gauge.labels(rank=str(rank)).set(share)
+        drift_memory_gauge.set(snapshot['memory_bytes'])
+        return snapshot
+
+    def memory_bytes(self):
+        """Approximate size of the sketches (bounded by their configuration)"""
+        size = sum(sys.getsizeof(row) + 28 * len(row) for row in self.heavy_hitters.rows)
+        size += sys.getsizeof(self.heavy_hitters.top) + 64 * len(self.heavy_hitters.top)
+        for windowed in (self.confidence, self.text_length):
+            size += sum(sys.getsizeof(s.bins) + 56 * len(s.bins) for s in windowed.sketches)
+        for counter in (self._tokens, self._oov, self._predictions, self._spam):
+            size += sys.getsizeof(counter._buckets) + 28 * counter.size
+        return size
+
+
+def _ratio(part, whole):
+    return part / whole if whole else 0.0
@@ -0,0 +1,272 @@
+"""
+Fused Scorer untuk Spam Detection
+Scores texts straight from their tokens with a precompiled token -> weight
+table, instead of vectorizer.transform() (scipy CSR) + model.predict_proba()
+
+For a linear model on TF-IDF features the score of class k is
+
+    bias[k] + sum_t tf(t) * idf(t) * W[t, k] / ||tf * idf||
+
+so idf(t) * W[t, k] can be folded into one table at compile time. Supported:
+  vectorizer: TfidfVectorizer / CountVectorizer (any analyzer, norm l1/l2/None)
+  model:      MultinomialNB, binary LogisticRegression
+
+Anything else raises UnsupportedModelError and callers keep the sklearn path.
+
+Usage:
+  python fused_scorer.py --verify
+  python fused_scorer.py --verify --texts messages.txt
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+
+class UnsupportedModelError(ValueError):
+    """The vectorizer/model pair cannot be compiled into a fused table"""
+
+
+def _compile_features(vectorizer):
+    """(analyzer, vocabulary, idf, norm, sublinear_tf, binary) for a fitted vectorizer"""
+    from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+
+    if not isinstance(vectorizer, CountVectorizer):
+        raise UnsupportedModelError(f"Unsupported vectorizer: {type(vectorizer).__name__}")
+    if not hasattr(vectorizer, 'vocabulary_'):
+        raise UnsupportedModelError("Vectorizer is not fitted")
+
+    n_features = len(vectorizer.vocabulary_)
+    if isinstance(vectorizer, TfidfVectorizer):
+        if vectorizer.norm not in (None, 'l1', 'l2'):
+            raise UnsupportedModelError(f"Unsupported norm: {vectorizer.norm}")
+        if vectorizer.use_idf:
+            idf = np.asarray(vectorizer.idf_, dtype=np.float64)
+        else:
+            idf = np.ones(n_features)
+        norm = vectorizer.norm
+        sublinear_tf = vectorizer.sublinear_tf
+    else:
+        idf = np.ones(n_features)
+        norm = None
+        sublinear_tf = False
+
+    return (vectorizer.build_analyzer(), dict(vectorizer.vocabulary_), idf,
+            norm, sublinear_tf, vectorizer.binary)
+
+
+def _compile_model(model, n_features):
+    """(weights (n_features, n_outputs), bias, link) for a fitted linear model"""
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.naive_bayes import MultinomialNB
+
+    if type(model) is MultinomialNB:
+        weights = np.asarray(model.feature_log_prob_, dtype=np.float64).T
+        bias = np.asarray(model.class_log_prior_, dtype=np.float64)
+        link = 'softmax'
+    elif type(model) is LogisticRegression and len(model.classes_) == 2:
+        weights = np.asarray(model.coef_, dtype=np.float64).T
+        bias = np.asarray(model.intercept_, dtype=np.float64)
+        link = 'logistic'
+    else:
+        raise UnsupportedModelError(f"Unsupported model: {type(model).__name__}")
+
+    if weights.shape[0] != n_features:
+        raise UnsupportedModelError(
+            f"Model expects {weights.shape[0]} features, vectorizer has {n_features}"
+        )
+    return weights, bias, link
+
+
+class FusedScorer:
+    """Token -> weight table equivalent to vectorizer.transform + model.predict_proba"""
+
+    def __init__(self, analyzer, vocabulary, idf, table, bias, link,
+                 norm='l2', sublinear_tf=False, binary=False):
+        self.analyzer = analyzer
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.table = table  # idf[:, None] * weights, one row per term
+        self.bias = bias
+        self.link = link
+        self.norm = norm
+        self.sublinear_tf = sublinear_tf
+        self.binary = binary
+
+    @classmethod
+    def compile(cls, vectorizer, model):
+        analyzer, vocabulary, idf, norm, sublinear_tf, binary = _compile_features(vectorizer)
+        weights, bias, link = _compile_model(model, len(vocabulary))
+        table = np.ascontiguousarray(idf[:, None] * weights)
+        return cls(analyzer, vocabulary, idf, table, bias, link,
+                   norm=norm, sublinear_tf=sublinear_tf, binary=binary)
+
+    def term_counts(self, texts):
+        """(row, column, count) arrays of in-vocabulary term counts, the input of *_from_counts()"""
+        rows, columns, counts = [], [], []
+        vocabulary = self.vocabulary
+        for row, text in enumerate(texts):
+            doc = {}
+            for term in self.analyzer(text):
+                column = vocabulary.get(term)
+                if column is not None:
+                    doc[column] = doc.get(column, 0) + 1
+            rows.extend([row] * len(doc))
+            columns.extend(doc.keys())
+            counts.extend(doc.values())
+        return (np.array(rows, dtype=np.intp),
+                np.array(columns, dtype=np.intp),
+                np.array(counts, dtype=np.float64))
+
+    def decision_function(self, texts):
+        """Raw linear scores, shape (n_texts, n_outputs)"""
+        return self.decision_from_counts(self.term_counts(texts), len(texts))
+
+    def decision_from_counts(self, term_counts, n):
+        """decision_function() for the output of term_counts()"""
+        rows, columns, tf = term_counts
+        if self.binary:
+            tf = np.ones_like(tf)
+        elif self.sublinear_tf:
+            tf = np.log(tf) + 1.0
+
+        scores = np.empty((n, self.table.shape[1]))
+        for k in range(self.table.shape[1]):
+            scores[:, k] = np.bincount(rows, weights=tf * self.table[columns, k], minlength=n)
+
+        if self.norm is not None:
+            weights = tf * self.idf[columns]
+            if self.norm == 'l2':
+                norms = np.sqrt(np.bincount(rows, weights=weights * weights, minlength=n))
+            else:
+                norms = np.bincount(rows, weights=np.abs(weights), minlength=n)
+            norms[norms == 0.0] = 1.0
+            scores /= norms[:, None]
+
+        return scores + self.bias
+
+    def predict_proba(self, texts):
+        return self.proba_from_counts(self.term_counts(texts), len(texts))
+
+    def proba_from_counts(self, term_counts, n):
+        """predict_proba() for the output of term_counts()"""
+        scores = self.decision_from_counts(term_counts, n)
+        if self.link == 'logistic':
+            positive = 1.0 / (1.0 + np.exp(-scores[:, 0]))
+            return np.column_stack([1.0 - positive, positive])
+        scores -= scores.max(axis=1, keepdims=True)
+        np.exp(scores, out=scores)
+        scores /= scores.sum(axis=1, keepdims=True)
+        return scores
+
+
+# ==================================================================
+# EQUIVALENCE CHECK
+# ==================================================================
+
+SAMPLE_TEXTS = [
+    "",
+    "CONGRATULATIONS! You have won $1,000,000! Click here to claim your prize!",
+    "Hi, can we meet for coffee tomorrow at 3pm?",
+    "URGENT! Your account will be closed. Verify now at fake-link.com",
+    "FREE FREE FREE! Click now to win!",
+    "Selamat! Anda memenangkan hadiah, hubungi nomor ini sekarang",
+    "zzqx qqzv xyzzy",
+]
+
+
+def verification_texts(vectorizer, n=200, seed=0):
+    """Fixed sample messages plus random mixes of vocabulary terms"""
+    rng = np.random.default_rng(seed)
+    terms = sorted(vectorizer.vocabulary_)
+    texts = list(SAMPLE_TEXTS)
+    for _ in range(n):
+        picked = rng.choice(terms, size=rng.integers(1, 40))
+        texts.append(' '.join(t.upper() if rng.random() < 0.2 else t for t in picked))
+    return texts
+
+
+def max_difference(scorer, vectorizer, model, texts):
+    """(max |p_fused - p_sklearn|, number of differing labels)"""
+    expected = model.predict_proba(vectorizer.transform(texts))
+    actual = scorer.predict_proba(texts)
+    mismatched = int(np.sum(expected.argmax(axis=1) != actual.argmax(axis=1)))
+    return float(np.max(np.abs(expected - actual))), mismatched
+
+
+def verify(scorer, vectorizer, model, texts=None, atol=1e-9):
+    """Raise AssertionError unless the fused scorer matches sklearn on ``texts``"""
+    if texts is None:
+        texts = verification_texts(vectorizer)
+    difference, mismatched = max_difference(scorer, vectorizer, model, texts)
+    if difference > atol or mismatched:
+        raise AssertionError(
+            f"Fused scorer differs from sklearn: max |dp| = {difference:.3g}, "
+            f"{mismatched} label(s) differ"
+        )
+    return difference
+
+
+def main():
+    import joblib
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description='Compile and verify the fused scorer')
+    parser.add_argument('--verify', action='store_true',
+                        help='compare against vectorizer.transform + predict_proba')
+    parser.add_argument('--texts', help='file with one text per line to verify on')
+    parser.add_argument('--model', default=os.path.join(base_dir, 'models', 'spam_detection_model.joblib'))
+    parser.add_argument('--vectorizer', default=os.path.join(base_dir, 'vectorizer.joblib'))
+    parser.add_argument('--atol', type=float, default=1e-9)
+    args = parser.parse_args()
+
+    model = joblib.load(args.model)
+    vectorizer = joblib.load(args.vectorizer)
+
+    try:
+        scorer = FusedScorer.compile(vectorizer, model)
+    except UnsupportedModelError as e:
+        print(f"Not supported, sklearn path will be used: {e}")
+        return 1
+    print(f"Compiled {len(scorer.vocabulary)} terms x {scorer.table.shape[1]} outputs "
+          f"({type(model).__name__}, norm={scorer.norm}, link={scorer.link})")
+
+    if not args.verify:
+        return 0
+
+    if args.texts:
+        with open(args.texts, encoding='utf-8') as f:
+            texts = [line.rstrip('\n') for line in f]
+    else:
+        texts = verification_texts(vectorizer, n=2000)
+
+    try:
+        difference = verify(scorer, vectorizer, model, texts, atol=args.atol)
+    except AssertionError as e:
+        print(f"✗ {e}")
+        return 1
+    print(f"✓ {len(texts)} texts match (max |dp| = {difference:.3g})")
+
+    print("-" * 60)
+    print(f"{'batch':>7} | {'sklearn us':>11} | {'fused us':>9} | {'speedup':>7}")
+    for batch_size in (1, 10, 100, 1000):
+        batch = (texts * (batch_size // len(texts) + 1))[:batch_size]
+        timings = []
+        for fn in (lambda: model.predict_proba(vectorizer.transform(batch)),
+                   lambda: scorer.predict_proba(batch)):
+            fn()
+            repeat = max(5, 2000 // batch_size)
+            start = time.perf_counter()
+            for _ in range(repeat):
+                fn()
+            timings.append((time.perf_counter() - start) / repeat)
+        print(f"{batch_size:>7} | {timings[0] * 1e6:>11.1f} | {timings[1] * 1e6:>9.1f} | "
+              f"{timings[0] / timings[1]:>6.1f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
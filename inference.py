@@ -3,15 +3,27 @@ Inference API untuk Spam Detection Model
 dengan Prometheus Metrics Integration
 """
 
-from flask import Flask, request, jsonify
-from prometheus_client import Counter, Histogram, Gauge, generate_latest, REGISTRY
-import joblib
+from flask import Flask, g, request, jsonify
+from prometheus_client import Counter, Histogram, Gauge
+import threading
 import time
-import psutil
 import os
-import requests
 from datetime import datetime
 
+from admission import AdaptiveLimiter, AdmissionController, ClientRateLimiter, Rejected, client_id
+from micro_batcher import MicroBatcher
+from prediction_log import PredictionLog
+from prometheus_exporter import CONTENT_TYPE, render_latest
+from prediction_cache import PredictionCache
+from replica_router import ReplicaRouter
+from stage_timing import NULL_TIMER, STAGE_BUCKETS, start_timer
+from startup import StartupTracker
+from system_sampler import SystemSampler
+from window_stats import SlidingWindowStats
+from wire_format import JSON, available_formats
+
+
+startup = StartupTracker('spam_detector')
 
 app = Flask(__name__)
 
@@ -20,30 +32,296 @@ app = Flask(__name__)
 # ==================================================================
 # Instead of loading model locally, we use the Docker serving endpoint
 # This follows MLOps best practice: inference API calls serving endpoint
+#
+# SERVING_MODE=local loads the same artifacts into this process instead,
+# for latency-sensitive deployments where both run on the same host.
+# Remote mode stays the default and the fallback.
+
+API_PORT = int(os.getenv('API_PORT', '8000'))
 
+# One serving endpoint, or a comma-separated list of replicas
 SERVING_URL = os.getenv('SERVING_URL', 'http://localhost:5001')
+SERVING_URLS = [url.strip() for url in SERVING_URL.split(',') if url.strip()]
+SERVING_MODE = os.getenv('SERVING_MODE', 'remote').lower()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOCAL_MODEL_PATH = os.getenv(
+    'MODEL_PATH', os.path.join(BASE_DIR, 'models', 'spam_detection_model.joblib')
+)
+LOCAL_VECTORIZER_PATH = os.getenv(
+    'VECTORIZER_PATH', os.path.join(BASE_DIR, 'vectorizer.joblib')
+)
+
+# Seconds between dependency checks until the serving endpoint first answers
+DEPENDENCY_RETRY_INTERVAL = float(os.getenv('DEPENDENCY_RETRY_INTERVAL', '2'))
+
+backend_init_start = time.perf_counter()
+
+local_engine = None
+if SERVING_MODE == 'local':
+    # Imported here: remote mode never needs numpy/joblib/sklearn
+    from model_runtime import ModelBundle
+    try:
+        with startup.phase('model_load'):
+            local_engine = ModelBundle.load(LOCAL_MODEL_PATH, LOCAL_VECTORIZER_PATH)
+    except Exception as e:
+        print(f"[WARNING] Could not load local model, falling back to remote serving: {e}")
+
+# /invocations response encoding asked from the serving tier (wire_format.py);
+# endpoints that do not support it keep answering JSON
+SERVING_WIRE_FORMAT = os.getenv('SERVING_WIRE_FORMAT', JSON).lower()
+if SERVING_WIRE_FORMAT not in available_formats():
+    print(f"[WARNING] SERVING_WIRE_FORMAT={SERVING_WIRE_FORMAT} is not available "
+          f"(choose from {available_formats()}), using JSON")
+    SERVING_WIRE_FORMAT = JSON
+
+# Shared keep-alive connection pools to the serving replicas, with
+# least-outstanding-requests routing, health probing and circuit breaking
+serving_client = None
+if local_engine is None:
+    serving_client = ReplicaRouter(
+        SERVING_URLS,
+        pool_size=int(os.getenv('SERVING_POOL_SIZE', '20')),
+        connect_timeout=float(os.getenv('SERVING_CONNECT_TIMEOUT', '2')),
+        read_timeout=float(os.getenv('SERVING_TIMEOUT', '10')),
+        max_retries=int(os.getenv('SERVING_MAX_RETRIES', '2')),
+        retry_backoff=float(os.getenv('SERVING_RETRY_BACKOFF', '0.05')),
+        probe_interval=float(os.getenv('SERVING_PROBE_INTERVAL', '2')),
+        failure_threshold=int(os.getenv('SERVING_BREAKER_FAILURES', '5')),
+        reset_timeout=float(os.getenv('SERVING_BREAKER_RESET', '10')),
+        hedge=os.getenv('SERVING_HEDGE', 'false').lower() == 'true',
+        hedge_percentile=float(os.getenv('SERVING_HEDGE_PERCENTILE', '95')),
+        wire_format=SERVING_WIRE_FORMAT
+    )
+
+# Backend used for /predict and /health: in-process engine or serving endpoint
+serving_backend = local_engine if local_engine is not None else serving_client
+SERVED_BY = 'local_engine' if local_engine is not None else 'docker_endpoint'
+
+# Optional micro-batching: concurrent /predict calls share one /invocations request
+BATCHING_ENABLED = os.getenv('BATCHING_ENABLED', 'false').lower() == 'true'
+
+micro_batcher = None
+if BATCHING_ENABLED:
+    micro_batcher = MicroBatcher(
+        serving_backend.invoke,
+        max_batch_size=int(os.getenv('BATCH_MAX_SIZE', '32')),
+        max_wait_ms=float(os.getenv('BATCH_MAX_WAIT_MS', '5')),
+        max_concurrency=int(os.getenv('BATCH_MAX_CONCURRENCY', '4')),
+        timeout=float(os.getenv('SERVING_TIMEOUT', '10')) + 1
+    )
+
+# Prediction cache: repeated campaign texts skip the model entirely
+CACHE_ENABLED = os.getenv('CACHE_ENABLED', 'true').lower() == 'true'
+
+prediction_cache = None
+if CACHE_ENABLED:
+    prediction_cache = PredictionCache(
+        max_entries=int(os.getenv('CACHE_MAX_ENTRIES', '10000')),
+        ttl_seconds=float(os.getenv('CACHE_TTL_SECONDS', '300'))
+    )
+    # A hot reload on the serving tier shows up in the next /health probe
+    if serving_client is not None:
+        serving_client.model_version_listeners.append(prediction_cache.observe_model_version)
+
+# Prediction log: sampled records for auditing/retraining, written off the request path.
+# Off by default: records contain the raw message text
+PREDICTION_LOG_ENABLED = os.getenv('PREDICTION_LOG_ENABLED', 'false').lower() == 'true'
+
+prediction_log = None
+if PREDICTION_LOG_ENABLED:
+    prediction_log = PredictionLog(
+        os.getenv('PREDICTION_LOG_DIR', os.path.join(BASE_DIR, 'logs', 'predictions')),
+        fmt=os.getenv('PREDICTION_LOG_FORMAT', 'jsonl'),
+        sample_rate=float(os.getenv('PREDICTION_LOG_SAMPLE_RATE', '1.0')),
+        max_queue=int(os.getenv('PREDICTION_LOG_QUEUE_SIZE', '10000')),
+        max_bytes=int(os.getenv('PREDICTION_LOG_MAX_MB', '64')) * 1024 * 1024,
+        rotate_seconds=float(os.getenv('PREDICTION_LOG_ROTATE_SECONDS', '3600')),
+        max_files=int(os.getenv('PREDICTION_LOG_MAX_FILES', '24')),
+        max_total_bytes=int(os.getenv('PREDICTION_LOG_MAX_TOTAL_MB', '1024')) * 1024 * 1024
+    )
+
+# Admission control: adaptive concurrency limit and load shedding for /predict
+ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'false').lower() == 'true'
+ADMISSION_CLIENT_RATE = float(os.getenv('ADMISSION_CLIENT_RATE', '0'))
+
+admission = None
+if ADMISSION_ENABLED:
+    admission = AdmissionController(
+        AdaptiveLimiter(
+            initial_limit=int(os.getenv('ADMISSION_INITIAL_LIMIT', '20')),
+            min_limit=int(os.getenv('ADMISSION_MIN_LIMIT', '2')),
+            max_limit=int(os.getenv('ADMISSION_MAX_LIMIT', '200')),
+            max_queue=int(os.getenv('ADMISSION_QUEUE_SIZE', '50')),
+            queue_timeout=float(os.getenv('ADMISSION_QUEUE_TIMEOUT_MS', '500')) / 1000.0,
+            latency_target=float(os.getenv('ADMISSION_LATENCY_TARGET_MS', '0')) / 1000.0
+        ),
+        rate_limiter=ClientRateLimiter(
+            ADMISSION_CLIENT_RATE,
+            burst=float(os.getenv('ADMISSION_CLIENT_BURST', '20'))
+        ) if ADMISSION_CLIENT_RATE > 0 else None
+    )
+
+
+startup.record('backend_init', time.perf_counter() - backend_init_start)
+
+
+def invoke_backend(text, timings=None):
+    """
+    Score one text through the micro-batcher or a direct backend call
+
+    ``timings`` (dict) receives 'remote', the duration of the backend call,
+    and 'serving', the stages reported in the serving Server-Timing header.
+    """
+    if timings is None:
+        if micro_batcher is not None:
+            return micro_batcher.submit(text)
+        return serving_backend.invoke([text])
+
+    start = time.perf_counter()
+    if micro_batcher is not None:
+        result = micro_batcher.submit(text)
+    elif serving_backend is serving_client:
+        timings['serving'] = {}
+        result = serving_client.invoke([text], server_timing=timings['serving'])
+    else:
+        result = serving_backend.invoke([text])
+    timings['remote'] = time.perf_counter() - start
+    return result
+
+
+def run_inference(text, timings=None):
+    """Score one text, going through the prediction cache when enabled"""
+    if prediction_cache is not None:
+        if timings is None:
+            return prediction_cache.get_or_compute(text, invoke_backend)
+        return prediction_cache.get_or_compute(text, lambda t: invoke_backend(t, timings))
+    return invoke_backend(text, timings)
+
+
+def record_remote_timings(timer, timings):
+    """Close the cache/remote stages and observe the network time of the serving call"""
+    remote = timings.get('remote')
+    if remote is None:
+        timer.mark('cache')  # cache hit, or an identical request was in flight
+        return
+    timer.mark_split('cache', 'remote', remote)
+    serving_total = timings.get('serving', {}).get('total')
+    if serving_total is not None:
+        serving_network_histogram.observe(max(0.0, remote - serving_total))
+
+
+def set_server_timing(headers, timer, timings):
+    """Observe the /predict stages and expose them (plus the serving ones) in Server-Timing"""
+    timer.mark('respond')
+    timer.observe(stage_histogram, _stage_children)
+    serving = {f'serving-{name}': seconds
+               for name, seconds in (timings or {}).get('serving', {}).items()}
+    server_timing = timer.header(serving)
+    if server_timing:
+        headers['Server-Timing'] = server_timing
+
+
+def observe_admission(timings, failed=False):
+    """Feed the serving call outcome into the adaptive limit (cache hits are skipped)"""
+    if admission is None:
+        return
+    if failed:
+        admission.observe_failure()
+    elif timings is not None and 'remote' in timings:
+        admission.observe(timings['remote'])
+
+
+def rejection_response(error):
+    return jsonify({
+        'error': 'Too many requests',
+        'reason': error.reason,
+        'retry_after': error.retry_after,
+        'timestamp': datetime.now().isoformat()
+    }), 429, {'Retry-After': str(error.retry_after)}
+
+
+@app.before_request
+def admit_prediction():
+    """Admission control for /predict: 429 with Retry-After instead of queueing forever"""
+    if admission is None or request.endpoint != 'predict':
+        return None
+    try:
+        admission.admit(client_id(request.headers, request.remote_addr))
+    except Rejected as e:
+        return rejection_response(e)
+    g.admitted = True
+    return None
+
+
+@app.teardown_request
+def release_prediction(exc):
+    if g.pop('admitted', False):
+        admission.release()
+
+
+def log_prediction(text, serving_result, inference_duration):
+    """Enqueue the prediction for the prediction log (no I/O on the request path)"""
+    if prediction_log is None:
+        return
+    prediction_data = serving_result['predictions'][0]
+    prediction_log.log({
+        'ts': time.time(),
+        'text': text,
+        'prediction': prediction_data['prediction'],
+        'confidence': prediction_data['confidence'],
+        'model_version': serving_result.get('model_version'),
+        'inference_ms': round(inference_duration * 1000, 3),
+        'served_by': SERVED_BY
+    })
+
 
 print("=" * 60)
 print("SPAM DETECTION INFERENCE API")
 print("=" * 60)
-print(f"Using model serving endpoint: {SERVING_URL}")
-print("Verifying endpoint availability...")
-
-try:
-    import requests
-    response = requests.get(f"{SERVING_URL}/health", timeout=5)
-    if response.status_code == 200:
-        health = response.json()
-        if health.get('status') == 'healthy':
-            print("[OK] Serving endpoint is healthy and ready!")
-        else:
-            print("[WARNING] Serving endpoint returned unhealthy status")
-    else:
-        print(f"[WARNING] Serving endpoint returned status code {response.status_code}")
-except Exception as e:
-    print(f"[WARNING] Could not connect to serving endpoint: {e}")
-    print("  Make sure the serving container is running:")
-    print("  Run: .\\setup_serving.ps1")
+if local_engine is not None:
+    print(f"Using local inference engine: {LOCAL_MODEL_PATH}")
+else:
+    print(f"Using model serving endpoint(s): {', '.join(SERVING_URLS)} "
+          f"(wire format: {SERVING_WIRE_FORMAT})")
+if BATCHING_ENABLED:
+    print(f"Micro-batching enabled (max size {micro_batcher.max_batch_size}, "
+          f"max wait {micro_batcher.max_wait * 1000:.1f} ms)")
+
+
+
+def check_serving_dependency():
+    """Poll the serving endpoint until it answers healthy, then mark this API ready"""
+    start = time.perf_counter()
+    warned = False
+    while True:
+        try:
+            health = serving_client.health(timeout=5)
+            if health.get('status') == 'healthy':
+                startup.record('dependency_check', time.perf_counter() - start)
+                startup.mark_ready()
+                print("[OK] Serving endpoint is healthy and ready!")
+                return
+            error = "Serving endpoint returned unhealthy status"
+        except Exception as e:
+            error = f"Could not connect to serving endpoint: {e}"
+        startup.mark_failed(error)
+        if not warned:
+            print(f"[WARNING] {error}")
+            print("  Make sure the serving container is running:")
+            print("  Run: .\\setup_serving.ps1")
+            print(f"  Retrying every {DEPENDENCY_RETRY_INTERVAL:.0f}s, /readyz returns 503 until then")
+            warned = True
+        time.sleep(DEPENDENCY_RETRY_INTERVAL)
+
+
+# The dependency check runs in the background so the server starts
+# listening right away; /readyz reports when the backend is usable
+if local_engine is None:
+    print("Verifying endpoint availability in the background...")
+    threading.Thread(target=check_serving_dependency, name='dependency-check', daemon=True).start()
+else:
+    startup.mark_ready()
 
 print("=" * 60)
 
@@ -88,122 +366,178 @@ inference_latency_histogram = Histogram(
 # 7. Error Rate Gauge
 error_rate_gauge = Gauge(
     'spam_detector_error_rate_percent',
-    'Current error rate percentage'
+    'Current error rate percentage',
+    multiprocess_mode='livemax'
 )
 
 # 8. CPU Usage Gauge
 cpu_usage_gauge = Gauge(
     'spam_detector_cpu_usage_percent',
-    'Current CPU usage percentage'
+    'Current CPU usage percentage',
+    multiprocess_mode='mostrecent'
 )
 
 # 9. Memory Usage Gauge
 memory_usage_gauge = Gauge(
     'spam_detector_memory_usage_percent',
-    'Current memory usage percentage'
+    'Current memory usage percentage',
+    multiprocess_mode='mostrecent'
 )
 
 # 10. Disk Usage Gauge
 disk_usage_gauge = Gauge(
     'spam_detector_disk_usage_percent',
-    'Current disk usage percentage'
+    'Current disk usage percentage',
+    multiprocess_mode='mostrecent'
 )
 
 # 11. Request Rate Gauge
 request_rate_gauge = Gauge(
     'spam_detector_request_rate_per_minute',
-    'Current request rate per minute'
+    'Current request rate per minute',
+    multiprocess_mode='livesum'
 )
 
 # 12. Active Connections Gauge
 active_connections_gauge = Gauge(
     'spam_detector_active_connections',
-    'Number of active connections'
+    'Number of active connections',
+    multiprocess_mode='livesum'
 )
 
 # 13. Model Accuracy Gauge (dari training)
 model_accuracy_gauge = Gauge(
     'spam_detector_model_accuracy',
-    'Model accuracy from training'
+    'Model accuracy from training',
+    multiprocess_mode='mostrecent'
+)
+
+# 14. Windowed Error Rate Gauge (1m/5m/15m)
+error_rate_window_gauge = Gauge(
+    'spam_detector_error_rate_window_percent',
+    'Error rate percentage over a sliding window',
+    ['window'],
+    multiprocess_mode='livemax'
+)
+
+# 15. EWMA Request Rate Gauge
+request_rate_ewma_gauge = Gauge(
+    'spam_detector_request_rate_ewma_per_minute',
+    'Exponentially weighted request rate per minute',
+    ['window'],
+    multiprocess_mode='livesum'
+)
+
+# 16. EWMA Error Rate Gauge
+error_rate_ewma_gauge = Gauge(
+    'spam_detector_error_rate_ewma_percent',
+    'Exponentially weighted error rate percentage',
+    ['window'],
+    multiprocess_mode='livemax'
+)
+
+# 17. Stage Latency Histogram (validate/cache/remote/respond)
+stage_histogram = Histogram(
+    'spam_detector_stage_seconds',
+    'Time spent per /predict stage',
+    ['stage'],
+    buckets=STAGE_BUCKETS
+)
+_stage_children = {}
+
+# 18. Serving Network Histogram (remote call minus time inside the serving handler)
+serving_network_histogram = Histogram(
+    'spam_detector_serving_network_seconds',
+    'Serving call time outside the serving handler: network, queueing, HTTP parsing',
+    buckets=STAGE_BUCKETS
 )
 
 # Set initial accuracy (dari training results)
 model_accuracy_gauge.set(0.9631)  # Dari hasil training sebelumnya
 
-# Tracking variabel untuk rate calculation
-request_timestamps = []
+# Tracking untuk rate calculation (fixed memory, O(1) per request)
+window_stats = SlidingWindowStats()
 
 
-def update_system_metrics():
-    """Update system resource metrics"""
-    try:
-        # CPU usage
-        cpu_percent = psutil.cpu_percent(interval=0.1)
-        cpu_usage_gauge.set(cpu_percent)
-        
-        # Memory usage
-        memory = psutil.virtual_memory()
-        memory_usage_gauge.set(memory.percent)
-        
-        # Disk usage (Windows compatible)
-        disk = psutil.disk_usage('C:\\')
-        disk_usage_gauge.set(disk.percent)
-    except Exception as e:
-        print(f"Error updating system metrics: {e}")
+# System metrics are sampled in the background, never on the request path
+SYSTEM_DISK_PATHS = [
+    p.strip() for p in os.getenv('SYSTEM_DISK_PATHS', '').split(',') if p.strip()
+]
 
+system_sampler = SystemSampler(
+    cpu_usage_gauge,
+    memory_usage_gauge,
+    disk_usage_gauge,
+    interval=float(os.getenv('SYSTEM_SAMPLE_INTERVAL', '5')),
+    disk_paths=SYSTEM_DISK_PATHS or None
+)
+system_sampler.start()
 
-def calculate_error_rate():
-    """Calculate and update error rate"""
-    try:
-        total_requests = request_counter._value._value
-        total_errors = error_counter._value._value
-        
-        if total_requests > 0:
-            error_rate = (total_errors / total_requests) * 100
-            error_rate_gauge.set(error_rate)
-    except Exception as e:
-        print(f"Error calculating error rate: {e}")
+
+def record_error():
+    """Count a failed request in Prometheus and in the sliding windows"""
+    error_counter.inc()
+    window_stats.record_error()
 
 
-def calculate_request_rate():
-    """Calculate requests per minute"""
+def update_rate_metrics():
+    """Update request rate and error rate gauges from the sliding windows"""
     try:
-        now = time.time()
-        # Keep only requests from last minute
-        global request_timestamps
-        request_timestamps = [ts for ts in request_timestamps if now - ts < 60]
-        
-        # Calculate rate
-        rate = len(request_timestamps)
-        request_rate_gauge.set(rate)
+        stats = window_stats.snapshot()
+        request_rate_gauge.set(stats['requests_per_minute'])
+        error_rate_gauge.set(stats['error_rate_percent'])
+
+        for window, values in stats['windows'].items():
+            error_rate_window_gauge.labels(window=window).set(values['error_rate_percent'])
+            request_rate_ewma_gauge.labels(window=window).set(values['ewma_requests_per_minute'])
+            error_rate_ewma_gauge.labels(window=window).set(values['ewma_error_rate_percent'])
     except Exception as e:
-        print(f"Error calculating request rate: {e}")
+        print(f"Error calculating request/error rate: {e}")
 
 
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint - checks both this API and the serving endpoint"""
     try:
-        import requests
-        serving_health = requests.get(f"{SERVING_URL}/health", timeout=5).json()
+        serving_health = serving_backend.health(timeout=5)
         serving_healthy = serving_health.get('status') == 'healthy'
     except:
+        serving_health = {}
         serving_healthy = False
     
-    return jsonify({
+    payload = {
         'status': 'healthy' if serving_healthy else 'degraded',
         'inference_api': 'running',
         'serving_endpoint': 'healthy' if serving_healthy else 'unhealthy',
-        'serving_url': SERVING_URL,
+        'serving_url': SERVING_URL if local_engine is None else 'local',
+        'serving_mode': SERVED_BY,
         'timestamp': datetime.now().isoformat()
-    })
+    }
+    # Per-replica routing state from the router's probes
+    if 'replicas' in serving_health:
+        payload['serving_replicas'] = serving_health['replicas']
+    return jsonify(payload)
+
+
+@app.route('/livez', methods=['GET'])
+def livez():
+    """Liveness probe: the process is up and serving HTTP"""
+    return jsonify(startup.livez())
+
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness probe: 200 once the serving backend answered healthy"""
+    payload, status = startup.readyz()
+    payload['serving_mode'] = SERVED_BY
+    return jsonify(payload), status
 
 
 @app.route('/predict', methods=['POST'])
 def predict():
     """
     Endpoint untuk prediksi spam detection
-    Calls the Docker serving endpoint instead of loading model locally
+    Calls the Docker serving endpoint (or the in-process engine with SERVING_MODE=local)
     
     Input JSON:
     {
@@ -218,6 +552,7 @@ def predict():
     }
     """
     start_time = time.time()
+    timer = start_timer()
     
     # Increment active connections
     active_connections_gauge.inc()
@@ -225,51 +560,39 @@ def predict():
     try:
         # Increment request counter
         request_counter.inc()
-        request_timestamps.append(time.time())
-        
-        # Update system metrics
-        update_system_metrics()
+        window_stats.record_request()
         
         # Validate request
         if not request.json or 'text' not in request.json:
-            error_counter.inc()
-            calculate_error_rate()
+            record_error()
             active_connections_gauge.dec()
             return jsonify({'error': 'Missing text field'}), 400
         
         text = request.json['text']
         
         if not text or not isinstance(text, str):
-            error_counter.inc()
-            calculate_error_rate()
+            record_error()
             active_connections_gauge.dec()
             return jsonify({'error': 'Invalid text input'}), 400
         
+        timer.mark('validate')
+        # The remote latency is also needed for the admission limit
+        timings = {} if timer is not NULL_TIMER or admission is not None else None
+        
         # Inference timing
         inference_start = time.time()
         
         # Call serving endpoint instead of local model
         try:
-            import requests
-            serving_response = requests.post(
-                f"{SERVING_URL}/invocations",
-                json={"inputs": [text]},
-                headers={"Content-Type": "application/json"},
-                timeout=10
-            )
-            
-            if serving_response.status_code != 200:
-                raise Exception(f"Serving endpoint returned {serving_response.status_code}")
-            
-            serving_result = serving_response.json()
+            serving_result = run_inference(text, timings)
             prediction_data = serving_result['predictions'][0]
             
             result = prediction_data['prediction']
             confidence = prediction_data['confidence']
             
         except Exception as serving_error:
-            error_counter.inc()
-            calculate_error_rate()
+            record_error()
+            observe_admission(timings, failed=True)
             active_connections_gauge.dec()
             return jsonify({
                 'error': f'Serving endpoint error: {str(serving_error)}',
@@ -278,14 +601,14 @@ def predict():
         
         inference_duration = time.time() - inference_start
         inference_latency_histogram.observe(inference_duration)
+        if timings is not None:
+            record_remote_timings(timer, timings)
+            observe_admission(timings)
+        log_prediction(text, serving_result, inference_duration)
         
         # Update prediction counter
         prediction_counter.labels(result=result).inc()
         
-        # Calculate metrics
-        calculate_error_rate()
-        calculate_request_rate()
-        
         # Record response time
         response_duration = time.time() - start_time
         response_time_histogram.observe(response_duration)
@@ -293,17 +616,18 @@ def predict():
         # Decrement active connections
         active_connections_gauge.dec()
         
-        return jsonify({
+        response = jsonify({
             'prediction': result,
             'confidence': confidence,
             'inference_time_ms': round(inference_duration * 1000, 2),
             'timestamp': datetime.now().isoformat(),
-            'served_by': 'docker_endpoint'
+            'served_by': SERVED_BY
         })
+        set_server_timing(response.headers, timer, timings)
+        return response
     
     except Exception as e:
-        error_counter.inc()
-        calculate_error_rate()
+        record_error()
         active_connections_gauge.dec()
         
         print(f"Error during prediction: {e}")
@@ -317,25 +641,24 @@ def predict():
 @app.route('/metrics', methods=['GET'])
 def metrics():
     """Prometheus metrics endpoint"""
-    # Update metrics before returning
-    update_system_metrics()
-    calculate_error_rate()
-    calculate_request_rate()
+    # Update metrics before returning (system metrics come from the sampler)
+    update_rate_metrics()
     
-    return generate_latest(REGISTRY), 200, {'Content-Type': 'text/plain; charset=utf-8'}
+    return render_latest(), 200, {'Content-Type': CONTENT_TYPE}
 
 
-@app.route('/', methods=['GET'])
-def home():
-    """Home endpoint dengan informasi API"""
-    return jsonify({
+def api_info():
+    """Informasi API untuk home endpoint (dipakai juga oleh inference_async.py)"""
+    return {
         'service': 'Spam Detection API',
         'author': 'Yudhistira Paksi (dysnomia)',
         'version': '1.0',
         'endpoints': {
             '/predict': 'POST - Make spam detection prediction',
             '/metrics': 'GET - Prometheus metrics',
-            '/health': 'GET - Health check'
+            '/health': 'GET - Health check',
+            '/livez': 'GET - Liveness probe',
+            '/readyz': 'GET - Readiness probe (503 until the serving backend is reachable)'
         },
         'metrics_tracked': [
             'request_count',
@@ -349,9 +672,44 @@ def home():
             'disk_usage',
             'request_rate',
             'active_connections',
-            'model_accuracy'
+            'admission_limit',
+            'admission_queue_depth',
+            'admission_rejections (queue_full/queue_timeout/rate_limited)',
+            'admission_queue_wait_seconds',
+            'model_accuracy',
+            'serving_pool_connections_in_use',
+            'serving_pool_connections_reused',
+            'serving_connect_latency',
+            'batch_size',
+            'batch_queue_wait',
+            'prediction_cache_hits',
+            'prediction_cache_misses',
+            'prediction_cache_evictions',
+            'prediction_cache_memory',
+            'prediction_log_records (written/dropped/sampled_out)',
+            'disk_path_usage',
+            'system_sampler_duration',
+            'error_rate_window (1m/5m/15m)',
+            'request_rate_ewma',
+            'error_rate_ewma',
+            'startup_phase_seconds',
+            'startup_ready_seconds',
+            'stage_seconds (validate/cache/remote/respond)',
+            'serving_network_seconds',
+            'replica_latency_seconds',
+            'replica_in_flight',
+            'replica_up',
+            'replica_circuit_state',
+            'replica_ejections (probe/circuit)',
+            'hedged_requests (hedge_won/primary_won/failed)'
         ]
-    })
+    }
+
+
+@app.route('/', methods=['GET'])
+def home():
+    """Home endpoint dengan informasi API"""
+    return jsonify(api_info())
 
 
 if __name__ == '__main__':
@@ -359,8 +717,8 @@ if __name__ == '__main__':
     print("SPAM DETECTION INFERENCE API")
     print("=" * 60)
     print(f"Author: Yudhistira Paksi (dysnomia)")
-    print(f"Starting server on http://localhost:8000")
-    print(f"Metrics available at: http://localhost:8000/metrics")
+    print(f"Starting server on http://localhost:{API_PORT}")
+    print(f"Metrics available at: http://localhost:{API_PORT}/metrics")
     print("=" * 60)
     
-    app.run(host='0.0.0.0', port=8000, debug=False)
+    app.run(host='0.0.0.0', port=API_PORT, debug=False)
@@ -0,0 +1,389 @@
+"""
+Async Inference API untuk Spam Detection Model
+ASGI (Starlette) variant of inference.py with the same /predict, /health,
+/livez, /readyz, /metrics and / contract
+
+Run:
+  python inference_async.py
+  uvicorn inference_async:app --host 0.0.0.0 --port 8000
+
+Each in-flight /predict is a coroutine instead of an OS thread, so one
+process can hold thousands of slow serving calls open at once. Metrics,
+configuration, the prediction cache and the sliding-window stats are
+shared with inference.py by importing it. The thread-based micro-batcher
+is not used here.
+"""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import aiohttp
+import uvicorn
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+import inference as gateway
+from admission import Rejected, client_id
+from prediction_cache import cache_coalesced_counter
+from prometheus_exporter import CONTENT_TYPE, render_latest
+from serving_client import ServingError, serving_retries_counter
+from stage_timing import NULL_TIMER, parse_server_timing, start_timer
+from wire_format import JSON, MEDIA_TYPES, accept_header, decode_body, encode_payload
+
+# The thread-based micro-batcher would block the event loop; every
+# coroutine sends its own /invocations call instead
+if gateway.BATCHING_ENABLED:
+    print("[WARNING] BATCHING_ENABLED=true is ignored by the async gateway "
+          "(inference_async.py does not batch /predict calls)")
+
+
+class AsyncServingClient:
+    """Async keep-alive client for the serving endpoint (aiohttp)"""
+
+    def __init__(self, base_url, pool_size=100, connect_timeout=2.0,
+                 read_timeout=10.0, max_retries=2, retry_backoff=0.05,
+                 wire_format=JSON):
+        self.base_url = base_url.rstrip('/')
+        self._invoke_headers = {
+            'Content-Type': MEDIA_TYPES[JSON],
+            'Accept': accept_header(wire_format),
+        }
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.timeout = aiohttp.ClientTimeout(
+            sock_connect=connect_timeout, sock_read=read_timeout
+        )
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=pool_size),
+            timeout=self.timeout,
+        )
+
+    async def _request(self, method, path, timeout=None, server_timing=None, **kwargs):
+        # An explicit timeout=None would replace the session's sock_connect/
+        # sock_read timeouts with "no timeout at all"
+        if timeout is not None:
+            kwargs['timeout'] = timeout
+        # Only connection errors are retried: the request never left
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self.session.request(
+                    method, f"{self.base_url}{path}", **kwargs
+                ) as response:
+                    if server_timing is not None:
+                        server_timing.update(parse_server_timing(response.headers.get('Server-Timing')))
+                    body = await response.read()
+                    return response.status, decode_body(body, response.headers.get('Content-Type'))
+            except aiohttp.ClientConnectorError:
+                if attempt == self.max_retries:
+                    raise
+                serving_retries_counter.inc()
+                await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+
+    async def invoke(self, texts, server_timing=None):
+        status, payload = await self._request(
+            'POST', '/invocations', server_timing=server_timing,
+            data=encode_payload({"inputs": texts}, JSON), headers=self._invoke_headers
+        )
+        if status != 200:
+            raise ServingError(f"Serving endpoint returned {status}", status=status)
+        return payload
+
+    async def health(self, timeout=None):
+        status, payload = await self._request(
+            'GET', '/health',
+            timeout=aiohttp.ClientTimeout(total=timeout) if timeout else None
+        )
+        if status != 200:
+            raise ServingError(f"Serving endpoint returned status code {status}", status=status)
+        return payload
+
+    async def aclose(self):
+        await self.session.close()
+
+
+# replica url -> AsyncServingClient; replica choice, probing and circuit
+# breaking come from inference.py's ReplicaRouter (no hedging here)
+async_clients = {}
+
+
+async def invoke_replica(texts, server_timing=None):
+    """Send one /invocations call to the replica picked by the shared router"""
+    router = gateway.serving_client
+    replica = router.acquire()
+    if replica is None:
+        raise ServingError("No serving replica available (all ejected or circuit open)")
+    start = time.perf_counter()
+    try:
+        result = await async_clients[replica.url].invoke(texts, server_timing=server_timing)
+    except Exception as e:
+        router.release(replica, error=e)
+        raise
+    router.release(replica, latency=time.perf_counter() - start)
+    return result
+
+# key -> asyncio.Future, coalesces identical in-flight cache misses
+_inflight = {}
+
+
+class _LeaderCancelled(Exception):
+    """Set on a coalesced future whose leading request was cancelled"""
+
+
+async def invoke_backend(text, timings=None):
+    """Same contract as inference.invoke_backend (``timings`` gets 'remote' and 'serving')"""
+    start = time.perf_counter()
+    if gateway.local_engine is not None:
+        result = await run_in_threadpool(gateway.local_engine.invoke, [text])
+    elif timings is not None:
+        timings['serving'] = {}
+        result = await invoke_replica([text], server_timing=timings['serving'])
+    else:
+        result = await invoke_replica([text])
+    if timings is not None:
+        timings['remote'] = time.perf_counter() - start
+    return result
+
+
+async def run_inference(text, timings=None):
+    """Score one text, going through the shared prediction cache when enabled"""
+    cache = gateway.prediction_cache
+    if cache is None:
+        return await invoke_backend(text, timings)
+
+    value = cache.get(text)
+    if value is not None:
+        return value
+
+    key = cache.make_key(text)
+    future = _inflight.get(key)
+    if future is not None:
+        cache_coalesced_counter.inc()
+        try:
+            return await asyncio.shield(future)
+        except _LeaderCancelled:
+            # The leader's client went away; this request still wants an answer
+            return await invoke_backend(text, timings)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        value = await invoke_backend(text, timings)
+    except asyncio.CancelledError:
+        # Not future.cancel(): that would cancel every follower as well
+        future.set_exception(_LeaderCancelled())
+        future.exception()  # mark retrieved when nobody else was waiting
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # mark retrieved when nobody else was waiting
+        raise
+    finally:
+        _inflight.pop(key, None)
+
+    cache.put(text, value)
+    future.set_result(value)
+    return value
+
+
+async def health(request):
+    """Health check endpoint - checks both this API and the serving endpoint"""
+    try:
+        if gateway.local_engine is not None:
+            serving_health = gateway.local_engine.health()
+        else:
+            # Answered from the router's probe results, no serving call
+            serving_health = await run_in_threadpool(gateway.serving_client.health, 5)
+        serving_healthy = serving_health.get('status') == 'healthy'
+    except Exception:
+        serving_health = {}
+        serving_healthy = False
+
+    payload = {
+        'status': 'healthy' if serving_healthy else 'degraded',
+        'inference_api': 'running',
+        'serving_endpoint': 'healthy' if serving_healthy else 'unhealthy',
+        'serving_url': gateway.SERVING_URL if gateway.local_engine is None else 'local',
+        'serving_mode': gateway.SERVED_BY,
+        'timestamp': datetime.now().isoformat()
+    }
+    if 'replicas' in serving_health:
+        payload['serving_replicas'] = serving_health['replicas']
+    return JSONResponse(payload)
+
+
+async def livez(request):
+    """Liveness probe: the process is up and serving HTTP"""
+    return JSONResponse(gateway.startup.livez())
+
+
+async def readyz(request):
+    """Readiness probe: 200 once the serving backend answered healthy"""
+    payload, status = gateway.startup.readyz()
+    payload['serving_mode'] = gateway.SERVED_BY
+    return JSONResponse(payload, status_code=status)
+
+
+async def predict(request):
+    """Endpoint untuk prediksi spam detection (same contract as inference.py)"""
+    start_time = time.time()
+    timer = start_timer()
+    gateway.active_connections_gauge.inc()
+
+    try:
+        gateway.request_counter.inc()
+        gateway.window_stats.record_request()
+
+        try:
+            body = await request.json()
+        except Exception:
+            body = None
+
+        if not isinstance(body, dict) or 'text' not in body:
+            gateway.record_error()
+            return JSONResponse({'error': 'Missing text field'}, status_code=400)
+
+        text = body['text']
+
+        if not text or not isinstance(text, str):
+            gateway.record_error()
+            return JSONResponse({'error': 'Invalid text input'}, status_code=400)
+
+        timer.mark('validate')
+        timings = {} if timer is not NULL_TIMER or gateway.admission is not None else None
+
+        inference_start = time.time()
+
+        try:
+            serving_result = await run_inference(text, timings)
+            prediction_data = serving_result['predictions'][0]
+
+            result = prediction_data['prediction']
+            confidence = prediction_data['confidence']
+
+        except Exception as serving_error:
+            gateway.record_error()
+            gateway.observe_admission(timings, failed=True)
+            return JSONResponse({
+                'error': f'Serving endpoint error: {str(serving_error)}',
+                'timestamp': datetime.now().isoformat()
+            }, status_code=500)
+
+        inference_duration = time.time() - inference_start
+        gateway.inference_latency_histogram.observe(inference_duration)
+        if timings is not None:
+            gateway.record_remote_timings(timer, timings)
+            gateway.observe_admission(timings)
+        gateway.log_prediction(text, serving_result, inference_duration)
+
+        gateway.prediction_counter.labels(result=result).inc()
+
+        response_duration = time.time() - start_time
+        gateway.response_time_histogram.observe(response_duration)
+
+        response = JSONResponse({
+            'prediction': result,
+            'confidence': confidence,
+            'inference_time_ms': round(inference_duration * 1000, 2),
+            'timestamp': datetime.now().isoformat(),
+            'served_by': gateway.SERVED_BY
+        })
+        gateway.set_server_timing(response.headers, timer, timings)
+        return response
+
+    except Exception as e:
+        gateway.record_error()
+
+        print(f"Error during prediction: {e}")
+        return JSONResponse({
+            'error': str(e),
+            'timestamp': datetime.now().isoformat()
+        }, status_code=500)
+
+    finally:
+        gateway.active_connections_gauge.dec()
+
+
+async def admitted_predict(request):
+    """/predict behind the gateway's admission controller (429 + Retry-After when shed)"""
+    admission = gateway.admission
+    if admission is None:
+        return await predict(request)
+    client = request.client.host if request.client else None
+    try:
+        await admission.admit_async(client_id(request.headers, client))
+    except Rejected as e:
+        return JSONResponse({
+            'error': 'Too many requests',
+            'reason': e.reason,
+            'retry_after': e.retry_after,
+            'timestamp': datetime.now().isoformat()
+        }, status_code=429, headers={'Retry-After': str(e.retry_after)})
+    try:
+        return await predict(request)
+    finally:
+        admission.release()
+
+
+async def metrics(request):
+    """Prometheus metrics endpoint"""
+    gateway.update_rate_metrics()
+    return Response(
+        render_latest(),
+        media_type=CONTENT_TYPE
+    )
+
+
+async def home(request):
+    """Home endpoint dengan informasi API"""
+    return JSONResponse(gateway.api_info())
+
+
+@asynccontextmanager
+async def lifespan(app):
+    if gateway.serving_client is not None:
+        for replica in gateway.serving_client.replicas:
+            async_clients[replica.url] = AsyncServingClient(
+                replica.url,
+                pool_size=int(os.getenv('SERVING_POOL_SIZE', '100')),
+                connect_timeout=float(os.getenv('SERVING_CONNECT_TIMEOUT', '2')),
+                read_timeout=float(os.getenv('SERVING_TIMEOUT', '10')),
+                max_retries=int(os.getenv('SERVING_MAX_RETRIES', '2')),
+                retry_backoff=float(os.getenv('SERVING_RETRY_BACKOFF', '0.05')),
+                wire_format=gateway.SERVING_WIRE_FORMAT
+            )
+    try:
+        yield
+    finally:
+        for client in async_clients.values():
+            await client.aclose()
+        async_clients.clear()
+
+
+app = Starlette(
+    routes=[
+        Route('/predict', admitted_predict, methods=['POST']),
+        Route('/health', health, methods=['GET']),
+        Route('/livez', livez, methods=['GET']),
+        Route('/readyz', readyz, methods=['GET']),
+        Route('/metrics', metrics, methods=['GET']),
+        Route('/', home, methods=['GET']),
+    ],
+    lifespan=lifespan,
+)
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("SPAM DETECTION INFERENCE API (ASYNC)")
+    print("=" * 60)
+    print(f"Author: Yudhistira Paksi (dysnomia)")
+    print(f"Starting server on http://localhost:{gateway.API_PORT}")
+    print(f"Metrics available at: http://localhost:{gateway.API_PORT}/metrics")
+    print("=" * 60)
+
+    uvicorn.run(app, host='0.0.0.0', port=gateway.API_PORT, log_level='warning')
@@ -0,0 +1,389 @@
+"""
+Open-Loop Load Generator untuk Spam Detection API
+
+Sends requests on a schedule of intended send times (fixed rate or a
+linear ramp) from many concurrent workers, independent of how fast the
+server answers. Latency is measured from the *intended* send time, so when
+the server falls behind, the time requests spend waiting for a free worker
+is counted too (coordinated-omission correction). The service time (from
+the actual send) is recorded separately for comparison.
+
+Latencies go into HDR-style log-linear histograms: constant relative
+precision from microseconds to a minute in a few thousand counters.
+
+Targets:
+  /predict      inference API (API_URL, default http://localhost:8000)
+  /invocations  serving endpoint (SERVING_URL, default http://localhost:5001)
+
+Usage:
+  python load_test.py --endpoint /predict --rate 50 --duration 30
+  python load_test.py --endpoint /invocations --ramp 10 300 --duration 60
+  python load_test.py --find-max --slo-ms 100 --endpoint /predict /invocations
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import random
+import sys
+
+import aiohttp
+
+from test_inference import HAM_MESSAGES, SPAM_MESSAGES
+
+
+API_URL = os.getenv('API_URL', 'http://localhost:8000')
+SERVING_URL = os.getenv('SERVING_URL', 'http://localhost:5001')
+
+
+# ==================================================================
+# LATENCY HISTOGRAM
+# ==================================================================
+
+class LatencyHistogram:
+    """
+    Log-linear histogram of latencies in microseconds (HdrHistogram layout)
+
+    Values below ``sub_bucket_count`` are counted exactly; above that each
+    power-of-two range is split into ``sub_bucket_count / 2`` linear
+    sub-buckets, which keeps the relative error under
+    10 ** -significant_figures across the whole range.
+    """
+
+    def __init__(self, max_seconds=60.0, significant_figures=2):
+        self.sub_bucket_bits = math.ceil(math.log2(2 * 10 ** significant_figures))
+        self.sub_bucket_count = 1 << self.sub_bucket_bits
+        self.half_count = self.sub_bucket_count >> 1
+        self.max_value = int(max_seconds * 1e6)
+        self.counts = [0] * (self._index(self.max_value) + 1)
+        self.total = 0
+        self.max_recorded = 0
+        self.sum = 0
+
+    def _index(self, value):
+        if value < self.sub_bucket_count:
+            return value
+        bucket = value.bit_length() - self.sub_bucket_bits
+        return bucket * self.half_count + (value >> bucket)
+
+    def _highest_equivalent(self, index):
+        """Largest value that falls into the counter at ``index``"""
+        if index < self.sub_bucket_count:
+            return index
+        bucket = index // self.half_count - 1
+        sub_bucket = index - bucket * self.half_count
+        return ((sub_bucket + 1) << bucket) - 1
+
+    def record(self, seconds):
+        value = min(max(int(seconds * 1e6), 0), self.max_value)
+        self.counts[self._index(value)] += 1
+        self.total += 1
+        self.sum += value
+        if value > self.max_recorded:
+            self.max_recorded = value
+
+    def merge(self, other):
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.total += other.total
+        self.sum += other.sum
+        self.max_recorded = max(self.max_recorded, other.max_recorded)
+
+    def percentile(self, q):
+        """Latency in milliseconds at percentile q (0-100)"""
+        if not self.total:
+            return 0.0
+        target = max(1, math.ceil(q / 100.0 * self.total))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self._highest_equivalent(index), self.max_recorded) / 1000.0
+        return self.max_recorded / 1000.0
+
+    def mean(self):
+        return self.sum / self.total / 1000.0 if self.total else 0.0
+
+    def summary(self, percentiles=(50, 90, 99, 99.9)):
+        result = {f'p{q:g}_ms': round(self.percentile(q), 3) for q in percentiles}
+        result['mean_ms'] = round(self.mean(), 3)
+        result['max_ms'] = round(self.max_recorded / 1000.0, 3)
+        return result
+
+
+# ==================================================================
+# ARRIVAL SCHEDULES
+# ==================================================================
+
+def fixed_schedule(rate, duration, poisson=False, seed=0):
+    """Intended send offsets (seconds) for a constant rate"""
+    return ramp_schedule(rate, rate, duration, poisson, seed)
+
+
+def ramp_schedule(start_rate, end_rate, duration, poisson=False, seed=0):
+    """Intended send offsets for a rate changing linearly from start to end"""
+    rng = random.Random(seed)
+    t = 0.0
+    while True:
+        rate = start_rate + (end_rate - start_rate) * (t / duration)
+        if rate <= 0:
+            t += 0.01
+            continue
+        t += rng.expovariate(rate) if poisson else 1.0 / rate
+        if t >= duration:
+            return
+        yield t
+
+
+# ==================================================================
+# LOAD RUN
+# ==================================================================
+
+def make_payload(endpoint, batch_size, rng):
+    messages = SPAM_MESSAGES + HAM_MESSAGES
+    if endpoint == '/invocations':
+        return {'inputs': [rng.choice(messages) for _ in range(batch_size)]}
+    return {'text': rng.choice(messages)}
+
+
+def endpoint_url(endpoint, api_url=API_URL, serving_url=SERVING_URL):
+    base = serving_url if endpoint.startswith('/invocations') else api_url
+    return base.rstrip('/') + endpoint
+
+
+async def run_load(url, endpoint, schedule, concurrency=64, batch_size=16,
+                   timeout=30.0, interval=None):
+    """
+    Send one request per intended offset in ``schedule``
+
+    Returns a dict with the corrected latency histogram ('latency'),
+    the service time histogram ('service'), counts and, when ``interval``
+    is set, a list of per-interval histograms for ramp reporting.
+    """
+    latency = LatencyHistogram(max_seconds=timeout * 2)
+    service = LatencyHistogram(max_seconds=timeout * 2)
+    windows = {}
+    stats = {'sent': 0, 'ok': 0, 'errors': 0, 'status': {}}
+    rng = random.Random(1)
+    schedule = iter(schedule)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=client_timeout) as session:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+
+        async def worker():
+            # Workers share one ordered schedule, so the next intended send
+            # goes to whichever worker frees up first
+            for offset in schedule:
+                intended = started + offset
+                delay = intended - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                payload = make_payload(endpoint, batch_size, rng)
+                sent = loop.time()
+                stats['sent'] += 1
+                try:
+                    async with session.post(url, json=payload) as response:
+                        await response.read()
+                        status = response.status
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    status = type(e).__name__
+                done = loop.time()
+
+                stats['status'][status] = stats['status'].get(status, 0) + 1
+                if status == 200:
+                    stats['ok'] += 1
+                else:
+                    stats['errors'] += 1
+
+                latency.record(done - intended)
+                service.record(done - sent)
+                if interval:
+                    window = windows.setdefault(int(offset // interval), LatencyHistogram(timeout * 2))
+                    window.record(done - intended)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = loop.time() - started
+
+    stats.update({
+        'elapsed': elapsed,
+        'achieved_rps': stats['ok'] / elapsed if elapsed else 0.0,
+        'latency': latency,
+        'service': service,
+        'windows': [(index * interval, windows[index]) for index in sorted(windows)],
+    })
+    return stats
+
+
+def run_fixed(url, endpoint, rate, duration, **kwargs):
+    poisson = kwargs.pop('poisson', False)
+    return asyncio.run(run_load(url, endpoint, fixed_schedule(rate, duration, poisson), **kwargs))
+
+
+def run_ramp(url, endpoint, start_rate, end_rate, duration, **kwargs):
+    poisson = kwargs.pop('poisson', False)
+    kwargs.setdefault('interval', max(1.0, duration / 10))
+    return asyncio.run(run_load(
+        url, endpoint, ramp_schedule(start_rate, end_rate, duration, poisson), **kwargs
+    ))
+
+
+def within_slo(result, rate, slo_ms, slo_percentile=99, max_error_rate=0.01):
+    """(passed, reason) for one fixed-rate step"""
+    sent = result['sent'] or 1
+    p = result['latency'].percentile(slo_percentile)
+    if result['errors'] / sent > max_error_rate:
+        return False, f"error rate {result['errors'] / sent:.1%}"
+    if p > slo_ms:
+        return False, f"p{slo_percentile:g} {p:.1f} ms > {slo_ms:g} ms"
+    if result['achieved_rps'] < 0.95 * rate:
+        return False, f"achieved {result['achieved_rps']:.1f} of {rate:g} rps"
+    return True, ''
+
+
+def find_max_rps(url, endpoint, slo_ms, start_rate=10.0, growth=1.5, max_rate=10000.0,
+                 step_duration=10.0, slo_percentile=99, max_error_rate=0.01,
+                 refine_steps=3, report=print, **kwargs):
+    """
+    Highest fixed arrival rate whose corrected latency stays within the SLO
+
+    Grows the rate geometrically until a step fails, then bisects between
+    the last passing and the first failing rate.
+    """
+    steps = []
+
+    def step(rate):
+        result = run_fixed(url, endpoint, rate, step_duration, **kwargs)
+        passed, reason = within_slo(result, rate, slo_ms, slo_percentile, max_error_rate)
+        steps.append((rate, result, passed))
+        report(format_row(f"{rate:.1f} rps", result, 'ok' if passed else reason))
+        return passed
+
+    best, rate = None, start_rate
+    while rate <= max_rate and step(rate):
+        best, rate = rate, rate * growth
+
+    if best is not None and rate <= max_rate:
+        low, high = best, rate
+        for _ in range(refine_steps):
+            middle = (low + high) / 2
+            if step(middle):
+                best = low = middle
+            else:
+                high = middle
+    return best, steps
+
+
+# ==================================================================
+# REPORTING
+# ==================================================================
+
+HEADER = (f"{'step':<16} | {'sent':>6} | {'ok rps':>8} | {'err':>5} | {'p50 ms':>8} | "
+          f"{'p99 ms':>8} | {'p99.9 ms':>9} | {'max ms':>8} | {'svc p99':>8} | note")
+
+
+def format_row(label, result, note=''):
+    latency = result['latency'].summary()
+    service = result['service'].summary()
+    return (f"{label:<16} | {result['sent']:>6} | {result['achieved_rps']:>8.1f} | "
+            f"{result['errors']:>5} | {latency['p50_ms']:>8.1f} | {latency['p99_ms']:>8.1f} | "
+            f"{latency['p99.9_ms']:>9.1f} | {latency['max_ms']:>8.1f} | "
+            f"{service['p99_ms']:>8.1f} | {note}")
+
+
+def print_result(label, result):
+    print(HEADER)
+    print("-" * len(HEADER))
+    print(format_row(label, result))
+    if result['windows']:
+        print("-" * len(HEADER))
+        print("Per interval (corrected latency):")
+        for offset, histogram in result['windows']:
+            summary = histogram.summary()
+            print(f"  t+{offset:>5.0f}s  n={histogram.total:<6} p50={summary['p50_ms']:>8.1f} ms  "
+                  f"p99={summary['p99_ms']:>8.1f} ms  max={summary['max_ms']:>8.1f} ms")
+    if any(status != 200 for status in result['status']):
+        print(f"Status codes: {result['status']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Open-loop load generator')
+    parser.add_argument('--endpoint', nargs='+', default=['/predict'],
+                        help='/predict and/or /invocations')
+    parser.add_argument('--api-url', default=API_URL, help='base URL for /predict')
+    parser.add_argument('--serving-url', default=SERVING_URL, help='base URL for /invocations')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--rate', type=float, default=20.0, help='fixed arrival rate (req/s)')
+    mode.add_argument('--ramp', type=float, nargs=2, metavar=('START', 'END'),
+                      help='ramp the arrival rate linearly over the duration')
+    mode.add_argument('--find-max', action='store_true',
+                      help='search the highest rate that meets the SLO')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds per run')
+    parser.add_argument('--concurrency', type=int, default=64,
+                        help='max requests in flight (workers / connections)')
+    parser.add_argument('--batch-size', type=int, default=16, help='texts per /invocations request')
+    parser.add_argument('--poisson', action='store_true',
+                        help='exponential inter-arrival times instead of evenly spaced')
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--slo-ms', type=float, default=100.0)
+    parser.add_argument('--slo-percentile', type=float, default=99.0)
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    parser.add_argument('--start-rate', type=float, default=10.0)
+    parser.add_argument('--step-duration', type=float, default=10.0)
+    args = parser.parse_args()
+
+    options = {'concurrency': args.concurrency, 'batch_size': args.batch_size,
+               'timeout': args.timeout, 'poisson': args.poisson}
+
+    print("=" * 70)
+    print("OPEN-LOOP LOAD TEST - SPAM DETECTION API")
+    print("=" * 70)
+
+    maxima = {}
+    for endpoint in args.endpoint:
+        url = endpoint_url(endpoint, args.api_url, args.serving_url)
+        print(f"\nTarget: {url}  (concurrency {args.concurrency}"
+              f"{f', batch {args.batch_size}' if endpoint == '/invocations' else ''})")
+
+        if args.find_max:
+            print(f"SLO: p{args.slo_percentile:g} <= {args.slo_ms:g} ms, "
+                  f"errors <= {args.max_error_rate:.0%}, {args.step_duration:g}s per step")
+            print(HEADER)
+            print("-" * len(HEADER))
+            best, _ = find_max_rps(
+                url, endpoint, args.slo_ms, start_rate=args.start_rate,
+                step_duration=args.step_duration, slo_percentile=args.slo_percentile,
+                max_error_rate=args.max_error_rate, **options
+            )
+            maxima[endpoint] = best
+        elif args.ramp:
+            start, end = args.ramp
+            print(f"Ramp {start:g} -> {end:g} req/s over {args.duration:g}s")
+            result = run_ramp(url, endpoint, start, end, args.duration, **options)
+            print_result(f"ramp {start:g}-{end:g}", result)
+        else:
+            print(f"Fixed rate {args.rate:g} req/s for {args.duration:g}s")
+            result = run_fixed(url, endpoint, args.rate, args.duration, **options)
+            print_result(f"{args.rate:g} rps", result)
+
+    if maxima:
+        print()
+        print("=" * 70)
+        print(f"MAX SUSTAINABLE RPS (p{args.slo_percentile:g} <= {args.slo_ms:g} ms)")
+        print("=" * 70)
+        for endpoint, best in maxima.items():
+            value = f"{best:.1f} req/s" if best is not None else f"below {args.start_rate:g} req/s"
+            rows = f" ({best * args.batch_size:.0f} texts/s)" if best and endpoint == '/invocations' else ''
+            print(f"{endpoint:<14} {value}{rows}")
+    print("=" * 70)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""
+Micro-batching untuk Inference API
+Collects concurrent /predict texts into one /invocations batch
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from prometheus_client import Histogram
+
+
+# ==================================================================
+# BATCHING METRICS
+# ==================================================================
+
+batch_size_histogram = Histogram(
+    'spam_detector_batch_size',
+    'Number of texts sent to the serving endpoint per batch',
+    buckets=[1, 2, 4, 8, 16, 32, 64, 128]
+)
+
+batch_queue_wait_histogram = Histogram(
+    'spam_detector_batch_queue_wait_seconds',
+    'Time a text waited in the batching queue before dispatch',
+    buckets=[0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1]
+)
+
+
+class MicroBatcher:
+    """
+    Adaptive micro-batcher in front of a batch ``invoke_fn``
+
+    ``invoke_fn(texts)`` must return an /invocations style payload
+    (``{'predictions': [...], 'model_version': ...}``). Each caller of
+    ``submit`` gets back the same payload shape for its single text, so
+    the batcher is a drop-in replacement for ``invoke_fn([text])``.
+
+    A batch is closed after ``max_batch_size`` texts or ``max_wait_ms``
+    after its first text arrived. When the observed arrival rate is too
+    low to fill a batch within the wait window, texts are dispatched
+    immediately instead of paying the wait for nothing.
+    """
+
+    def __init__(self, invoke_fn, max_batch_size=32, max_wait_ms=5.0,
+                 max_concurrency=4, timeout=None):
+        self.invoke_fn = invoke_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self.timeout = timeout
+
+        self._queue = queue.Queue()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency,
+            thread_name_prefix='micro-batch'
+        )
+        # EWMA of the gap between consecutive arrivals (seconds)
+        self._arrival_gap = self.max_wait
+        self._last_arrival = None
+
+        self._thread = threading.Thread(
+            target=self._run, name='micro-batcher', daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, text):
+        """Queue one text and block until its batch has been scored"""
+        future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future.result(timeout=self.timeout)
+
+    def _observe_arrival(self, enqueued_at):
+        if self._last_arrival is not None:
+            gap = max(0.0, enqueued_at - self._last_arrival)
+            self._arrival_gap += 0.2 * (gap - self._arrival_gap)
+        self._last_arrival = enqueued_at
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            self._observe_arrival(first[2])
+            batch = [first]
+            deadline = first[2] + self.max_wait
+
+            # Take whatever is already waiting without blocking
+            while len(batch) < self.max_batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                self._observe_arrival(item[2])
+                batch.append(item)
+
+            # Only wait for more when traffic is dense enough to fill it
+            if self._arrival_gap < self.max_wait:
+                while len(batch) < self.max_batch_size:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    self._observe_arrival(item[2])
+                    batch.append(item)
+
+            self._executor.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch):
+        dispatched_at = time.perf_counter()
+        batch_size_histogram.observe(len(batch))
+        for _, _, enqueued_at in batch:
+            batch_queue_wait_histogram.observe(dispatched_at - enqueued_at)
+
+        try:
+            payload = self.invoke_fn([text for text, _, _ in batch])
+            predictions = payload['predictions']
+            if len(predictions) != len(batch):
+                raise Exception(
+                    f"Serving endpoint returned {len(predictions)} predictions "
+                    f"for a batch of {len(batch)}"
+                )
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        for (_, future, _), prediction in zip(batch, predictions):
+            result = dict(payload)
+            result['predictions'] = [prediction]
+            future.set_result(result)
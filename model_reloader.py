@@ -0,0 +1,236 @@
+"""
+Hot Model Reload untuk Spam Detection Serving
+Loads a new model/vectorizer pair in the background, warms it up and
+swaps it in atomically, without restarting the serving process
+
+Handlers read ``reloader.bundle`` once per request and keep using that
+reference, so requests already in flight finish on the old bundle while
+new requests get the new one. A failed load or warmup leaves the active
+bundle untouched.
+
+Reloads are triggered by:
+  - a change (mtime/size) of the model or vectorizer file, polled every
+    MODEL_WATCH_INTERVAL seconds
+  - request_reload() (POST /admin/reload), which also touches the trigger
+    file so every prefork worker follows
+
+New versions are named by, in order: an explicit version, the contents of
+"<model_path>.version", or MODEL_VERSION plus a short hash of the model file.
+"""
+
+import hashlib
+import os
+import threading
+import time
+
+from prometheus_client import Counter, Gauge
+
+from model_runtime import MODEL_VERSION, ModelBundle
+
+
+# ==================================================================
+# RELOAD METRICS
+# ==================================================================
+
+model_info_gauge = Gauge(
+    'spam_serving_model_info',
+    'Active model version (1 = active, 0 = replaced)',
+    ['version'],
+    multiprocess_mode='liveall'
+)
+
+model_load_gauge = Gauge(
+    'spam_serving_model_load_seconds',
+    'Time taken to load the most recent model artifacts',
+    multiprocess_mode='mostrecent'
+)
+
+model_warmup_gauge = Gauge(
+    'spam_serving_model_warmup_seconds',
+    'Time taken to warm up the most recently loaded model',
+    multiprocess_mode='mostrecent'
+)
+
+model_reloads_counter = Counter(
+    'spam_serving_model_reloads_total',
+    'Model reload attempts',
+    ['result']
+)
+
+
+# Short and long, English and Indonesian, spam and ham
+WARMUP_TEXTS = [
+    "CONGRATULATIONS! You have won $1,000,000! Click here to claim your prize!",
+    "Hi, can we meet for coffee tomorrow at 3pm?",
+    "URGENT! Your account will be closed. Verify now at fake-link.com",
+    "Thanks for your email. I'll review the document and get back to you.",
+    "FREE FREE FREE! Click now to win!",
+    "Selamat! Anda memenangkan hadiah, hubungi nomor ini sekarang",
+    "Rapat tim dipindah ke hari Kamis jam 10 pagi",
+    "ok",
+]
+
+
+def warmup(bundle, texts=WARMUP_TEXTS, rounds=3):
+    """Run single-text and batch requests through the full invoke path"""
+    for _ in range(rounds):
+        for text in texts:
+            bundle.invoke([text])
+        bundle.invoke(texts * 4)
+        bundle.invoke(texts * 4, columnar=True)
+
+
+def artifact_version(model_path):
+    """Version for a reloaded artifact: sidecar .version file or a content hash"""
+    sidecar = model_path + '.version'
+    if os.path.exists(sidecar):
+        with open(sidecar) as f:
+            version = f.read().strip()
+        if version:
+            return version
+    digest = hashlib.blake2b(digest_size=4)
+    if os.path.isdir(model_path):
+        # Compact artifact directory: its manifest names the build
+        model_path = os.path.join(model_path, 'manifest.json')
+    with open(model_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return f"{MODEL_VERSION}+{digest.hexdigest()}"
+
+
+class ModelReloader:
+    """Owns the active ModelBundle and replaces it on demand"""
+
+    def __init__(self, model_path, vectorizer_path, bundle=None,
+                 watch_interval=5.0, trigger_path=None, on_install=None):
+        self.model_path = model_path
+        self.vectorizer_path = vectorizer_path
+        self.watch_interval = watch_interval
+        self.trigger_path = trigger_path or model_path + '.reload'
+        # Called with every installed bundle (e.g. to mark the service ready)
+        self.on_install = on_install
+
+        self.bundle = bundle
+        self.last_error = None
+        self._lock = threading.RLock()
+        self._signature = self._current_signature()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _current_signature(self):
+        signature = []
+        for path in (self.model_path, self.vectorizer_path, self.trigger_path):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def reload(self, version=None):
+        """
+        Load, warm up and swap in the artifacts; returns the new bundle
+
+        Raises on failure, in which case the active bundle is kept.
+        """
+        with self._lock:
+            # Taken before loading: a file replaced mid-load triggers another reload
+            self._signature = self._current_signature()
+            try:
+                start = time.perf_counter()
+                bundle = ModelBundle.load(
+                    self.model_path, self.vectorizer_path,
+                    version or artifact_version(self.model_path)
+                )
+                load_seconds = time.perf_counter() - start
+
+                start = time.perf_counter()
+                warmup(bundle)
+                warmup_seconds = time.perf_counter() - start
+            except Exception as e:
+                self.last_error = str(e)
+                model_reloads_counter.labels(result='failure').inc()
+                print(f"❌ Model reload failed, keeping version "
+                      f"{self.bundle.version if self.bundle else None}: {e}")
+                raise
+
+            self.install(bundle)
+            model_load_gauge.set(load_seconds)
+            model_warmup_gauge.set(warmup_seconds)
+            model_reloads_counter.labels(result='success').inc()
+
+            print(f"✓ Model {bundle.version} active (pid {os.getpid()}, "
+                  f"load {load_seconds:.2f}s, warmup {warmup_seconds:.2f}s)")
+            return bundle
+
+    def install(self, bundle):
+        """Make ``bundle`` the active one (used for the initial load and by reload)"""
+        with self._lock:
+            previous = self.bundle
+            self.bundle = bundle  # atomic reference swap
+            self.last_error = None
+
+            if previous is not None and previous.version != bundle.version:
+                model_info_gauge.labels(version=previous.version).set(0)
+            model_info_gauge.labels(version=bundle.version).set(1)
+            if self.on_install is not None:
+                self.on_install(bundle)
+
+    def request_reload(self, version=None):
+        """Reload here and touch the trigger file so other workers follow"""
+        with self._lock:
+            try:
+                tmp_path = self.trigger_path + f'.{os.getpid()}.tmp'
+                with open(tmp_path, 'w') as f:
+                    f.write(version or '')
+                os.replace(tmp_path, self.trigger_path)
+            except OSError as e:
+                print(f"Could not write reload trigger {self.trigger_path}: {e}")
+            return self.reload(version)
+
+    def _trigger_version(self):
+        try:
+            with open(self.trigger_path) as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def check(self):
+        """Reload if any watched file changed since the last (attempted) load"""
+        # Compare and reload under the lock: a concurrent reload() (watch
+        # thread vs POST /admin/reload) updates the signature first, so the
+        # same change is never loaded twice
+        with self._lock:
+            signature = self._current_signature()
+            if signature == self._signature:
+                return False
+            triggered = signature[2] != self._signature[2]
+            try:
+                self.reload(self._trigger_version() if triggered else None)
+            except Exception:
+                pass  # already logged and counted; retried on the next change
+            return True
+
+    def _run(self):
+        while not self._stop.wait(self.watch_interval):
+            self.check()
+
+    def start(self):
+        """
+        Publish the active version and start watching the artifact files
+
+        Gauge values do not survive a fork, so prefork workers call this
+        from their post_fork hook.
+        """
+        if self.bundle is not None:
+            model_info_gauge.labels(version=self.bundle.version).set(1)
+        if self.watch_interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='model-reloader', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.watch_interval + 1)
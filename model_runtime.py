@@ -0,0 +1,172 @@
+"""
+Model Runtime untuk Spam Detection
+Shared artifact loading and prediction post-processing, used by
+serve_model.py and by the inference API in local mode
+"""
+
+import os
+from datetime import datetime
+
+import numpy as np
+
+from stage_timing import NULL_TIMER
+
+
+MODEL_VERSION = os.getenv('MODEL_VERSION', '1.0')
+
+# auto: fused scorer when the model supports it, sklearn otherwise
+# fused: fail loading instead of falling back; sklearn: never fuse
+SCORER = os.getenv('SCORER', 'auto')
+
+# Memory-map the numpy arrays inside the joblib files instead of copying
+# them onto the heap. Only safe when new artifacts are deployed by atomic
+# rename: truncating a mapped file in place crashes the process.
+ARTIFACT_MMAP = os.getenv('ARTIFACT_MMAP', 'false').lower() == 'true'
+
+
+def load_artifacts(model_path, vectorizer_path, mmap=ARTIFACT_MMAP):
+    """
+    Unpickle the (model, vectorizer) pair
+
+    A ``model_path`` that is a compact artifact directory (compact_artifacts.py)
+    holds both halves and is always memory-mapped; ``vectorizer_path`` is
+    then ignored.
+    """
+    from compact_artifacts import is_compact, load_compact
+
+    if is_compact(model_path):
+        return load_compact(model_path)
+
+    # Deferred: joblib and the sklearn modules it unpickles are the bulk
+    # of the startup time, so only processes that load a model pay for them
+    import joblib
+
+    mmap_mode = 'r' if mmap else None
+    model = joblib.load(model_path, mmap_mode=mmap_mode)
+    vectorizer = joblib.load(vectorizer_path, mmap_mode=mmap_mode)
+    return model, vectorizer
+
+
+# Indexed by the model's class label (0 = ham, 1 = spam)
+LABELS = np.array(['ham', 'spam'])
+
+
+def format_predictions(predictions, probabilities):
+    """Turn model outputs into the /invocations prediction records"""
+    # Convert whole columns to Python objects at once instead of per row
+    labels = LABELS[predictions].tolist()
+    confidences = probabilities.max(axis=1).tolist()
+    ham = probabilities[:, 0].tolist()
+    spam = probabilities[:, 1].tolist()
+    return [
+        {
+            'prediction': label,
+            'confidence': confidence,
+            'probabilities': {'ham': p_ham, 'spam': p_spam}
+        }
+        for label, confidence, p_ham, p_spam in zip(labels, confidences, ham, spam)
+    ]
+
+
+def format_columnar(predictions, probabilities):
+    """Compact response shape: one list per field instead of one dict per row"""
+    return {
+        'prediction': LABELS[predictions].tolist(),
+        'confidence': probabilities.max(axis=1).tolist(),
+        'probability_ham': probabilities[:, 0].tolist(),
+        'probability_spam': probabilities[:, 1].tolist()
+    }
+
+
+class ModelBundle:
+    """A loaded model + vectorizer pair with the serving post-processing"""
+
+    def __init__(self, model, vectorizer, version=MODEL_VERSION, scorer=SCORER):
+        self.model = model
+        self.vectorizer = vectorizer
+        self.version = version
+        self.fused = None
+        # Compact artifacts come with their scorer already compiled and
+        # verified, and have nothing to fall back to
+        compiled = getattr(model, 'fused_scorer', None)
+        if compiled is not None:
+            if scorer == 'sklearn':
+                raise ValueError("Compact artifacts can only be scored with SCORER=auto/fused")
+            self.fused = compiled
+        elif scorer != 'sklearn':
+            self.fused = self._compile_fused(required=(scorer == 'fused'))
+
+    @classmethod
+    def load(cls, model_path, vectorizer_path, version=MODEL_VERSION, scorer=SCORER):
+        model, vectorizer = load_artifacts(model_path, vectorizer_path)
+        return cls(model, vectorizer, version, scorer)
+
+    def _compile_fused(self, required):
+        """Compile and verify the fused scorer, or None to keep the sklearn path"""
+        from fused_scorer import FusedScorer, verify
+
+        try:
+            fused = FusedScorer.compile(self.vectorizer, self.model)
+            verify(fused, self.vectorizer, self.model)
+        except Exception as e:
+            # Unsupported, not equivalent, or an unexpected compile error:
+            # with SCORER=auto the sklearn path still serves the model
+            if required:
+                raise
+            print(f"Fused scorer disabled, using sklearn: {type(e).__name__}: {e}")
+            return None
+        return fused
+
+    @property
+    def scorer_name(self):
+        return 'fused' if self.fused is not None else 'sklearn'
+
+    def score(self, texts, timer=NULL_TIMER):
+        """
+        Vectorize and score texts, returning (predictions, probabilities) arrays
+
+        ``timer`` (stage_timing) gets a 'vectorize' and a 'predict' mark.
+        """
+        if self.fused is not None:
+            term_counts = self.fused.term_counts(texts)
+            timer.mark('vectorize')
+            probabilities = self.fused.proba_from_counts(term_counts, len(texts))
+        else:
+            features = self.vectorizer.transform(texts)
+            timer.mark('vectorize')
+            # Single pass: predict() would run the same scoring again just
+            # to take the argmax of these probabilities
+            probabilities = self.model.predict_proba(features)
+        predictions = self.model.classes_.take(probabilities.argmax(axis=1))
+        timer.mark('predict')
+        return predictions, probabilities
+
+    def predict(self, texts):
+        """Vectorize and score a list of texts"""
+        predictions, probabilities = self.score(texts)
+        return format_predictions(predictions, probabilities)
+
+    def invoke(self, texts, columnar=False, timer=NULL_TIMER):
+        """Same response payload as serve_model /invocations"""
+        predictions, probabilities = self.score(texts, timer)
+        payload = self.payload(predictions, probabilities, columnar)
+        timer.mark('format')
+        return payload
+
+    def payload(self, predictions, probabilities, columnar=False):
+        """/invocations response payload for the arrays returned by score()"""
+        formatter = format_columnar if columnar else format_predictions
+        return {
+            'predictions': formatter(predictions, probabilities),
+            'model_version': self.version,
+            'timestamp': datetime.now().isoformat()
+        }
+
+    def health(self, timeout=None):
+        """Same payload as serve_model /health"""
+        return {
+            'status': 'healthy',
+            'model_loaded': True,
+            'vectorizer_loaded': True,
+            'timestamp': datetime.now().isoformat()
+        }
@@ -0,0 +1,202 @@
+"""
+Prediction Cache untuk Inference API
+Bounded LRU + TTL cache with single-flight deduplication
+"""
+
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from prometheus_client import Counter, Gauge
+
+
+# ==================================================================
+# CACHE METRICS
+# ==================================================================
+
+cache_hits_counter = Counter(
+    'spam_detector_prediction_cache_hits_total',
+    'Number of predictions served from the cache'
+)
+
+cache_misses_counter = Counter(
+    'spam_detector_prediction_cache_misses_total',
+    'Number of predictions that had to call the model'
+)
+
+cache_coalesced_counter = Counter(
+    'spam_detector_prediction_cache_coalesced_total',
+    'Number of requests that waited on an identical in-flight prediction'
+)
+
+cache_evictions_counter = Counter(
+    'spam_detector_prediction_cache_evictions_total',
+    'Number of evicted cache entries by reason',
+    ['reason']  # label: size/ttl/model_version
+)
+
+cache_entries_gauge = Gauge(
+    'spam_detector_prediction_cache_entries',
+    'Number of entries in the prediction cache',
+    multiprocess_mode='livesum'
+)
+
+cache_memory_gauge = Gauge(
+    'spam_detector_prediction_cache_memory_bytes',
+    'Approximate memory used by the prediction cache',
+    multiprocess_mode='livesum'
+)
+
+
+def normalize_text(text):
+    """Lowercase and collapse whitespace (the vectorizer lowercases anyway)"""
+    return ' '.join(text.lower().split())
+
+
+def _approx_size(value):
+    """Rough deep size of the JSON-like values stored in the cache"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for k, v in value.items():
+            size += _approx_size(k) + _approx_size(v)
+    elif isinstance(value, (list, tuple)):
+        for v in value:
+            size += _approx_size(v)
+    return size
+
+
+class PredictionCache:
+    """
+    Thread-safe prediction cache keyed by a hash of the normalized text
+
+    Entries expire after ``ttl_seconds`` and the least recently used entry
+    is evicted beyond ``max_entries``. Concurrent misses for the same key
+    are coalesced: one caller computes, the others wait for its result.
+    All entries are dropped when a new model version is observed.
+    """
+
+    def __init__(self, max_entries=10000, ttl_seconds=300.0):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl_seconds
+        self.model_version = None
+
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._inflight = {}            # key -> Future
+        self._memory = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(text):
+        return hashlib.blake2b(
+            normalize_text(text).encode('utf-8'), digest_size=16
+        ).digest()
+
+    def get_or_compute(self, text, compute_fn):
+        """Return the cached value for ``text`` or compute it once"""
+        key = self.make_key(text)
+
+        with self._lock:
+            value = self._lookup_locked(key, time.monotonic())
+            if value is not None:
+                return value
+
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+
+        if not leader:
+            cache_coalesced_counter.inc()
+            return future.result()
+
+        cache_misses_counter.inc()
+        try:
+            value = compute_fn(text)
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._inflight.pop(key, None)
+            self._observe_version_locked(value.get('model_version'))
+            self._store(key, value, time.monotonic())
+        future.set_result(value)
+        return value
+
+    def get(self, text):
+        """Non-blocking lookup; returns None (and counts a miss) when absent"""
+        key = self.make_key(text)
+        with self._lock:
+            value = self._lookup_locked(key, time.monotonic())
+        if value is None:
+            cache_misses_counter.inc()
+        return value
+
+    def put(self, text, value):
+        """Store a value computed outside ``get_or_compute``"""
+        key = self.make_key(text)
+        with self._lock:
+            self._observe_version_locked(value.get('model_version'))
+            self._store(key, value, time.monotonic())
+
+    def observe_model_version(self, version):
+        """Invalidate everything if ``version`` differs from the cached one"""
+        with self._lock:
+            self._observe_version_locked(version)
+
+    def invalidate(self, reason='model_version'):
+        with self._lock:
+            self._clear(reason)
+
+    def _lookup_locked(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            self._remove(key, 'ttl')
+            return None
+        self._entries.move_to_end(key)
+        cache_hits_counter.inc()
+        return entry[2]
+
+    def _observe_version_locked(self, version):
+        if version is None or version == self.model_version:
+            return
+        if self.model_version is not None:
+            self._clear('model_version')
+        self.model_version = version
+
+    def _store(self, key, value, now):
+        if key in self._entries:
+            self._remove(key, None)
+        size = _approx_size(value) + sys.getsizeof(key)
+        self._entries[key] = (now + self.ttl, size, value)
+        self._memory += size
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest, 'size')
+        self._update_gauges()
+
+    def _remove(self, key, reason):
+        _, size, _ = self._entries.pop(key)
+        self._memory -= size
+        if reason is not None:
+            cache_evictions_counter.labels(reason=reason).inc()
+        self._update_gauges()
+
+    def _clear(self, reason):
+        if self._entries:
+            cache_evictions_counter.labels(reason=reason).inc(len(self._entries))
+        self._entries.clear()
+        self._memory = 0
+        self._update_gauges()
+
+    def _update_gauges(self):
+        cache_entries_gauge.set(len(self._entries))
+        cache_memory_gauge.set(self._memory)
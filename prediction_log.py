@@ -0,0 +1,320 @@
+"""
+Prediction Log untuk Inference API
+Asynchronous, buffered record of predictions for auditing and retraining
+
+The request path only samples and enqueues a record (``log()``); a
+background thread drains the bounded queue in batches and appends them to
+the current log file with one write per batch. When the queue is full the
+record is dropped and counted instead of blocking the request.
+
+Formats:
+  jsonl     one JSON object per line
+  jsonl.gz  the same lines, one gzip member per batch (~5-10x smaller,
+            readable with gzip.open / zcat)
+
+Files are named <prefix>-<YYYYmmdd-HHMMSS>-<pid>.<format> (one writer per
+process, so prefork workers never interleave) and rotate by size and age.
+Before a new file is opened, the oldest files in the directory (from any
+process) are deleted until, with the new one, at most ``max_files`` files
+remain and the others hold at most ``max_total_bytes``.
+"""
+
+import atexit
+import glob
+import gzip
+import json
+import os
+import queue
+import random
+import threading
+import time
+from datetime import datetime
+
+from prometheus_client import Counter, Gauge, Histogram
+
+try:
+    import orjson
+except ImportError:  # optional, the stdlib encoder produces the same lines
+    orjson = None
+
+
+# ==================================================================
+# PREDICTION LOG METRICS
+# ==================================================================
+
+log_records_counter = Counter(
+    'spam_detector_prediction_log_records_total',
+    'Prediction log records by outcome',
+    ['result']  # label: written/dropped/sampled_out/failed
+)
+
+log_queue_gauge = Gauge(
+    'spam_detector_prediction_log_queue_size',
+    'Records waiting in the prediction log queue',
+    multiprocess_mode='livesum'
+)
+
+log_flush_histogram = Histogram(
+    'spam_detector_prediction_log_flush_seconds',
+    'Time taken to append one batch to the prediction log',
+    buckets=[0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5]
+)
+
+log_rotations_counter = Counter(
+    'spam_detector_prediction_log_rotations_total',
+    'Prediction log file rotations',
+    ['reason']  # label: size/age
+)
+
+log_deleted_counter = Counter(
+    'spam_detector_prediction_log_files_deleted_total',
+    'Prediction log files deleted by retention',
+    ['reason']  # label: count/bytes
+)
+
+
+FORMATS = ('jsonl', 'jsonl.gz')
+
+
+def _encode_line(record):
+    if orjson is not None:
+        return orjson.dumps(record) + b'\n'
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+class PredictionLog:
+    """Bounded queue plus a background writer thread with size/age rotation"""
+
+    def __init__(self, directory, prefix='predictions', fmt='jsonl', sample_rate=1.0,
+                 max_queue=10000, batch_size=512, flush_interval=1.0,
+                 max_bytes=64 * 1024 * 1024, rotate_seconds=3600.0, max_files=24,
+                 max_total_bytes=1024 * 1024 * 1024, fsync=False):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown prediction log format: {fmt} (expected one of {FORMATS})")
+        self.directory = directory
+        self.prefix = prefix
+        self.fmt = fmt
+        self.sample_rate = min(1.0, max(0.0, sample_rate))
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.max_files = max_files
+        self.max_total_bytes = max_total_bytes
+        self.fsync = fsync
+
+        self.written = 0
+        self.dropped = 0
+
+        self._file = None
+        self._path = None
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._closed = False
+        self._start()
+
+        atexit.register(self.close)
+
+    def _start(self):
+        """(Re)create the queue and writer thread for the current process"""
+        # Threads do not survive a fork: a prefork worker starts its own
+        # writer on first use, and must not share the master's open file
+        self._pid = os.getpid()
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._file = None
+        self._thread = threading.Thread(target=self._run, name='prediction-log', daemon=True)
+        self._thread.start()
+
+    # -- request path ---------------------------------------------------
+
+    def log(self, record):
+        """Sample and enqueue one record; never blocks. Returns True if queued."""
+        if self._closed:
+            return False
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            log_records_counter.labels(result='sampled_out').inc()
+            return False
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            log_records_counter.labels(result='dropped').inc()
+            return False
+        return True
+
+    # -- writer thread --------------------------------------------------
+
+    def _run(self):
+        own_queue = self._queue
+        while True:
+            try:
+                first = own_queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                if self._closed:
+                    return
+                self._maybe_rotate()
+                continue
+            if first is None:
+                self._drain(own_queue)
+                self._close_file()
+                return
+
+            batch = [first]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    record = own_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is None:
+                    stop = True
+                    break
+                batch.append(record)
+
+            log_queue_gauge.set(own_queue.qsize())
+            self._write(batch)
+            if stop:
+                self._drain(own_queue)
+                self._close_file()
+                return
+
+    def _drain(self, own_queue):
+        batch = []
+        while True:
+            try:
+                record = own_queue.get_nowait()
+            except queue.Empty:
+                break
+            if record is not None:
+                batch.append(record)
+        if batch:
+            self._write(batch)
+
+    def _write(self, batch):
+        start = time.perf_counter()
+        try:
+            data = b''.join(_encode_line(record) for record in batch)
+            if self.fmt == 'jsonl.gz':
+                data = gzip.compress(data, compresslevel=6)
+            self._maybe_rotate()
+            if self._file is None:
+                self._open_file()
+            self._file.write(data)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+        except Exception as e:
+            log_records_counter.labels(result='failed').inc(len(batch))
+            print(f"Prediction log write failed ({len(batch)} records): {e}")
+            self._close_file()
+            return
+        self.written += len(batch)
+        log_records_counter.labels(result='written').inc(len(batch))
+        log_flush_histogram.observe(time.perf_counter() - start)
+
+    # -- files ----------------------------------------------------------
+
+    def _open_file(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._enforce_retention()
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        base = os.path.join(self.directory, f"{self.prefix}-{stamp}-{os.getpid()}")
+        path = f"{base}.{self.fmt}"
+        suffix = 1
+        while os.path.exists(path):
+            path = f"{base}.{suffix}.{self.fmt}"
+            suffix += 1
+        self._file = open(path, 'ab')
+        self._path = path
+        self._opened_at = time.time()
+
+    def _close_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+    def _maybe_rotate(self):
+        if self._file is None:
+            return
+        reason = None
+        if self.max_bytes and self._file.tell() >= self.max_bytes:
+            reason = 'size'
+        elif self.rotate_seconds and time.time() - self._opened_at >= self.rotate_seconds:
+            reason = 'age'
+        if reason:
+            self._close_file()
+            log_rotations_counter.labels(reason=reason).inc()
+
+    def _enforce_retention(self):
+        """Delete the oldest log files beyond max_files / max_total_bytes"""
+        if not self.max_files and not self.max_total_bytes:
+            return
+        files = []
+        for path in log_files(self.directory, self.prefix):
+            try:
+                files.append((path, os.path.getsize(path)))
+            except OSError:
+                pass  # deleted by another worker meanwhile
+        count = len(files) + 1  # the file about to be opened
+        total = sum(size for _, size in files)
+        for path, size in files:
+            if self.max_files and count > self.max_files:
+                reason = 'count'
+            elif self.max_total_bytes and total > self.max_total_bytes:
+                reason = 'bytes'
+            else:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            count -= 1
+            total -= size
+            log_deleted_counter.labels(reason=reason).inc()
+
+    @property
+    def path(self):
+        """File currently being appended to (None before the first write)"""
+        return self._path
+
+    def close(self, timeout=5.0):
+        """Write what is queued and stop the writer thread"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout=timeout)
+
+
+def read_prediction_log(path):
+    """Yield the records of one log file (either format)"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def log_files(directory, prefix='predictions'):
+    """All log files in ``directory``, oldest first"""
+    def mtime(path):
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return 0.0  # deleted by another worker meanwhile
+    paths = glob.glob(os.path.join(directory, f"{prefix}-*.jsonl*"))
+    return sorted(paths, key=mtime)
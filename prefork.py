@@ -0,0 +1,139 @@
+"""
+Prefork Server untuk Spam Detection Services
+Production entry point: loads the WSGI app (and its model artifacts) once
+in a master process, then forks N gunicorn workers that share those pages
+copy-on-write.
+
+Usage:
+  python prefork.py serve_model:app --bind 0.0.0.0:5001 --workers 4
+
+Environment:
+  SERVING_WORKERS  number of worker processes (default: CPU count)
+  SERVING_THREADS  threads per worker, gthread keep-alive worker (default: 4)
+
+Hooks looked up on the app module (all optional):
+  preload()    called once in the master before forking
+  post_fork()  called in every worker right after the fork
+"""
+
+import argparse
+import gc
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+
+from gunicorn.app.base import BaseApplication
+
+
+def prepare_multiprocess_metrics(workers):
+    """
+    Enable prometheus_client multiprocess mode for more than one worker
+
+    Must run before prometheus_client is imported anywhere, because the
+    metric value class is chosen at import time.
+    """
+    if workers <= 1:
+        return None
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if not path:
+        path = tempfile.mkdtemp(prefix='prometheus_multiproc_')
+        os.environ['PROMETHEUS_MULTIPROC_DIR'] = path
+    # Files left over from a previous run would be merged into this one
+    for name in os.listdir(path):
+        full_path = os.path.join(path, name)
+        if os.path.isdir(full_path):
+            shutil.rmtree(full_path)
+        else:
+            os.remove(full_path)
+    return path
+
+
+class PreforkApplication(BaseApplication):
+    def __init__(self, module, app, options):
+        self.module = module
+        self.application = app
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key, value)
+
+        module = self.module
+
+        def post_fork(server, worker):
+            hook = getattr(module, 'post_fork', None)
+            if hook is not None:
+                hook()
+
+        def child_exit(server, worker):
+            if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+                from prometheus_client import multiprocess
+                multiprocess.mark_process_dead(worker.pid)
+
+        self.cfg.set('post_fork', post_fork)
+        self.cfg.set('child_exit', child_exit)
+
+    def load(self):
+        return self.application
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prefork server for spam detection services')
+    parser.add_argument('app', help='WSGI app as module:attribute, e.g. serve_model:app')
+    parser.add_argument('--bind', default='0.0.0.0:5001')
+    parser.add_argument('--workers', type=int,
+                        default=int(os.getenv('SERVING_WORKERS', os.cpu_count() or 1)))
+    parser.add_argument('--threads', type=int,
+                        default=int(os.getenv('SERVING_THREADS', '4')))
+    parser.add_argument('--keepalive', type=int, default=5,
+                        help='seconds to keep idle client connections open')
+    parser.add_argument('--timeout', type=int, default=30)
+    args = parser.parse_args()
+
+    prepare_multiprocess_metrics(args.workers)
+
+    module_name, _, attribute = args.app.partition(':')
+    module = importlib.import_module(module_name)
+    app = getattr(module, attribute or 'app')
+
+    preload = getattr(module, 'preload', None)
+    if preload is not None:
+        preload()
+
+    # The master serves no requests: drop the live gauges it set while
+    # loading so only worker pids report (workers re-publish after fork)
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(os.getpid())
+
+    # Move everything loaded so far out of the GC's reach, so collections
+    # in the workers don't write to (and un-share) the model's pages
+    gc.collect()
+    gc.freeze()
+
+    print("=" * 60)
+    print(f"PREFORK SERVER: {args.app}")
+    print("=" * 60)
+    print(f"Master pid: {os.getpid()}")
+    print(f"Workers: {args.workers} x {args.threads} threads")
+    print(f"Listening on: http://{args.bind}")
+    print("=" * 60)
+
+    PreforkApplication(module, app, {
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread',
+        'keepalive': args.keepalive,
+        'timeout': args.timeout,
+        'preload_app': True,
+    }).run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,147 +1,363 @@
 """
 Prometheus Exporter untuk Spam Detection Model
-Standalone exporter untuk expose custom metrics
+Multi-process metrics collector for prefork deployments
+
+With more than one worker (prefork.py), prometheus_client runs in
+multiprocess mode: every worker writes its metrics to memory-mapped files
+in PROMETHEUS_MULTIPROC_DIR. This module aggregates those files into one
+exposition across all workers:
+
+  counters / histograms  summed over live and dead workers
+  gauges                 per multiprocess_mode (liveall, livesum, max, ...)
+
+Files of dead workers are compacted: counter and histogram values are
+folded into one archive file per type, live gauges are dropped, so the
+number of files (and the aggregation cost) only depends on the live
+workers. The rendered exposition is cached and refreshed in the
+background, which keeps scrape time constant as the worker count grows.
+
+Workers are detected as dead by pid, so the collector must run in the
+same PID namespace as the workers (same host or container).
+
+Usage:
+  python prometheus_exporter.py --port 9200     # standalone collector
+  (or render_latest() from a worker's /metrics handler)
+
+Environment:
+  PROMETHEUS_MULTIPROC_DIR  shared metric directory (set by prefork.py)
+  METRICS_REFRESH_INTERVAL  seconds between aggregations (default: 1)
+  METRICS_COMPACT_INTERVAL  seconds between dead-worker compactions (default: 30)
 """
 
-from prometheus_client import start_http_server, Counter, Histogram, Gauge
+import argparse
+import glob
+import os
+import sys
+import threading
 import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
 import psutil
-import random
-
-# Metrics yang sama dengan yang ada di inference.py
-# digunakan untuk standalone monitoring
-
-# Request metrics
-request_counter = Counter(
-    'spam_detector_requests_total',
-    'Total number of prediction requests'
-)
-
-prediction_counter = Counter(
-    'spam_detector_predictions_total',
-    'Total number of predictions by result',
-    ['result']
-)
-
-error_counter = Counter(
-    'spam_detector_errors_total',
-    'Total number of errors'
-)
-
-# Performance metrics
-response_time_histogram = Histogram(
-    'spam_detector_response_time_seconds',
-    'Response time in seconds',
-    buckets=[0.01, 0.05, 0.1, 0.5, 1.0, 2.0, 5.0]
-)
-
-inference_latency_histogram = Histogram(
-    'spam_detector_inference_latency_seconds',
-    'Model inference latency in seconds',
-    buckets=[0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0]
-)
-
-# Gauges
-error_rate_gauge = Gauge(
-    'spam_detector_error_rate_percent',
-    'Current error rate percentage'
-)
-
-cpu_usage_gauge = Gauge(
-    'spam_detector_cpu_usage_percent',
-    'Current CPU usage percentage'
-)
-
-memory_usage_gauge = Gauge(
-    'spam_detector_memory_usage_percent',
-    'Current memory usage percentage'
-)
-
-disk_usage_gauge = Gauge(
-    'spam_detector_disk_usage_percent',
-    'Current disk usage percentage'
-)
-
-request_rate_gauge = Gauge(
-    'spam_detector_request_rate_per_minute',
-    'Current request rate per minute'
-)
-
-active_connections_gauge = Gauge(
-    'spam_detector_active_connections',
-    'Number of active connections'
-)
-
-model_accuracy_gauge = Gauge(
-    'spam_detector_model_accuracy',
-    'Model accuracy from training'
-)
-
-
-def update_metrics():
-    """
-    Update all metrics with current system values
-    Note: Ini adalah standalone exporter
-    Untuk produksi, gunakan metrics dari inference.py
-    """
-    while True:
+from prometheus_client import CollectorRegistry, REGISTRY, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.mmap_dict import MmapedDict
+from prometheus_client.multiprocess import MultiProcessCollector
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process mode only, no locking needed
+    fcntl = None
+
+
+METRICS_REFRESH_INTERVAL = float(os.getenv('METRICS_REFRESH_INTERVAL', '1'))
+METRICS_COMPACT_INTERVAL = float(os.getenv('METRICS_COMPACT_INTERVAL', '30'))
+
+CONTENT_TYPE = 'text/plain; charset=utf-8'
+
+ARCHIVE_SUFFIX = 'archive.db'
+LOCK_NAME = '.compact.lock'
+
+
+def multiprocess_dir():
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    return path if path and os.path.isdir(path) else None
+
+
+def file_pid(filename):
+    """Worker pid encoded in a metric file name, None for archive files"""
+    stem = os.path.basename(filename)[:-3].rsplit('_', 1)[-1]
+    return int(stem) if stem.isdigit() else None
+
+
+def _merge_gauge(mode, current, value, timestamp):
+    """Combine two (value, timestamp) gauge samples per multiprocess mode"""
+    if current is None:
+        return value, timestamp
+    if mode == 'min':
+        return min(current[0], value), timestamp
+    if mode == 'max':
+        return max(current[0], value), timestamp
+    if mode == 'sum':
+        return current[0] + value, timestamp
+    # mostrecent
+    return (value, timestamp) if timestamp >= current[1] else current
+
+
+class _DirectoryLock:
+    """flock on a file in the metric directory (shared for reads, exclusive for compaction)"""
+
+    def __init__(self, path, exclusive):
+        self.path = os.path.join(path, LOCK_NAME)
+        self.mode = (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) if fcntl else None
+        self.file = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self.file = open(self.path, 'a')
+            fcntl.flock(self.file.fileno(), self.mode)
+        return self
+
+    def __exit__(self, *exc):
+        if self.file is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+            self.file.close()
+            self.file = None
+
+
+# ==================================================================
+# AGGREGATOR
+# ==================================================================
+
+class MultiprocessAggregator:
+    """Aggregates (and compacts) the metric files of all workers"""
+
+    def __init__(self, path, refresh_interval=METRICS_REFRESH_INTERVAL,
+                 compact_interval=METRICS_COMPACT_INTERVAL):
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.compact_interval = compact_interval
+
+        self.registry = CollectorRegistry()
+        MultiProcessCollector(self.registry, path=path)
+        self.registry.register(self)
+
+        self.compacted_pids = 0
+        self.last_compact = 0.0
+        self.last_duration = 0.0
+        self.files = 0
+        self.live_workers = 0
+
+        self._latest = None
+        self._latest_time = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # -- compaction -----------------------------------------------------
+
+    def compact(self):
+        """Fold the files of dead workers into the archive files; returns the dead pids"""
+        with _DirectoryLock(self.path, exclusive=True):
+            dead = {}
+            for filename in glob.glob(os.path.join(self.path, '*.db')):
+                pid = file_pid(filename)
+                if pid is not None and not psutil.pid_exists(pid):
+                    dead.setdefault(pid, []).append(filename)
+            if not dead:
+                return []
+
+            archives = {}
+            obsolete = []
+            for files in dead.values():
+                for filename in files:
+                    obsolete.append(filename)
+                    parts = os.path.basename(filename).split('_')
+                    typ = parts[0]
+                    if typ == 'gauge':
+                        mode = parts[1]
+                        # Per-worker gauges of a dead worker are gone with it
+                        if mode.startswith('live') or mode == 'all':
+                            continue
+                        archive_name = f'gauge_{mode}_{ARCHIVE_SUFFIX}'
+                    else:
+                        mode = None
+                        archive_name = f'{typ}_{ARCHIVE_SUFFIX}'
+
+                    values = archives.get(archive_name)
+                    if values is None:
+                        values = archives[archive_name] = self._read_archive(archive_name)
+                    for key, value, timestamp, _ in MmapedDict.read_all_values_from_file(filename):
+                        if mode is None:
+                            previous = values.get(key, (0.0, 0.0))
+                            values[key] = (previous[0] + value, timestamp)
+                        else:
+                            values[key] = _merge_gauge(mode, values.get(key), value, timestamp)
+
+            for archive_name, values in archives.items():
+                self._write_archive(archive_name, values)
+            for filename in obsolete:
+                os.remove(filename)
+
+            self.compacted_pids += len(dead)
+            return sorted(dead)
+
+    def _read_archive(self, archive_name):
+        filename = os.path.join(self.path, archive_name)
+        if not os.path.exists(filename):
+            return {}
+        return {key: (value, timestamp) for key, value, timestamp, _
+                in MmapedDict.read_all_values_from_file(filename)}
+
+    def _write_archive(self, archive_name, values):
+        # Written next to the archive and renamed over it, so a reader
+        # never sees a half-written file
+        tmp_path = os.path.join(self.path, f'.{archive_name}.{os.getpid()}.tmp')
+        archive = MmapedDict(tmp_path)
         try:
-            # Update system metrics
-            cpu_percent = psutil.cpu_percent(interval=1)
-            cpu_usage_gauge.set(cpu_percent)
-            
-            memory = psutil.virtual_memory()
-            memory_usage_gauge.set(memory.percent)
-            
-            disk = psutil.disk_usage('/')
-            disk_usage_gauge.set(disk.percent)
-            
-            # Set model accuracy (dari training)
-            model_accuracy_gauge.set(0.9631)
-            
-            # Simulate some activity untuk demo
-            # Dalam produksi, metrics ini akan diupdate oleh inference API
-            if random.random() > 0.5:
-                request_counter.inc()
-                
-                if random.random() > 0.7:
-                    prediction_counter.labels(result='spam').inc()
-                else:
-                    prediction_counter.labels(result='ham').inc()
-                
-                # Random response time
-                response_time_histogram.observe(random.uniform(0.01, 0.5))
-                inference_latency_histogram.observe(random.uniform(0.001, 0.1))
-            
-            # Calculate error rate
-            total_requests = request_counter._value._value
-            total_errors = error_counter._value._value
-            
-            if total_requests > 0:
-                error_rate = (total_errors / total_requests) * 100
-                error_rate_gauge.set(error_rate)
-            
-            time.sleep(5)
-            
-        except Exception as e:
-            print(f"Error updating metrics: {e}")
-            time.sleep(5)
+            for key, (value, timestamp) in values.items():
+                archive.write_value(key, value, timestamp)
+        finally:
+            archive.close()
+        os.replace(tmp_path, os.path.join(self.path, archive_name))
 
+    # -- aggregation ----------------------------------------------------
+
+    def collect(self):
+        """The aggregator's own metrics (registered on its registry)"""
+        yield GaugeMetricFamily(
+            'spam_metrics_aggregation_seconds',
+            'Time taken by the last aggregation of the worker metric files',
+            value=self.last_duration
+        )
+        yield GaugeMetricFamily(
+            'spam_metrics_worker_files',
+            'Metric files read by the last aggregation',
+            value=self.files
+        )
+        yield GaugeMetricFamily(
+            'spam_metrics_live_workers',
+            'Worker processes with metric files that are still running',
+            value=self.live_workers
+        )
+        yield CounterMetricFamily(
+            'spam_metrics_compacted_workers',
+            'Dead workers whose metric files were compacted',
+            value=self.compacted_pids
+        )
+
+    def refresh(self):
+        """Compact if due, aggregate all files and cache the exposition"""
+        with self._lock:
+            now = time.time()
+            if self.compact_interval >= 0 and now - self.last_compact >= self.compact_interval:
+                self.last_compact = now
+                try:
+                    self.compact()
+                except Exception as e:
+                    print(f"Metric compaction failed: {e}")
+
+            start = time.perf_counter()
+            files = glob.glob(os.path.join(self.path, '*.db'))
+            pids = {file_pid(f) for f in files} - {None}
+            self.files = len(files)
+            self.live_workers = sum(1 for pid in pids if psutil.pid_exists(pid))
+            with _DirectoryLock(self.path, exclusive=False):
+                output = generate_latest(self.registry)
+            self.last_duration = time.perf_counter() - start
+
+            self._latest = output
+            self._latest_time = time.time()
+            return output
+
+    def render(self):
+        """Latest exposition, re-aggregated only when older than refresh_interval"""
+        latest = self._latest
+        if latest is None or (
+            (self._thread is None or not self._thread.is_alive())
+            and time.time() - self._latest_time >= self.refresh_interval
+        ):
+            latest = self.refresh()
+        return latest
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Metric aggregation failed: {e}")
+
+    def start(self):
+        """Refresh in the background so scrapes only return the cached output"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self.refresh()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='metrics-aggregator', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.refresh_interval + 1)
+
+
+_aggregator = None
+_aggregator_lock = threading.Lock()
+
+
+def get_aggregator():
+    """Per-process aggregator for PROMETHEUS_MULTIPROC_DIR (None outside multiprocess mode)"""
+    global _aggregator
+    path = multiprocess_dir()
+    if path is None:
+        return None
+    with _aggregator_lock:
+        if _aggregator is None or _aggregator.path != path:
+            _aggregator = MultiprocessAggregator(path)
+        return _aggregator
+
+
+def render_latest(registry=REGISTRY):
+    """/metrics body: all workers in multiprocess mode, else this process' registry"""
+    aggregator = get_aggregator()
+    if aggregator is None:
+        return generate_latest(registry)
+    return aggregator.render()
+
+
+# ==================================================================
+# STANDALONE COLLECTOR
+# ==================================================================
+
+def serve(aggregator, port):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/metrics', '/'):
+                self.send_error(404)
+                return
+            output = aggregator.render()
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(output)))
+            self.end_headers()
+            self.wfile.write(output)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('0.0.0.0', port), Handler)
+    server.daemon_threads = True
+    server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Aggregate multi-process worker metrics')
+    parser.add_argument('--port', type=int, default=9200)
+    parser.add_argument('--dir', default=os.environ.get('PROMETHEUS_MULTIPROC_DIR'),
+                        help='metric directory shared with the workers')
+    parser.add_argument('--refresh-interval', type=float, default=METRICS_REFRESH_INTERVAL)
+    parser.add_argument('--compact-interval', type=float, default=METRICS_COMPACT_INTERVAL)
+    args = parser.parse_args()
+
+    if not args.dir or not os.path.isdir(args.dir):
+        print("❌ Set PROMETHEUS_MULTIPROC_DIR (or --dir) to the workers' metric directory")
+        return 1
+
+    aggregator = MultiprocessAggregator(args.dir, args.refresh_interval, args.compact_interval)
+    aggregator.start()
 
-if __name__ == '__main__':
     print("=" * 60)
     print("PROMETHEUS EXPORTER - SPAM DETECTION MODEL")
     print("=" * 60)
     print("Author: Yudhistira Paksi (dysnomia)")
-    print("Starting exporter on port 8000")
-    print("Metrics available at: http://localhost:8000/metrics")
+    print(f"Aggregating: {args.dir}")
+    print(f"Refresh every {args.refresh_interval:g}s, compaction every {args.compact_interval:g}s")
+    print(f"Metrics available at: http://localhost:{args.port}/metrics")
     print("=" * 60)
-    print("\nNote: Untuk produksi, gunakan metrics dari inference.py")
-    print("Exporter ini hanya untuk demo/testing")
-    print("\n")
-    
-    # Start HTTP server untuk expose metrics
-    start_http_server(8000)
-    
-    # Update metrics loop
-    update_metrics()
+
+    serve(aggregator, args.port)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
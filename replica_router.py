@@ -0,0 +1,532 @@
+"""
+Replica Router untuk Model Serving Endpoint
+Spreads /invocations calls over several serving replicas
+
+  - each call goes to the admitted replica with the fewest outstanding
+    requests (ties broken at random)
+  - a background prober calls /health on every replica, ejects a replica
+    after consecutive failed probes and re-admits it after consecutive
+    successful ones; health() answers from the probe results instead of
+    making a blocking call
+  - a per-replica circuit breaker opens after consecutive request
+    failures, and lets a single trial request through after a cooldown
+  - ejection and open circuits only deprioritize: when no replica is
+    both admitted and available, calls fail open to the remaining
+    replicas (spam_detector_replica_panic_routed_total) instead of
+    failing outright
+  - optional hedging: when a call has not answered after the recent p95
+    latency, the same request is sent to a second replica and the first
+    successful answer wins (capped to a fraction of the traffic). The
+    primary runs on the caller's thread; a timer thread sends the hedge
+    through a small pool, and the losing attempt's socket is shut down
+
+ReplicaRouter has the same invoke()/health() interface as ServingClient,
+so it can be used wherever a single ServingClient was.
+"""
+
+import heapq
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+from prometheus_client import Counter, Gauge, Histogram
+
+from serving_client import CallHandle, ServingClient, ServingError
+from wire_format import JSON
+
+
+# ==================================================================
+# REPLICA METRICS
+# ==================================================================
+
+replica_latency_histogram = Histogram(
+    'spam_detector_replica_latency_seconds',
+    'Serving call latency per replica',
+    ['replica'],
+    buckets=[0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5]
+)
+
+replica_in_flight_gauge = Gauge(
+    'spam_detector_replica_in_flight',
+    'Outstanding serving calls per replica',
+    ['replica'],
+    multiprocess_mode='livesum'
+)
+
+replica_up_gauge = Gauge(
+    'spam_detector_replica_up',
+    'Replica admitted by the health prober (1) or ejected (0)',
+    ['replica'],
+    multiprocess_mode='livemin'
+)
+
+replica_circuit_gauge = Gauge(
+    'spam_detector_replica_circuit_state',
+    'Circuit breaker state per replica (0 = closed, 1 = half open, 2 = open)',
+    ['replica'],
+    multiprocess_mode='livemax'
+)
+
+replica_ejections_counter = Counter(
+    'spam_detector_replica_ejections_total',
+    'Replicas taken out of rotation',
+    ['replica', 'reason']  # label: probe/circuit
+)
+
+replica_errors_counter = Counter(
+    'spam_detector_replica_errors_total',
+    'Failed serving calls per replica',
+    ['replica']
+)
+
+replica_panic_counter = Counter(
+    'spam_detector_replica_panic_routed_total',
+    'Calls routed to an ejected or circuit-open replica because no healthy one was left'
+)
+
+hedged_requests_counter = Counter(
+    'spam_detector_hedged_requests_total',
+    'Hedged serving calls by which attempt answered first',
+    ['result']  # label: hedge_won/primary_won/failed
+)
+
+
+# ==================================================================
+# CIRCUIT BREAKER
+# ==================================================================
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker (not thread-safe: the router locks)
+
+    closed     calls pass, failures are counted
+    open       calls are refused until ``reset_timeout`` has passed
+    half open  one trial call; success closes, failure re-opens
+    """
+
+    CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+    def __init__(self, failure_threshold=5, reset_timeout=10.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+
+    def available(self, now):
+        if self.state == self.OPEN:
+            return now - self.opened_at >= self.reset_timeout
+        if self.state == self.HALF_OPEN:
+            return not self.trial_in_flight
+        return True
+
+    def acquire(self, now):
+        """Called for the replica chosen for a call"""
+        if self.state == self.OPEN and now - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            self.trial_in_flight = True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trial_in_flight = False
+
+    def record_failure(self, now):
+        """Returns True when this failure opened the circuit"""
+        self.trial_in_flight = False
+        self.failures += 1
+        if self.state == self.HALF_OPEN or (
+            self.state == self.CLOSED and self.failures >= self.failure_threshold
+        ):
+            self.state = self.OPEN
+            self.opened_at = now
+            return True
+        return False
+
+
+# ==================================================================
+# REPLICAS
+# ==================================================================
+
+class Replica:
+    """One serving endpoint with its own connection pool and routing state"""
+
+    def __init__(self, url, client, breaker):
+        self.url = url
+        self.client = client
+        self.breaker = breaker
+        self.in_flight = 0
+        self.admitted = True  # optimistic until the first probe says otherwise
+        self.probe_successes = 0
+        self.probe_failures = 0
+        self.last_probe = None
+        self.last_error = None
+        self.model_version = None
+
+    def describe(self):
+        return {
+            'url': self.url,
+            'admitted': self.admitted,
+            'circuit': ('closed', 'half_open', 'open')[self.breaker.state],
+            'in_flight': self.in_flight,
+            'model_version': self.model_version,
+            'last_error': self.last_error,
+        }
+
+
+class _HedgedCall:
+    """One hedged invoke(), shared by the caller's thread and the hedge timer"""
+
+    def __init__(self, primary, texts, deadline):
+        self.primary = primary
+        self.texts = texts
+        self.deadline = deadline
+        self.lock = threading.Lock()
+        self.done = False
+        self.hedge = None  # Future of the hedge attempt, once sent
+        self.timings = {}
+        self.handle = CallHandle()
+        self.hedge_handle = CallHandle()
+
+
+def _is_replica_failure(error):
+    """Connection problems and 5xx count against a replica, client errors do not"""
+    if isinstance(error, ServingError):
+        return error.status is None or error.status >= 500
+    return isinstance(error, (requests.RequestException, OSError))
+
+
+class ReplicaRouter:
+    """Least-outstanding-requests routing over serving replicas"""
+
+    def __init__(self, urls, pool_size=20, connect_timeout=2.0, read_timeout=10.0,
+                 max_retries=2, retry_backoff=0.05, probe_interval=2.0, probe_timeout=1.0,
+                 unhealthy_threshold=2, healthy_threshold=2, failure_threshold=5,
+                 reset_timeout=10.0, hedge=False, hedge_percentile=95,
+                 hedge_min_delay=0.005, hedge_budget=0.1, wire_format=JSON):
+        if isinstance(urls, str):
+            urls = [url.strip() for url in urls.split(',') if url.strip()]
+        if not urls:
+            raise ValueError("At least one serving URL is required")
+
+        self.replicas = [
+            Replica(
+                url.rstrip('/'),
+                ServingClient(url, pool_size=pool_size, connect_timeout=connect_timeout,
+                              read_timeout=read_timeout, max_retries=max_retries,
+                              retry_backoff=retry_backoff, wire_format=wire_format),
+                CircuitBreaker(failure_threshold, reset_timeout)
+            )
+            for url in urls
+        ]
+        self.base_url = self.replicas[0].url
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.unhealthy_threshold = unhealthy_threshold
+        self.healthy_threshold = healthy_threshold
+
+        self.hedge = hedge and len(self.replicas) > 1
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_budget = hedge_budget
+        self.hedge_delay = None  # set by the prober once enough latencies were seen
+        self._latencies = deque(maxlen=1000)
+        self._calls = 0
+        self._hedges = 0
+        self._executor = None
+        # Called with the serving model version after every probe round
+        # (e.g. PredictionCache.observe_model_version)
+        self.model_version_listeners = []
+        self._hedge_queue = []
+        self._hedge_ready = threading.Condition()
+
+        self._lock = threading.Lock()
+        self._probed = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+        for replica in self.replicas:
+            replica_up_gauge.labels(replica=replica.url).set(1)
+            replica_circuit_gauge.labels(replica=replica.url).set(CircuitBreaker.CLOSED)
+        self.start()
+
+    # -- routing --------------------------------------------------------
+
+    def acquire(self, exclude=None):
+        """Pick the least loaded available replica and count the call against it"""
+        now = time.monotonic()
+        panic = False
+        with self._lock:
+            candidates = [
+                r for r in self.replicas
+                if r is not exclude and r.admitted and r.breaker.available(now)
+            ]
+            if not candidates and exclude is None:
+                # Fail open rather than turning a flaky probe into an outage:
+                # replicas whose circuit allows a call, else every replica
+                panic = True
+                candidates = ([r for r in self.replicas if r.breaker.available(now)]
+                              or self.replicas)
+            if not candidates:
+                return None
+            fewest = min(r.in_flight for r in candidates)
+            replica = random.choice([r for r in candidates if r.in_flight == fewest])
+            replica.breaker.acquire(now)
+            replica_circuit_gauge.labels(replica=replica.url).set(replica.breaker.state)
+            replica.in_flight += 1
+        replica_in_flight_gauge.labels(replica=replica.url).inc()
+        if panic:
+            replica_panic_counter.inc()
+        return replica
+
+    def release(self, replica, error=None, latency=None, aborted=False):
+        opened = False
+        with self._lock:
+            replica.in_flight -= 1
+            if aborted:
+                # Cancelled by the router (the other hedge attempt won)
+                replica.breaker.trial_in_flight = False
+            elif error is None:
+                replica.breaker.record_success()
+                self._latencies.append(latency)
+            elif _is_replica_failure(error):
+                replica.last_error = str(error)
+                opened = replica.breaker.record_failure(time.monotonic())
+            else:
+                # The replica answered; a client error says nothing about its health
+                replica.breaker.trial_in_flight = False
+            state = replica.breaker.state
+        replica_in_flight_gauge.labels(replica=replica.url).dec()
+        replica_circuit_gauge.labels(replica=replica.url).set(state)
+        if aborted:
+            pass
+        elif error is None:
+            replica_latency_histogram.labels(replica=replica.url).observe(latency)
+        elif _is_replica_failure(error):
+            replica_errors_counter.labels(replica=replica.url).inc()
+        if opened:
+            replica_ejections_counter.labels(replica=replica.url, reason='circuit').inc()
+            print(f"[WARNING] Circuit opened for serving replica {replica.url}: {error}")
+
+    def _call(self, replica, texts, server_timing, handle=None):
+        start = time.perf_counter()
+        try:
+            result = replica.client.invoke(texts, server_timing=server_timing, handle=handle)
+        except Exception as e:
+            self.release(replica, error=e, aborted=handle is not None and handle.aborted)
+            raise
+        self.release(replica, latency=time.perf_counter() - start)
+        return result
+
+    def invoke(self, texts, server_timing=None):
+        """Same contract as ServingClient.invoke, routed to one (or two) replicas"""
+        self._ensure_started()
+        replica = self.acquire()
+        if replica is None:
+            raise ServingError("No serving replica available (all ejected or circuit open)")
+
+        delay = self.hedge_delay if self.hedge else None
+        if delay is None:
+            return self._call(replica, texts, server_timing)
+        return self._hedged_call(replica, texts, server_timing, delay)
+
+    def _hedged_call(self, primary, texts, server_timing, delay):
+        # The primary runs on the caller's thread; only the hedge uses the pool
+        with self._lock:
+            self._calls += 1
+        call = _HedgedCall(primary, texts, time.monotonic() + delay)
+        with self._hedge_ready:
+            heapq.heappush(self._hedge_queue, (call.deadline, id(call), call))
+            self._hedge_ready.notify()
+
+        timings = {}
+        try:
+            result = self._call(primary, texts, timings, handle=call.handle)
+            error = None
+        except Exception as e:
+            error = e
+        with call.lock:
+            call.done = True
+            hedge = call.hedge
+
+        if hedge is None:
+            if error is not None:
+                raise error
+        elif error is None:
+            call.hedge_handle.abort()
+            hedged_requests_counter.labels(result='primary_won').inc()
+        else:
+            try:
+                result = hedge.result()
+            except Exception:
+                hedged_requests_counter.labels(result='failed').inc()
+                raise error
+            hedged_requests_counter.labels(result='hedge_won').inc()
+            timings = call.timings
+        if server_timing is not None:
+            server_timing.update(timings)
+        return result
+
+    def _send_hedge(self, call):
+        """Hedge timer: the primary has not answered by the deadline"""
+        with call.lock:
+            if call.done:
+                return
+            with self._lock:
+                allowed = self._hedges < self.hedge_budget * self._calls
+                if allowed:
+                    self._hedges += 1
+            backup = self.acquire(exclude=call.primary) if allowed else None
+            if backup is not None:
+                call.hedge = self._executor.submit(self._hedge_attempt, call, backup)
+
+    def _hedge_attempt(self, call, backup):
+        if call.hedge_handle.aborted:
+            # The primary answered while the hedge waited for a pool thread
+            self.release(backup, aborted=True)
+            raise ServingError("Hedge cancelled: the primary answered first")
+        result = self._call(backup, call.texts, call.timings, handle=call.hedge_handle)
+        # Unblock the caller's thread: the primary lost the race
+        call.handle.abort()
+        return result
+
+    def _run_hedges(self):
+        own_queue, ready = self._hedge_queue, self._hedge_ready
+        while not self._stop.is_set():
+            with ready:
+                if not own_queue:
+                    ready.wait(self.probe_interval)
+                    continue
+                wait_for = own_queue[0][0] - time.monotonic()
+                if wait_for > 0:
+                    ready.wait(wait_for)
+                    continue
+                call = heapq.heappop(own_queue)[2]
+            self._send_hedge(call)
+
+    # -- health ---------------------------------------------------------
+
+    def _probe(self, replica):
+        try:
+            payload = replica.client.health(timeout=self.probe_timeout)
+            healthy = payload.get('status') == 'healthy'
+            error = None if healthy else f"status {payload.get('status')}"
+        except Exception as e:
+            healthy, error, payload = False, str(e), {}
+
+        with self._lock:
+            replica.last_probe = time.time()
+            if healthy:
+                replica.model_version = payload.get('model_version')
+                replica.probe_successes += 1
+                replica.probe_failures = 0
+                readmit = not replica.admitted and replica.probe_successes >= self.healthy_threshold
+                if readmit:
+                    replica.admitted = True
+                eject = False
+            else:
+                replica.last_error = error
+                replica.probe_failures += 1
+                replica.probe_successes = 0
+                eject = replica.admitted and replica.probe_failures >= self.unhealthy_threshold
+                if eject:
+                    replica.admitted = False
+                readmit = False
+
+        if eject:
+            replica_up_gauge.labels(replica=replica.url).set(0)
+            replica_ejections_counter.labels(replica=replica.url, reason='probe').inc()
+            print(f"[WARNING] Ejected serving replica {replica.url}: {error}")
+        elif readmit:
+            replica_up_gauge.labels(replica=replica.url).set(1)
+            print(f"[OK] Re-admitted serving replica {replica.url}")
+
+    def _update_hedge_delay(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if len(latencies) < 50:
+            return
+        index = min(len(latencies) - 1, int(len(latencies) * self.hedge_percentile / 100))
+        self.hedge_delay = max(self.hedge_min_delay, latencies[index])
+
+    def _report_model_version(self):
+        # Only once every admitted replica serves the same version, so a
+        # rolling reload does not flip listeners back and forth
+        with self._lock:
+            versions = {r.model_version for r in self.replicas if r.admitted}
+        if len(versions) == 1 and None not in versions:
+            version = versions.pop()
+            for listener in self.model_version_listeners:
+                listener(version)
+
+    def probe_all(self):
+        for replica in self.replicas:
+            self._probe(replica)
+        if self.hedge:
+            self._update_hedge_delay()
+        self._report_model_version()
+        self._probed.set()
+
+    def _run(self):
+        while True:
+            self.probe_all()
+            if self._stop.wait(self.probe_interval):
+                return
+
+    def health(self, timeout=None):
+        """Serving health from the latest probes (waits for the first probe round only)"""
+        self._ensure_started()
+        self._probed.wait(timeout)
+        with self._lock:
+            replicas = [replica.describe() for replica in self.replicas]
+        admitted = sum(1 for r in replicas if r['admitted'] and r['circuit'] != 'open')
+        if not self._probed.is_set():
+            status = 'unknown'
+        else:
+            status = 'healthy' if admitted else 'unhealthy'
+        return {
+            'status': status,
+            'replicas_available': admitted,
+            'replicas': replicas,
+            'timestamp': datetime.now().isoformat()
+        }
+
+    # -- lifecycle ------------------------------------------------------
+
+    def start(self):
+        """Start the prober (and hedging pool) in the current process"""
+        self._pid = os.getpid()
+        self._stop.clear()
+        if self.hedge:
+            self._executor = ThreadPoolExecutor(
+                max_workers=max(8, 4 * len(self.replicas)), thread_name_prefix='hedge'
+            )
+            self._hedge_queue = []
+            self._hedge_ready = threading.Condition()
+            threading.Thread(target=self._run_hedges, name='hedge-timer', daemon=True).start()
+        self._thread = threading.Thread(target=self._run, name='replica-prober', daemon=True)
+        self._thread.start()
+
+    def _ensure_started(self):
+        # Threads do not survive a fork: prefork workers start their own prober
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self.start()
+
+    def close(self):
+        self._stop.set()
+        with self._hedge_ready:
+            self._hedge_ready.notify()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        for replica in self.replicas:
+            replica.client.close()
@@ -2,36 +2,308 @@
 Model Serving API for Spam Detection
 """
 
-from flask import Flask, request, jsonify
-import joblib
+from flask import Flask, Response, request, jsonify, stream_with_context
+from prometheus_client import Counter, Gauge, Histogram
+import gzip
+import json
 import os
+import threading
+import time
+import psutil
 from datetime import datetime
 
+from drift_monitor import DriftMonitor
+from model_runtime import MODEL_VERSION, ModelBundle, load_artifacts
+from model_reloader import ModelReloader, warmup
+from prometheus_exporter import CONTENT_TYPE, render_latest
+from shadow_model import ShadowEvaluator
+from stage_timing import STAGE_BUCKETS, start_timer
+from startup import StartupTracker
+from wire_format import (COLUMNAR, JSON, MEDIA_TYPES, accepts_gzip, available_formats,
+                         compress, decode_body, dumps_json, encode_columnar, encode_payload,
+                         media_type, negotiate)
+
+startup = StartupTracker('spam_serving')
+
 app = Flask(__name__)
 
-# Load model and vectorizer on startup
-print("Loading model and vectorizer...")
-try:
-    MODEL_PATH = os.getenv('MODEL_PATH', '/app/models/spam_detection_model.joblib')
-    VECTORIZER_PATH = os.getenv('VECTORIZER_PATH', '/app/vectorizer.joblib')
-    
-    model = joblib.load(MODEL_PATH)
-    vectorizer = joblib.load(VECTORIZER_PATH)
+
+# /invocations responses at least this large are gzip-compressed for
+# clients that accept it (0 disables compression)
+WIRE_COMPRESS_MIN_BYTES = int(os.getenv('WIRE_COMPRESS_MIN_BYTES', '16384'))
+WIRE_COMPRESS_LEVEL = int(os.getenv('WIRE_COMPRESS_LEVEL', '1'))
+
+
+def _finish_timing(response, timer):
+    if timer is not None:
+        timer.observe(stage_histogram, _stage_children)
+        server_timing = timer.header()
+        if server_timing:
+            response.headers['Server-Timing'] = server_timing
+    return response
+
+
+def wire_response(body, wire, timer=None, columnar=False):
+    """Encoded /invocations body in the negotiated format, gzip'd when large and accepted"""
+    if timer is not None:
+        timer.mark('serialize')
+    response = Response(body, content_type=media_type(wire, columnar))
+    encoding = 'identity'
+    if (WIRE_COMPRESS_MIN_BYTES and len(body) >= WIRE_COMPRESS_MIN_BYTES
+            and accepts_gzip(request.headers.get('Accept-Encoding'))):
+        response.set_data(compress(body, WIRE_COMPRESS_LEVEL))
+        response.headers['Content-Encoding'] = 'gzip'
+        encoding = 'gzip'
+        if timer is not None:
+            timer.mark('compress')
+    response.headers['Vary'] = 'Accept, Accept-Encoding'
+    response_bytes_counter.labels(format=wire, encoding=encoding).inc(response.content_length)
+    return _finish_timing(response, timer)
+
+
+MODEL_PATH = os.getenv('MODEL_PATH', '/app/models/spam_detection_model.joblib')
+VECTORIZER_PATH = os.getenv('VECTORIZER_PATH', '/app/vectorizer.joblib')
+
+# Seconds between checks for new artifacts (0 disables the file watch)
+MODEL_WATCH_INTERVAL = float(os.getenv('MODEL_WATCH_INTERVAL', '5'))
+# When set, POST /admin/reload requires a matching X-Admin-Token header
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+
+# Streaming drift/input-quality statistics of /invocations traffic
+DRIFT_MONITOR_ENABLED = os.getenv('DRIFT_MONITOR_ENABLED', 'true').lower() == 'true'
+
+drift_monitor = None
+if DRIFT_MONITOR_ENABLED:
+    drift_monitor = DriftMonitor(
+        sample_rate=float(os.getenv('DRIFT_SAMPLE_RATE', '0.1')),
+        max_rows=int(os.getenv('DRIFT_MAX_ROWS', '32')),
+        window_seconds=float(os.getenv('DRIFT_WINDOW_SECONDS', '900'))
+    )
+
+# Candidate model scored in the background on sampled /invocations traffic
+# (SHADOW_MODEL_PATH unset = no shadow evaluation)
+SHADOW_MODEL_PATH = os.getenv('SHADOW_MODEL_PATH')
+
+shadow = None
+if SHADOW_MODEL_PATH:
+    shadow = ShadowEvaluator(
+        SHADOW_MODEL_PATH,
+        os.getenv('SHADOW_VECTORIZER_PATH', VECTORIZER_PATH),
+        version=os.getenv('SHADOW_MODEL_VERSION'),
+        sample_rate=float(os.getenv('SHADOW_SAMPLE_RATE', '0.1')),
+        max_rows=int(os.getenv('SHADOW_MAX_ROWS', '32')),
+        max_queue=int(os.getenv('SHADOW_MAX_QUEUE', '100')),
+        cpu_budget=float(os.getenv('SHADOW_CPU_BUDGET', '0.1'))
+    )
+
+# Holds the active bundle; handlers read reloader.bundle once per request
+# so a swap never changes the model under a running request. Installing any
+# bundle marks the service ready, also a hot reload after a failed first load
+reloader = ModelReloader(MODEL_PATH, VECTORIZER_PATH, watch_interval=MODEL_WATCH_INTERVAL,
+                         on_install=lambda bundle: startup.mark_ready())
+
+
+def load_initial_model():
+    """Load, compile and warm up the model, then mark the service ready"""
+    print("Loading model and vectorizer...")
+    try:
+        with startup.phase('model_load'):
+            model, vectorizer = load_artifacts(MODEL_PATH, VECTORIZER_PATH)
+        with startup.phase('scorer_compile'):
+            bundle = ModelBundle(model, vectorizer, MODEL_VERSION)
+        with startup.phase('warmup'):
+            warmup(bundle)
+    except Exception as e:
+        print(f"❌ Error loading model: {e}")
+        startup.mark_failed(e)
+        return
+
+    reloader.install(bundle)
     print(f"✓ Model loaded from: {MODEL_PATH}")
-    print(f"✓ Vectorizer loaded from: {VECTORIZER_PATH}")
-except Exception as e:
-    print(f"❌ Error loading model: {e}")
-    model = None
-    vectorizer = None
+    if os.path.isdir(MODEL_PATH):
+        print("✓ Compact artifacts (vectorizer included, memory-mapped)")
+    else:
+        print(f"✓ Vectorizer loaded from: {VECTORIZER_PATH}")
+    print(f"✓ Scorer: {bundle.scorer_name}")
+    print(f"✓ Ready {time.time() - startup.started:.2f}s after process start "
+          f"({startup.phases})")
+    if shadow is not None:
+        # After the primary is ready: a broken candidate never blocks serving
+        with startup.phase('shadow_load'):
+            shadow.load()
+
+
+# Loading runs in the background so the HTTP server (and /livez) comes up
+# immediately; /readyz and /invocations answer 503 until it finishes
+model_loader = threading.Thread(target=load_initial_model, name='model-loader', daemon=True)
+model_loader.start()
+
+
+def wait_for_model(timeout=None):
+    """Block until the initial load finished; True if a model is active"""
+    model_loader.join(timeout)
+    return reloader.bundle is not None
+
+
+# ==================================================================
+# PROMETHEUS METRICS
+# ==================================================================
+# Under prefork.py every worker writes its own values; 'liveall' keeps
+# one series per live worker pid.
+
+worker_rss_gauge = Gauge(
+    'spam_serving_worker_rss_bytes',
+    'Resident set size of this serving process',
+    multiprocess_mode='liveall'
+)
+
+worker_uss_gauge = Gauge(
+    'spam_serving_worker_uss_bytes',
+    'Unique set size (memory not shared with other processes)',
+    multiprocess_mode='liveall'
+)
+
+worker_shared_gauge = Gauge(
+    'spam_serving_worker_shared_bytes',
+    'Resident memory shared with other processes (RSS - USS)',
+    multiprocess_mode='liveall'
+)
+
+stream_rows_counter = Counter(
+    'spam_serving_stream_rows_total',
+    'Rows scored through /invocations/stream'
+)
+
+stream_chunk_histogram = Histogram(
+    'spam_serving_stream_chunk_seconds',
+    'Time to score one /invocations/stream chunk',
+    buckets=[0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0]
+)
+
+stage_histogram = Histogram(
+    'spam_serving_stage_seconds',
+    'Time spent per /invocations stage',
+    ['stage'],  # label: parse/vectorize/predict/drift/shadow/format/serialize/compress
+    buckets=STAGE_BUCKETS
+)
+_stage_children = {}
+
+response_bytes_counter = Counter(
+    'spam_serving_response_bytes_total',
+    'Bytes sent in /invocations response bodies',
+    ['format', 'encoding']  # label: json/msgpack/columnar, identity/gzip
+)
+
+stream_throughput_gauge = Gauge(
+    'spam_serving_stream_rows_per_second',
+    'Throughput of the most recently finished /invocations/stream request',
+    multiprocess_mode='mostrecent'
+)
+
+MEMORY_REPORT_INTERVAL = float(os.getenv('MEMORY_REPORT_INTERVAL', '15'))
+
+
+def update_memory_metrics():
+    """Update RSS/USS gauges for this process"""
+    try:
+        memory = psutil.Process().memory_full_info()
+        worker_rss_gauge.set(memory.rss)
+        worker_uss_gauge.set(memory.uss)
+        worker_shared_gauge.set(max(0, memory.rss - memory.uss))
+        return memory
+    except Exception as e:
+        print(f"Error reading process memory: {e}")
+        return None
+
+
+def _memory_report_loop():
+    while True:
+        time.sleep(MEMORY_REPORT_INTERVAL)
+        update_memory_metrics()
+
+
+def start_memory_reporter():
+    """Refresh this process' memory gauges in the background"""
+    threading.Thread(target=_memory_report_loop, name='memory-reporter', daemon=True).start()
+
+
+def preload():
+    """prefork.py hook: runs once in the master, before forking"""
+    # Finish loading here so every worker inherits (and shares) the model
+    wait_for_model()
+    update_memory_metrics()
+
+
+def post_fork():
+    """prefork.py hook: runs in every worker right after the fork"""
+    memory = update_memory_metrics()
+    if memory is not None:
+        print(f"Worker {os.getpid()}: RSS {memory.rss / 2**20:.1f} MB, "
+              f"unique {memory.uss / 2**20:.1f} MB")
+    start_memory_reporter()
+    reloader.start()
 
 
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint"""
+    bundle = reloader.bundle
+    return jsonify({
+        'status': 'healthy' if bundle is not None else 'unhealthy',
+        'model_loaded': bundle is not None,
+        'vectorizer_loaded': bundle is not None,
+        'model_version': bundle.version if bundle is not None else None,
+        'wire_formats': available_formats(),
+        'timestamp': datetime.now().isoformat()
+    })
+
+
+@app.route('/livez', methods=['GET'])
+def livez():
+    """Liveness probe: the process is up and serving HTTP"""
+    return jsonify(startup.livez())
+
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness probe: 200 once the model is loaded and warmed up"""
+    payload, status = startup.readyz()
+    bundle = reloader.bundle
+    payload['model_version'] = bundle.version if bundle is not None else None
+    return jsonify(payload), status
+
+
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    """
+    Load the artifacts at MODEL_PATH/VECTORIZER_PATH, warm them up and swap
+    them in. Optional JSON body: {"version": "1.1"}
+
+    Under prefork.py the other workers follow through the reload trigger
+    file on their next MODEL_WATCH_INTERVAL check.
+    """
+    if ADMIN_TOKEN and request.headers.get('X-Admin-Token') != ADMIN_TOKEN:
+        return jsonify({'error': 'Forbidden'}), 403
+
+    payload = request.get_json(silent=True) or {}
+    version = payload.get('version')
+    if version is not None and not isinstance(version, str):
+        return jsonify({'error': '"version" must be a string'}), 400
+
+    previous = reloader.bundle
+    try:
+        bundle = reloader.request_reload(version)
+    except Exception as e:
+        return jsonify({
+            'error': f'Reload failed: {e}',
+            'model_version': previous.version if previous is not None else None,
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
     return jsonify({
-        'status': 'healthy' if model is not None else 'unhealthy',
-        'model_loaded': model is not None,
-        'vectorizer_loaded': vectorizer is not None,
+        'status': 'reloaded',
+        'model_version': bundle.version,
+        'previous_version': previous.version if previous is not None else None,
         'timestamp': datetime.now().isoformat()
     })
 
@@ -59,22 +331,47 @@ def invocations():
             ...
         ]
     }
+
+    With "format": "columnar" in the body (or ?format=columnar) predictions
+    are returned as parallel lists instead of one object per row:
+    {
+        "predictions": {
+            "prediction": ["spam", ...],
+            "confidence": [0.95, ...],
+            "probability_ham": [0.05, ...],
+            "probability_spam": [0.95, ...]
+        }
+    }
+
+    The response encoding is negotiated from the Accept header (see
+    wire_format.py): JSON by default, msgpack or the binary columnar
+    layout on request. Large responses are gzip'd for Accept-Encoding: gzip.
     """
+    timer = start_timer()
     try:
-        if not request.json:
+        if request.mimetype == MEDIA_TYPES[JSON] and not request.content_encoding:
+            payload = request.json
+        else:
+            # msgpack and/or gzip request bodies
+            body = request.get_data()
+            if request.content_encoding == 'gzip':
+                body = gzip.decompress(body)
+            payload = decode_body(body, request.mimetype)
+        if not payload:
             return jsonify({'error': 'No JSON data provided'}), 400
         
         # Check if model is loaded
-        if model is None or vectorizer is None:
-            return jsonify({'error': 'Model not loaded'}), 500
+        bundle = reloader.bundle
+        if bundle is None:
+            return jsonify({'error': 'Model not loaded'}), 503
         
         # Support both formats
-        if 'inputs' in request.json:
-            texts = request.json['inputs']
+        if 'inputs' in payload:
+            texts = payload['inputs']
             if not isinstance(texts, list):
                 texts = [texts]
-        elif 'text' in request.json:
-            texts = [request.json['text']]
+        elif 'text' in payload:
+            texts = [payload['text']]
         else:
             return jsonify({'error': 'Missing "inputs" or "text" field'}), 400
         
@@ -82,32 +379,31 @@ def invocations():
         if not all(isinstance(t, str) for t in texts):
             return jsonify({'error': 'All inputs must be strings'}), 400
         
-        # Vectorize
-        X = vectorizer.transform(texts)
-        
-        # Predict
-        predictions = model.predict(X)
-        probabilities = model.predict_proba(X)
+        response_format = request.args.get('format') or payload.get('format', 'records')
+        if response_format not in ('records', 'columnar'):
+            return jsonify({'error': 'format must be "records" or "columnar"'}), 400
         
-        # Format results
-        results = []
-        for i, (pred, probs) in enumerate(zip(predictions, probabilities)):
-            result = 'spam' if pred == 1 else 'ham'
-            confidence = float(probs[pred])
-            results.append({
-                'prediction': result,
-                'confidence': confidence,
-                'probabilities': {
-                    'ham': float(probs[0]),
-                    'spam': float(probs[1])
-                }
-            })
+        wire = negotiate(request.headers.get('Accept'))
+        timer.mark('parse')
         
-        return jsonify({
-            'predictions': results,
-            'model_version': '1.0',
-            'timestamp': datetime.now().isoformat()
-        })
+        # Vectorize, predict and format results
+        predictions, probabilities = bundle.score(texts, timer=timer)
+        if drift_monitor is not None:
+            drift_monitor.observe(bundle.vectorizer, texts, predictions, probabilities)
+            timer.mark('drift')
+        if shadow is not None:
+            shadow.submit(texts, predictions, probabilities)
+            timer.mark('shadow')
+        if wire == COLUMNAR:
+            body = encode_columnar(predictions, probabilities, bundle.version,
+                                   datetime.now().isoformat())
+            timer.mark('format')
+        else:
+            result = bundle.payload(predictions, probabilities,
+                                    columnar=(response_format == 'columnar'))
+            timer.mark('format')
+            body = encode_payload(result, wire)
+        return wire_response(body, wire, timer=timer, columnar=(response_format == 'columnar'))
     
     except Exception as e:
         return jsonify({
@@ -116,6 +412,132 @@ def invocations():
         }), 500
 
 
+STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', '1000'))
+# Upper bound for ?chunk_size=: one chunk is buffered and scored at once
+STREAM_MAX_CHUNK_SIZE = int(os.getenv('STREAM_MAX_CHUNK_SIZE', '10000'))
+
+
+def _parse_stream_line(line):
+    """An NDJSON input row is a JSON string or an object with "text" (and optional "id")"""
+    row = json.loads(line)
+    if isinstance(row, str):
+        return row, None
+    if isinstance(row, dict) and isinstance(row.get('text'), str):
+        return row['text'], row.get('id')
+    raise ValueError('Row must be a JSON string or an object with a "text" string')
+
+
+def _score_stream(bundle, lines, chunk_size):
+    """Score NDJSON rows in fixed-size chunks, yielding NDJSON output per chunk"""
+    started = time.perf_counter()
+    rows = 0
+    # (index, id, text, error): invalid rows keep their place so the
+    # output stays in input order
+    chunk = []
+
+    def flush():
+        chunk_start = time.perf_counter()
+        texts = [text for _, _, text, error in chunk if error is None]
+        predictions = iter(bundle.predict(texts) if texts else [])
+        out = []
+        for index, row_id, _, error in chunk:
+            if error is not None:
+                out.append(dumps_json({'index': index, 'error': error}))
+                continue
+            record = {'index': index}
+            if row_id is not None:
+                record['id'] = row_id
+            record.update(next(predictions))
+            out.append(dumps_json(record))
+        stream_chunk_histogram.observe(time.perf_counter() - chunk_start)
+        stream_rows_counter.inc(len(texts))
+        chunk.clear()
+        return b'\n'.join(out) + b'\n'
+
+    index = -1
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        index += 1
+        try:
+            text, row_id = _parse_stream_line(line)
+        except ValueError as e:
+            chunk.append((index, None, None, str(e)))
+        else:
+            chunk.append((index, row_id, text, None))
+            rows += 1
+        if len(chunk) >= chunk_size:
+            yield flush()
+
+    if chunk:
+        yield flush()
+
+    elapsed = time.perf_counter() - started
+    rows_per_second = rows / elapsed if elapsed > 0 else 0.0
+    stream_throughput_gauge.set(rows_per_second)
+    print(f"Stream scored {rows} rows in {elapsed:.2f}s ({rows_per_second:.0f} rows/sec)")
+
+
+@app.route('/invocations/stream', methods=['POST'])
+def invocations_stream():
+    """
+    Streaming bulk scoring endpoint (NDJSON in, NDJSON out)
+
+    Input: one JSON value per line, either a string or {"text": "...", "id": ...}
+    Output: one JSON object per input row, in order:
+        {"index": 0, "id": ..., "prediction": "spam", "confidence": 0.95, "probabilities": {...}}
+
+    Rows are read and scored in chunks of ?chunk_size= (default STREAM_CHUNK_SIZE,
+    at most STREAM_MAX_CHUNK_SIZE), so memory stays bounded regardless of the
+    payload size.
+    """
+    bundle = reloader.bundle
+    if bundle is None:
+        return jsonify({'error': 'Model not loaded'}), 503
+
+    chunk_size = request.args.get('chunk_size', STREAM_CHUNK_SIZE, type=int)
+    if chunk_size is None or chunk_size < 1:
+        return jsonify({'error': 'chunk_size must be a positive integer'}), 400
+    if chunk_size > STREAM_MAX_CHUNK_SIZE:
+        return jsonify({'error': f'chunk_size must be at most {STREAM_MAX_CHUNK_SIZE}'}), 400
+
+    return Response(
+        stream_with_context(_score_stream(bundle, request.stream, chunk_size)),
+        mimetype='application/x-ndjson'
+    )
+
+
+@app.route('/drift', methods=['GET'])
+def drift():
+    """Drift statistics of this worker: quantiles, OOV rate, spam ratio, heavy-hitter tokens"""
+    if drift_monitor is None:
+        return jsonify({'error': 'Drift monitor disabled (DRIFT_MONITOR_ENABLED=false)'}), 404
+    payload = drift_monitor.snapshot()
+    payload['model_version'] = reloader.bundle.version if reloader.bundle is not None else None
+    payload['timestamp'] = datetime.now().isoformat()
+    return jsonify(payload)
+
+
+@app.route('/shadow', methods=['GET'])
+def shadow_stats():
+    """Primary vs candidate agreement of this worker's shadow-scored traffic"""
+    if shadow is None:
+        return jsonify({'error': 'Shadow evaluation disabled (SHADOW_MODEL_PATH not set)'}), 404
+    payload = shadow.snapshot()
+    payload['model_version'] = reloader.bundle.version if reloader.bundle is not None else None
+    payload['timestamp'] = datetime.now().isoformat()
+    return jsonify(payload)
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics endpoint (aggregated across prefork workers)"""
+    update_memory_metrics()
+
+    return render_latest(), 200, {'Content-Type': CONTENT_TYPE}
+
+
 @app.route('/', methods=['GET'])
 def home():
     """Home endpoint with API information"""
@@ -125,7 +547,14 @@ def home():
         'version': '1.0',
         'endpoints': {
             '/invocations': 'POST - Make predictions (MLflow compatible)',
-            '/health': 'GET - Health check'
+            '/invocations/stream': 'POST - Streaming bulk scoring (NDJSON)',
+            '/drift': 'GET - Input drift and prediction statistics',
+            '/shadow': 'GET - Shadow (candidate) model agreement statistics',
+            '/admin/reload': 'POST - Hot reload the model artifacts',
+            '/metrics': 'GET - Prometheus metrics',
+            '/health': 'GET - Health check',
+            '/livez': 'GET - Liveness probe',
+            '/readyz': 'GET - Readiness probe (503 until the model is loaded)'
         },
         'example_request': {
             'url': '/invocations',
@@ -143,6 +572,9 @@ if __name__ == '__main__':
     print("=" * 60)
     print(f"Author: Yudhistira Paksi (dysnomia)")
     print(f"Starting server on http://0.0.0.0:5001")
+    print(f"For multi-worker serving use: python prefork.py serve_model:app")
     print("=" * 60)
     
+    start_memory_reporter()
+    reloader.start()
     app.run(host='0.0.0.0', port=5001, debug=False)
@@ -0,0 +1,251 @@
+"""
+Pooled HTTP client untuk Model Serving Endpoint
+Shared keep-alive connections from the inference API to serve_model.py
+"""
+
+import socket
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from prometheus_client import Counter, Gauge, Histogram
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from stage_timing import parse_server_timing
+from wire_format import JSON, MEDIA_TYPES, accept_header, available_formats, decode_body, encode_payload
+
+
+# ==================================================================
+# CONNECTION POOL METRICS
+# ==================================================================
+
+pool_connections_in_use_gauge = Gauge(
+    'spam_detector_serving_pool_connections_in_use',
+    'Number of serving endpoint connections currently checked out of the pool',
+    multiprocess_mode='livesum'
+)
+
+pool_connections_reused_counter = Counter(
+    'spam_detector_serving_pool_connections_reused_total',
+    'Number of requests that reused an open keep-alive connection'
+)
+
+pool_connections_opened_counter = Counter(
+    'spam_detector_serving_pool_connections_opened_total',
+    'Number of new TCP connections opened to the serving endpoint'
+)
+
+connect_latency_histogram = Histogram(
+    'spam_detector_serving_connect_latency_seconds',
+    'Time spent establishing a connection to the serving endpoint',
+    buckets=[0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0]
+)
+
+serving_retries_counter = Counter(
+    'spam_detector_serving_retries_total',
+    'Number of retried serving requests after a connection error'
+)
+
+
+class ServingError(Exception):
+    """Raised when the serving endpoint answers with a non-200 status"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+# ==================================================================
+# INSTRUMENTED URLLIB3 POOL
+# ==================================================================
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        pool_connections_opened_counter.inc()
+        connect_latency_histogram.observe(time.perf_counter() - start)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        pool_connections_opened_counter.inc()
+        connect_latency_histogram.observe(time.perf_counter() - start)
+
+
+class CallHandle:
+    """
+    Lets another thread abort one in-flight invoke()
+
+    The connection the call checked out is recorded until it goes back
+    to the pool, so abort() can only ever shut down this call's socket.
+    The aborted call raises a requests.ConnectionError.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conn = None
+        self.aborted = False
+
+    def _attach(self, conn):
+        with self._lock:
+            self._conn = conn
+
+    def _detach(self, conn):
+        with self._lock:
+            if self._conn is conn:
+                self._conn = None
+
+    def abort(self):
+        with self._lock:
+            self.aborted = True
+            sock = getattr(self._conn, 'sock', None)
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+
+# CallHandle of the invoke() running on this thread, if any
+_current_call = threading.local()
+
+
+class _InstrumentedPoolMixin:
+    """Track checked-out and reused connections around the pool queue"""
+
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout=timeout)
+        handle = getattr(_current_call, 'handle', None)
+        if handle is not None:
+            handle._attach(conn)
+        pool_connections_in_use_gauge.inc()
+        # A pooled connection that still has a socket skips the TCP handshake
+        if getattr(conn, 'sock', None) is not None:
+            pool_connections_reused_counter.inc()
+        return conn
+
+    def _put_conn(self, conn):
+        handle = getattr(_current_call, 'handle', None)
+        if handle is not None:
+            handle._detach(conn)
+        pool_connections_in_use_gauge.dec()
+        super()._put_conn(conn)
+
+
+class _InstrumentedHTTPConnectionPool(_InstrumentedPoolMixin, HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _InstrumentedHTTPSConnectionPool(_InstrumentedPoolMixin, HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _CountingRetry(Retry):
+    def increment(self, *args, **kwargs):
+        new_retry = super().increment(*args, **kwargs)
+        serving_retries_counter.inc()
+        return new_retry
+
+
+class _PooledAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _InstrumentedHTTPConnectionPool,
+            'https': _InstrumentedHTTPSConnectionPool,
+        }
+
+
+# ==================================================================
+# SERVING CLIENT
+# ==================================================================
+
+class ServingClient:
+    """
+    Thread-safe client for the serving endpoint
+
+    One instance is shared by all Flask worker threads. Connections are
+    kept alive and reused from a bounded pool; only connection errors
+    (where the request never reached the server) are retried.
+
+    ``wire_format`` (wire_format.py) is the /invocations response encoding
+    asked for; a serving endpoint that does not know it answers JSON.
+    """
+
+    def __init__(self, base_url, pool_size=20, connect_timeout=2.0,
+                 read_timeout=10.0, max_retries=2, retry_backoff=0.05,
+                 wire_format=JSON):
+        if wire_format not in available_formats():
+            raise ValueError(f"Unsupported wire format: {wire_format} "
+                             f"(available: {available_formats()})")
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.wire_format = wire_format
+        self._invoke_headers = {
+            'Content-Type': MEDIA_TYPES[JSON],
+            'Accept': accept_header(wire_format),
+        }
+
+        retry = _CountingRetry(
+            total=max_retries,
+            connect=max_retries,
+            read=False,
+            redirect=False,
+            status=0,
+            backoff_factor=retry_backoff,
+        )
+        adapter = _PooledAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            max_retries=retry,
+        )
+
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({'Connection': 'keep-alive'})
+
+    def invoke(self, texts, server_timing=None, handle=None):
+        """
+        Send a list of texts to /invocations and return the parsed response
+
+        When ``server_timing`` is a dict it is filled with the serving
+        stage durations (seconds) from the Server-Timing response header.
+        A ``handle`` (CallHandle) lets another thread abort the call.
+        """
+        _current_call.handle = handle
+        try:
+            response = self.session.post(
+                f"{self.base_url}/invocations",
+                data=encode_payload({"inputs": texts}, JSON),
+                headers=self._invoke_headers,
+                timeout=self.timeout
+            )
+        finally:
+            _current_call.handle = None
+        if response.status_code != 200:
+            raise ServingError(f"Serving endpoint returned {response.status_code}",
+                               status=response.status_code)
+        if server_timing is not None:
+            server_timing.update(parse_server_timing(response.headers.get('Server-Timing')))
+        return decode_body(response.content, response.headers.get('Content-Type'))
+
+    def health(self, timeout=None):
+        """Fetch the serving endpoint /health payload"""
+        response = self.session.get(
+            f"{self.base_url}/health",
+            timeout=timeout or self.timeout
+        )
+        if response.status_code != 200:
+            raise ServingError(f"Serving endpoint returned status code {response.status_code}",
+                               status=response.status_code)
+        return response.json()
+
+    def close(self):
+        self.session.close()
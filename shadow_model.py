@@ -0,0 +1,230 @@
+"""
+Shadow Model Evaluation untuk Model Serving Endpoint
+Scores a sampled fraction of live /invocations traffic with a candidate
+model in the background and compares it with the active (primary) model
+
+  agreement         primary vs candidate label per row
+                    (spam_serving_shadow_predictions_total{primary,candidate})
+  confidence delta  candidate p_spam - primary p_spam per row
+  latency           candidate scoring time per sampled request
+
+The request path only does a sampled, non-blocking put into a bounded
+queue (at most SHADOW_MAX_ROWS rows per request). Scoring happens on a
+background thread, and sampled requests are shed instead of queued when:
+
+  queue_full    the queue already holds SHADOW_MAX_QUEUE requests
+  over_budget   the thread used up its CPU budget: SHADOW_CPU_BUDGET
+                seconds of scoring per second of wall time, so the
+                candidate never takes more than that share of the GIL
+                away from request threads
+
+The candidate is loaded once after the primary model (in the prefork
+master, shared copy-on-write) from SHADOW_MODEL_PATH, joblib or compact.
+"""
+
+import math
+import os
+import queue
+import random
+import threading
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from model_runtime import LABELS, ModelBundle
+
+
+# ==================================================================
+# SHADOW METRICS
+# ==================================================================
+
+shadow_requests_counter = Counter(
+    'spam_serving_shadow_requests_total',
+    'Requests seen by the shadow evaluator by outcome',
+    ['result']  # label: scored/sampled_out/queue_full/over_budget/error
+)
+
+shadow_predictions_counter = Counter(
+    'spam_serving_shadow_predictions_total',
+    'Shadow-scored rows by primary and candidate label',
+    ['primary', 'candidate']  # label: ham/spam
+)
+
+shadow_delta_histogram = Histogram(
+    'spam_serving_shadow_confidence_delta',
+    'Candidate minus primary spam probability per shadow-scored row',
+    buckets=[-0.5, -0.2, -0.1, -0.05, -0.01, 0.01, 0.05, 0.1, 0.2, 0.5, 1.0]
+)
+
+shadow_latency_histogram = Histogram(
+    'spam_serving_shadow_latency_seconds',
+    'Candidate model scoring time per shadow-scored request',
+    buckets=[0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25]
+)
+
+shadow_queue_gauge = Gauge(
+    'spam_serving_shadow_queue_depth',
+    'Requests waiting to be shadow-scored',
+    multiprocess_mode='livesum'
+)
+
+shadow_model_info_gauge = Gauge(
+    'spam_serving_shadow_model_info',
+    'Candidate model version being shadow-evaluated (1 = active)',
+    ['version'],
+    multiprocess_mode='liveall'
+)
+
+
+class ShadowEvaluator:
+    """Sampled, background comparison of a candidate model against the primary"""
+
+    def __init__(self, model_path, vectorizer_path, version=None, sample_rate=0.1,
+                 max_rows=32, max_queue=100, cpu_budget=0.1):
+        self.model_path = model_path
+        self.vectorizer_path = vectorizer_path
+        self.version = version
+        self.sample_rate = min(1.0, max(0.0, sample_rate))
+        self.max_rows = max(1, max_rows)
+        self.max_queue = max_queue
+        self.cpu_budget = cpu_budget
+
+        self.candidate = None
+        self.last_error = None
+        # Scoring-seconds bucket: refills at cpu_budget per second, one second deep
+        self._budget = 1.0
+        self._budget_updated = time.monotonic()
+
+        self._rows = 0
+        self._agreed = 0
+        self._delta_sum = 0.0
+        self._abs_delta_sum = 0.0
+        self._matrix = {(p, c): 0 for p in LABELS.tolist() for c in LABELS.tolist()}
+        self._stats_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._results = {result: shadow_requests_counter.labels(result=result)
+                         for result in ('scored', 'sampled_out', 'queue_full',
+                                        'over_budget', 'error')}
+        self._label_counters = {(p, c): shadow_predictions_counter.labels(primary=p, candidate=c)
+                                for p in LABELS.tolist() for c in LABELS.tolist()}
+        self._start()
+
+    def _start(self):
+        # Threads do not survive a fork: a prefork worker starts its own
+        self._pid = os.getpid()
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._thread = threading.Thread(target=self._run, name='shadow-model', daemon=True)
+        self._thread.start()
+
+    def load(self):
+        """Load the candidate model; False (and logged) when it cannot be loaded"""
+        try:
+            candidate = ModelBundle.load(self.model_path, self.vectorizer_path,
+                                         self.version or 'candidate')
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"❌ Shadow model not loaded from {self.model_path}: {e}")
+            return False
+        self.candidate = candidate
+        self.last_error = None
+        shadow_model_info_gauge.labels(version=candidate.version).set(1)
+        print(f"✓ Shadow model {candidate.version} loaded from: {self.model_path} "
+              f"(sample rate {self.sample_rate})")
+        return True
+
+    # -- request path ---------------------------------------------------
+
+    def submit(self, texts, predictions, probabilities):
+        """Maybe enqueue one scored request for the candidate; never blocks"""
+        if self.candidate is None:
+            return
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            self._results['sampled_out'].inc()
+            return
+        if self._budget <= 0.0 and self._refill() <= 0.0:
+            self._results['over_budget'].inc()
+            return
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._start()
+
+        step = max(1, math.ceil(len(texts) / self.max_rows))
+        item = (texts[::step], predictions[::step], probabilities[::step, 1])
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._results['queue_full'].inc()
+            return
+        shadow_queue_gauge.inc()
+
+    def _refill(self):
+        now = time.monotonic()
+        with self._lock:
+            self._budget = min(1.0, self._budget + (now - self._budget_updated) * self.cpu_budget)
+            self._budget_updated = now
+            return self._budget
+
+    # -- background thread ----------------------------------------------
+
+    def _evaluate(self, texts, primary_predictions, primary_spam):
+        candidate = self.candidate
+        start = time.perf_counter()
+        predictions, probabilities = candidate.score(texts)
+        elapsed = time.perf_counter() - start
+        shadow_latency_histogram.observe(elapsed)
+        self._refill()
+        with self._lock:
+            self._budget -= elapsed
+
+        primary_labels = LABELS[primary_predictions].tolist()
+        candidate_labels = LABELS[predictions].tolist()
+        deltas = (probabilities[:, 1] - primary_spam).tolist()
+        with self._stats_lock:
+            for primary, label, delta in zip(primary_labels, candidate_labels, deltas):
+                self._matrix[primary, label] += 1
+                self._agreed += primary == label
+                self._delta_sum += delta
+                self._abs_delta_sum += abs(delta)
+            self._rows += len(deltas)
+        for primary, label, delta in zip(primary_labels, candidate_labels, deltas):
+            self._label_counters[primary, label].inc()
+            shadow_delta_histogram.observe(delta)
+
+    def _run(self):
+        own_queue = self._queue
+        while True:
+            item = own_queue.get()
+            shadow_queue_gauge.dec()
+            try:
+                self._evaluate(*item)
+            except Exception as e:
+                self.last_error = str(e)
+                self._results['error'].inc()
+                print(f"Shadow scoring failed: {e}")
+                continue
+            self._results['scored'].inc()
+
+    # -- export ---------------------------------------------------------
+
+    def snapshot(self):
+        """Agreement statistics of this process (also served as /shadow)"""
+        with self._stats_lock:
+            rows = self._rows
+            matrix = {f'{p}->{c}': n for (p, c), n in self._matrix.items()}
+            agreed = self._agreed
+            delta_sum = self._delta_sum
+            abs_delta_sum = self._abs_delta_sum
+        return {
+            'candidate_version': self.candidate.version if self.candidate is not None else None,
+            'candidate_path': self.model_path,
+            'sample_rate': self.sample_rate,
+            'rows': rows,
+            'agreement': agreed / rows if rows else None,
+            'mean_spam_delta': delta_sum / rows if rows else None,
+            'mean_abs_spam_delta': abs_delta_sum / rows if rows else None,
+            'labels': matrix,
+            'queue_depth': self._queue.qsize(),
+            'last_error': self.last_error,
+        }
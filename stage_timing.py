@@ -0,0 +1,184 @@
+"""
+Stage Timing untuk Spam Detection Services
+Per-request stage durations for latency breakdown histograms and the
+Server-Timing response header
+
+    timer = start_timer()
+    ...parse...
+    timer.mark('parse')
+    ...vectorize...
+    timer.mark('vectorize')
+    timer.observe(stage_histogram)
+    response.headers['Server-Timing'] = timer.header()
+
+Each mark() records the time since the previous mark (or since the timer
+was started), so the stages add up to the instrumented part of the request.
+The serving endpoint sends its stages back in Server-Timing; the gateway
+subtracts their total from the remote call to get pure network/queue time.
+
+STAGE_TIMING=false swaps in a no-op timer. ``python stage_timing.py``
+measures the per-request overhead against INSTRUMENTATION_BUDGET_US.
+"""
+
+import os
+import sys
+import time
+
+STAGE_TIMING = os.getenv('STAGE_TIMING', 'true').lower() == 'true'
+
+# Allowed instrumentation cost per request (timer, marks, histogram
+# observations and header), checked by the overhead measurement below
+INSTRUMENTATION_BUDGET_US = 25.0
+
+# Buckets for individual stages: most are well under a millisecond
+STAGE_BUCKETS = [0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                 0.01, 0.025, 0.05, 0.1, 0.5, 1.0]
+
+
+class StageTimer:
+    """Durations of consecutive named stages within one request"""
+
+    __slots__ = ('started', '_last', 'stages')
+
+    def __init__(self):
+        self.started = self._last = time.perf_counter()
+        self.stages = []
+
+    def mark(self, name):
+        """Close the stage that ran since the previous mark"""
+        now = time.perf_counter()
+        self.stages.append((name, now - self._last))
+        self._last = now
+
+    def mark_split(self, name, inner_name, inner_seconds):
+        """Close a stage that contained ``inner_seconds`` of a separately measured stage"""
+        now = time.perf_counter()
+        inner_seconds = min(inner_seconds, now - self._last)
+        self.stages.append((name, now - self._last - inner_seconds))
+        self.stages.append((inner_name, inner_seconds))
+        self._last = now
+
+    def total(self):
+        return self._last - self.started
+
+    def observe(self, histogram, children=None):
+        """Observe every stage into a histogram labelled by ``stage``"""
+        for name, seconds in self.stages:
+            child = children.get(name) if children is not None else None
+            if child is None:
+                child = histogram.labels(stage=name)
+                if children is not None:
+                    children[name] = child
+            child.observe(seconds)
+
+    def header(self, extra=None):
+        """
+        Server-Timing header value, durations in milliseconds
+
+        ``extra`` ({name: seconds}) is appended as is, e.g. stages forwarded
+        from the serving endpoint.
+        """
+        parts = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.stages]
+        parts.append(f"total;dur={self.total() * 1000:.3f}")
+        if extra:
+            parts.extend(f"{name};dur={seconds * 1000:.3f}" for name, seconds in extra.items())
+        return ', '.join(parts)
+
+
+class _NullTimer:
+    """Timer used when STAGE_TIMING is off: every call is a no-op"""
+
+    __slots__ = ()
+    stages = ()
+
+    def mark(self, name):
+        pass
+
+    def mark_split(self, name, inner_name, inner_seconds):
+        pass
+
+    def total(self):
+        return 0.0
+
+    def observe(self, histogram, children=None):
+        pass
+
+    def header(self, extra=None):
+        return None
+
+
+NULL_TIMER = _NullTimer()
+
+
+def start_timer(enabled=None):
+    if enabled is None:
+        enabled = STAGE_TIMING
+    return StageTimer() if enabled else NULL_TIMER
+
+
+def parse_server_timing(value):
+    """{name: seconds} from a Server-Timing header (entries without dur are skipped)"""
+    timings = {}
+    if not value:
+        return timings
+    for entry in value.split(','):
+        name, _, params = entry.strip().partition(';')
+        for param in params.split(';'):
+            key, _, number = param.strip().partition('=')
+            if key == 'dur':
+                try:
+                    timings[name.strip()] = float(number.strip('"')) / 1000.0
+                except ValueError:
+                    pass
+                break
+    return timings
+
+
+def measure_overhead(iterations=20000):
+    """Per-request cost in microseconds of a 5-stage timer with histogram and header"""
+    from prometheus_client import CollectorRegistry, Histogram
+
+    histogram = Histogram('stage_timing_overhead_seconds', 'Overhead check',
+                          ['stage'], buckets=STAGE_BUCKETS,
+                          registry=CollectorRegistry())
+    children = {}
+    stages = ('parse', 'vectorize', 'predict', 'format', 'serialize')
+
+    def instrumented():
+        timer = start_timer(True)
+        for name in stages:
+            timer.mark(name)
+        timer.observe(histogram, children)
+        return timer.header()
+
+    def baseline():
+        timer = start_timer(False)
+        for name in stages:
+            timer.mark(name)
+        timer.observe(histogram, children)
+        return timer.header()
+
+    results = []
+    for fn in (baseline, instrumented):
+        for _ in range(1000):
+            fn()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        results.append((time.perf_counter() - start) / iterations * 1e6)
+    return results[1] - results[0]
+
+
+def main():
+    overhead = measure_overhead()
+    print(f"Stage timing overhead: {overhead:.1f} us per request "
+          f"(budget {INSTRUMENTATION_BUDGET_US:.0f} us)")
+    if overhead > INSTRUMENTATION_BUDGET_US:
+        print("❌ Over budget")
+        return 1
+    print("✓ Within budget")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""
+Startup Tracking untuk Spam Detection Services
+Times each startup phase and tracks readiness for /livez and /readyz
+
+  /livez   the process is up and serving HTTP (always 200)
+  /readyz  200 once the service can answer predictions, 503 before that
+
+Phase durations are exported as <prefix>_startup_phase_seconds{phase};
+the time from process start until ready as <prefix>_startup_ready_seconds.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import psutil
+from prometheus_client import Gauge
+
+
+def process_start_time():
+    """Wall-clock creation time of this process (fork time for prefork workers)"""
+    try:
+        return psutil.Process().create_time()
+    except Exception:
+        return time.time()
+
+
+class StartupTracker:
+    """Startup phase timings plus a ready / not-ready state"""
+
+    def __init__(self, prefix):
+        self.phase_gauge = Gauge(
+            f'{prefix}_startup_phase_seconds',
+            'Duration of each startup phase',
+            ['phase'],
+            multiprocess_mode='mostrecent'
+        )
+        self.ready_gauge = Gauge(
+            f'{prefix}_startup_ready_seconds',
+            'Seconds from process start until the service became ready',
+            multiprocess_mode='mostrecent'
+        )
+        self.started = process_start_time()
+        self.phases = {}
+        self.error = None
+        self._ready = threading.Event()
+
+        # Everything before the tracker exists: interpreter start and imports
+        self.record('imports', time.time() - self.started)
+
+    def record(self, name, seconds):
+        self.phases[name] = round(seconds, 4)
+        self.phase_gauge.labels(phase=name).set(seconds)
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def mark_ready(self):
+        if not self._ready.is_set():
+            self.error = None
+            self.ready_gauge.set(time.time() - self.started)
+            self._ready.set()
+
+    def mark_failed(self, error):
+        self.error = str(error)
+
+    def wait(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def livez(self):
+        return {'status': 'alive', 'timestamp': datetime.now().isoformat()}
+
+    def readyz(self):
+        """(payload, HTTP status) for the readiness probe"""
+        payload = {
+            'status': 'ready' if self.ready else 'not_ready',
+            'startup_phases_seconds': dict(self.phases),
+            'timestamp': datetime.now().isoformat()
+        }
+        if self.error:
+            payload['error'] = self.error
+        return payload, 200 if self.ready else 503
@@ -0,0 +1,97 @@
+"""
+System Metrics Sampler
+Background thread that keeps the CPU, memory and disk gauges fresh so
+the request and scrape paths only read cached values
+"""
+
+import os
+import threading
+import time
+
+import psutil
+from prometheus_client import Gauge, Histogram
+
+
+# ==================================================================
+# SAMPLER METRICS
+# ==================================================================
+
+disk_path_usage_gauge = Gauge(
+    'spam_detector_disk_path_usage_percent',
+    'Disk usage percentage per monitored path',
+    ['path'],
+    multiprocess_mode='mostrecent'
+)
+
+sampler_duration_histogram = Histogram(
+    'spam_detector_system_sampler_duration_seconds',
+    'Time spent collecting one round of system metrics',
+    buckets=[0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1]
+)
+
+
+def default_disk_paths():
+    """Root of the current drive: '/' on Linux, 'C:\\' on Windows"""
+    return [os.path.abspath(os.sep)]
+
+
+class SystemSampler:
+    """
+    Periodically sample psutil into the given gauges
+
+    CPU usage uses the non-blocking ``psutil.cpu_percent(interval=None)``,
+    which reports utilisation since the previous sample, so no sampling
+    round ever sleeps. ``disk_gauge`` holds the fullest monitored path.
+    """
+
+    def __init__(self, cpu_gauge, memory_gauge, disk_gauge,
+                 interval=5.0, disk_paths=None):
+        self.cpu_gauge = cpu_gauge
+        self.memory_gauge = memory_gauge
+        self.disk_gauge = disk_gauge
+        self.interval = interval
+        self.disk_paths = disk_paths or default_disk_paths()
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sample_once(self):
+        """Collect one round of system metrics"""
+        start = time.perf_counter()
+        try:
+            self.cpu_gauge.set(psutil.cpu_percent(interval=None))
+            self.memory_gauge.set(psutil.virtual_memory().percent)
+
+            fullest = None
+            for path in self.disk_paths:
+                try:
+                    percent = psutil.disk_usage(path).percent
+                except OSError as e:
+                    print(f"Error reading disk usage for {path}: {e}")
+                    continue
+                disk_path_usage_gauge.labels(path=path).set(percent)
+                fullest = percent if fullest is None else max(fullest, percent)
+            if fullest is not None:
+                self.disk_gauge.set(fullest)
+        except Exception as e:
+            print(f"Error updating system metrics: {e}")
+        finally:
+            sampler_duration_histogram.observe(time.perf_counter() - start)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        # First cpu_percent(None) call only primes the counters
+        psutil.cpu_percent(interval=None)
+        self.sample_once()
+        self._thread = threading.Thread(
+            target=self._run, name='system-sampler', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample_once()
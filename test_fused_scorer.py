@@ -0,0 +1,91 @@
+"""
+Equivalence test for the fused scorer
+Runs FusedScorer and vectorizer.transform + model.predict_proba on the
+same fixed corpus and checks that the probabilities match
+
+Usage:
+  python test_fused_scorer.py
+  python -m pytest test_fused_scorer.py
+"""
+
+import os
+
+import joblib
+import numpy as np
+
+from fused_scorer import FusedScorer, verification_texts
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, 'models', 'spam_detection_model.joblib')
+VECTORIZER_PATH = os.path.join(BASE_DIR, 'vectorizer.joblib')
+
+ATOL = 1e-9
+
+# Empty, out-of-vocabulary, Indonesian, mixed case, punctuation and long texts
+CORPUS = [
+    "",
+    " ",
+    "!!! ??? ...",
+    "zzqx qqzv xyzzy blorptastic",
+    "CONGRATULATIONS! You have won $1,000,000! Click here to claim your prize!",
+    "Hi, can we meet for coffee tomorrow at 3pm?",
+    "URGENT! Your account will be closed. Verify now at fake-link.com",
+    "FREE FREE FREE! Click now to win!",
+    "free Free FREE fReE",
+    "Thanks for your email. I'll review the document and get back to you.",
+    "Selamat! Anda memenangkan hadiah, hubungi nomor ini sekarang",
+    "Rapat tim dipindah ke hari Kamis jam 10 pagi",
+    "Kamu dapat pulsa gratis 100rb, klik link berikut untuk klaim",
+    "café naïve résumé – “quoted” text",
+    "ok",
+    "win " * 500,
+]
+
+
+def load_pipeline():
+    model = joblib.load(MODEL_PATH)
+    vectorizer = joblib.load(VECTORIZER_PATH)
+    return model, vectorizer, FusedScorer.compile(vectorizer, model)
+
+
+def check_equivalence(texts):
+    model, vectorizer, scorer = load_pipeline()
+    expected = model.predict_proba(vectorizer.transform(texts))
+    actual = scorer.predict_proba(texts)
+    assert actual.shape == expected.shape
+    difference = float(np.max(np.abs(expected - actual)))
+    assert difference <= ATOL, f"max |dp| = {difference:.3g} on {len(texts)} texts"
+    assert np.array_equal(expected.argmax(axis=1), actual.argmax(axis=1))
+    return difference
+
+
+def test_fixed_corpus():
+    """Fixed corpus, one text at a time and as one batch"""
+    for text in CORPUS:
+        check_equivalence([text])
+    check_equivalence(CORPUS)
+
+
+def test_vocabulary_mixes():
+    """Random mixes of vocabulary terms (the load-time verify() corpus, larger)"""
+    _, vectorizer, _ = load_pipeline()
+    check_equivalence(verification_texts(vectorizer, n=1000, seed=1))
+
+
+def test_term_counts_roundtrip():
+    """term_counts() + proba_from_counts() is the same as predict_proba()"""
+    _, _, scorer = load_pipeline()
+    counts = scorer.term_counts(CORPUS)
+    np.testing.assert_array_equal(scorer.proba_from_counts(counts, len(CORPUS)),
+                                  scorer.predict_proba(CORPUS))
+
+
+def main():
+    for test in (test_fixed_corpus, test_vocabulary_mixes, test_term_counts_roundtrip):
+        test()
+        print(f"✓ {test.__name__}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
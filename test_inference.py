@@ -3,11 +3,14 @@ Test Script untuk Generate Traffic ke Inference API
 Untuk menghasilkan metrics yang bisa dimonitor
 """
 
+import os
 import requests
 import time
 import random
 from datetime import datetime
 
+API_URL = os.getenv('API_URL', 'http://localhost:8000')
+
 # Test messages
 SPAM_MESSAGES = [
     "CONGRATULATIONS! You won $1000000! Click here now!!!",
@@ -33,7 +36,7 @@ HAM_MESSAGES = [
 
 def make_prediction(text, should_fail=False):
     """Make a prediction request"""
-    url = 'http://localhost:5000/predict'
+    url = f'{API_URL}/predict'
     
     try:
         if should_fail:
@@ -70,7 +73,7 @@ def generate_traffic(num_requests=100, delay=0.1, error_rate=0.05):
     print("TRAFFIC GENERATOR - SPAM DETECTION API")
     print("=" * 70)
     print(f"Author: Yudhistira Paksi (dysnomia)")
-    print(f"Target: http://localhost:5000/predict")
+    print(f"Target: {API_URL}/predict")
     print(f"Requests: {num_requests}")
     print(f"Delay: {delay}s")
     print(f"Error rate: {error_rate * 100}%")
@@ -112,43 +115,40 @@ def generate_traffic(num_requests=100, delay=0.1, error_rate=0.05):
     print("=" * 70)
 
 
-def stress_test(duration_seconds=60):
+def stress_test(duration_seconds=60, rate=50.0, concurrency=64):
     """
     Stress test untuk generate banyak traffic
-    
+
+    Open-loop: requests are sent at a fixed arrival rate by concurrent
+    workers (see load_test.py), and latency includes time spent waiting
+    when the API falls behind.
+
     Args:
         duration_seconds: Durasi test dalam detik
+        rate: Request per detik yang dikirim
+        concurrency: Maksimum request yang berjalan bersamaan
     """
+    from load_test import print_result, run_fixed
+
     print("=" * 70)
     print("STRESS TEST - SPAM DETECTION API")
     print("=" * 70)
-    print(f"Duration: {duration_seconds} seconds")
+    print(f"Target: {API_URL}/predict")
+    print(f"Duration: {duration_seconds} seconds at {rate:g} req/s")
     print(f"Starting at: {datetime.now().strftime('%H:%M:%S')}")
     print("=" * 70)
     print()
-    
-    start_time = time.time()
-    request_count = 0
-    
-    while time.time() - start_time < duration_seconds:
-        message = random.choice(SPAM_MESSAGES + HAM_MESSAGES)
-        make_prediction(message)
-        request_count += 1
-        
-        # Random delay antara 0.01 - 0.5 detik
-        time.sleep(random.uniform(0.01, 0.5))
-    
-    duration = time.time() - start_time
-    rps = request_count / duration
-    
+
+    result = run_fixed(f'{API_URL}/predict', '/predict', rate, duration_seconds,
+                       concurrency=concurrency)
+
     print()
     print("=" * 70)
     print("STRESS TEST SUMMARY")
     print("=" * 70)
-    print(f"Duration: {duration:.2f}s")
-    print(f"Total requests: {request_count}")
-    print(f"Requests per second: {rps:.2f}")
+    print_result(f"{rate:g} rps", result)
     print("=" * 70)
+    return result
 
 
 if __name__ == '__main__':
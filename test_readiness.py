@@ -0,0 +1,64 @@
+"""
+Readiness test for the serving endpoint
+Starts serve_model with artifacts that cannot be loaded, then provides
+them and reloads: /readyz must turn 200 after the hot reload
+
+Usage:
+  python test_readiness.py
+  python -m pytest test_readiness.py
+"""
+
+import importlib
+import os
+import shutil
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, 'models', 'spam_detection_model.joblib')
+VECTORIZER_PATH = os.path.join(BASE_DIR, 'vectorizer.joblib')
+
+
+def test_ready_after_reload_following_failed_load():
+    """A failed first load is not fatal: a later reload makes the service ready"""
+    artifacts = tempfile.mkdtemp(prefix='serve_model_')
+    model_path = os.path.join(artifacts, 'model.joblib')
+    vectorizer_path = os.path.join(artifacts, 'vectorizer.joblib')
+    environ = dict(os.environ)
+    os.environ.update({
+        'MODEL_PATH': model_path,
+        'VECTORIZER_PATH': vectorizer_path,
+        'MODEL_WATCH_INTERVAL': '0',
+    })
+    try:
+        serve_model = importlib.import_module('serve_model')
+        assert not serve_model.wait_for_model(timeout=60)
+        client = serve_model.app.test_client()
+
+        response = client.get('/readyz')
+        assert response.status_code == 503
+        assert response.get_json()['error']
+
+        shutil.copy(MODEL_PATH, model_path)
+        shutil.copy(VECTORIZER_PATH, vectorizer_path)
+        assert client.post('/admin/reload', json={'version': 'reloaded'}).status_code == 200
+
+        response = client.get('/readyz')
+        payload = response.get_json()
+        assert response.status_code == 200
+        assert payload['status'] == 'ready'
+        assert payload['model_version'] == 'reloaded'
+        assert 'error' not in payload
+    finally:
+        os.environ.clear()
+        os.environ.update(environ)
+        shutil.rmtree(artifacts, ignore_errors=True)
+
+
+def main():
+    test_ready_after_reload_following_failed_load()
+    print("✓ test_ready_after_reload_following_failed_load")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,115 @@
+"""
+Fail-open test for the replica router
+Runs stub serving endpoints whose /health can be switched off and checks
+that ejected or circuit-open replicas are only deprioritized
+
+Usage:
+  python test_replica_router.py
+  python -m pytest test_replica_router.py
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from replica_router import CircuitBreaker, ReplicaRouter
+
+
+class StubReplica:
+    """/health and /invocations of a serving endpoint, /health can be failed"""
+
+    def __init__(self):
+        self.healthy = True
+        self.invocations = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, payload):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if stub.healthy:
+                    self._send(200, {'status': 'healthy', 'model_version': 'test'})
+                else:
+                    self._send(503, {'status': 'unhealthy'})
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers['Content-Length']))
+                stub.invocations += 1
+                self._send(200, {'predictions': [{'prediction': 'ham'}], 'model_version': 'test'})
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.02)
+
+
+def test_last_replica_fails_open():
+    """The only replica is ejected by probes and its circuit is open: calls still go through"""
+    stub = StubReplica()
+    router = ReplicaRouter([stub.url], probe_interval=0.05, probe_timeout=0.5)
+    try:
+        stub.healthy = False
+        replica = router.replicas[0]
+        wait_until(lambda: not replica.admitted)
+        assert router.invoke(['hi'])['predictions'][0]['prediction'] == 'ham'
+
+        with router._lock:
+            replica.breaker.state = CircuitBreaker.OPEN
+            replica.breaker.opened_at = time.monotonic()
+        assert router.invoke(['hi'])['predictions'][0]['prediction'] == 'ham'
+        assert stub.invocations == 2
+    finally:
+        router.close()
+        stub.close()
+
+
+def test_ejection_deprioritizes():
+    """With one healthy replica left, an ejected one gets no traffic"""
+    healthy, ejected = StubReplica(), StubReplica()
+    router = ReplicaRouter([healthy.url, ejected.url], probe_interval=0.05, probe_timeout=0.5)
+    try:
+        ejected.healthy = False
+        wait_until(lambda: not router.replicas[1].admitted)
+        for _ in range(20):
+            router.invoke(['hi'])
+        assert healthy.invocations == 20
+        assert ejected.invocations == 0
+        # Hedges never fail open: there is no second admitted replica
+        assert router.acquire(exclude=router.replicas[0]) is None
+    finally:
+        router.close()
+        healthy.close()
+        ejected.close()
+
+
+def main():
+    for test in (test_last_replica_fails_open, test_ejection_deprioritizes):
+        test()
+        print(f"✓ {test.__name__}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
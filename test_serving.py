@@ -116,6 +116,36 @@ def test_error_handling():
         return False
 
 
+def test_columnar_predictions():
+    """Test columnar response format"""
+    print("\n" + "=" * 60)
+    print("TEST 5: Columnar Predictions")
+    print("=" * 60)
+    
+    test_texts = [
+        "FREE FREE FREE! Click now to win!",
+        "Hi, can we meet for coffee tomorrow at 3pm?",
+    ]
+    
+    try:
+        response = requests.post(
+            f"{SERVING_URL}/invocations",
+            json={"inputs": test_texts, "format": "columnar"},
+            headers={"Content-Type": "application/json"}
+        )
+        
+        print(f"Status Code: {response.status_code}")
+        print(f"Response: {json.dumps(response.json(), indent=2)}")
+        
+        if response.status_code != 200:
+            return False
+        columns = response.json()['predictions']
+        return len(columns['prediction']) == len(test_texts)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return False
+
+
 def main():
     """Run all tests"""
     print("\n" + "=" * 60)
@@ -128,7 +158,8 @@ def main():
         "Health Check": test_health(),
         "Single Prediction": test_single_prediction(),
         "Batch Predictions": test_batch_predictions(),
-        "Error Handling": test_error_handling()
+        "Error Handling": test_error_handling(),
+        "Columnar Predictions": test_columnar_predictions()
     }
     
     print("\n" + "=" * 60)
@@ -0,0 +1,104 @@
+"""
+Unit test for the sliding-window statistics engine
+Drives SlidingWindowCounter, EwmaRate and SlidingWindowStats with an
+injected clock, so window expiry and idle gaps need no sleeping
+
+Usage:
+  python test_window_stats.py
+  python -m pytest test_window_stats.py
+"""
+
+import math
+
+from window_stats import EwmaRate, SlidingWindowCounter, SlidingWindowStats
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def steady_traffic(stats, clock, seconds, per_second=2, error_every=10):
+    """``per_second`` requests per second, every ``error_every``-th one failing"""
+    start, sent = clock.now, 0
+    for second in range(seconds):
+        clock.now = start + second
+        for _ in range(per_second):
+            stats.record_request()
+            sent += 1
+            if sent % error_every == 0:
+                stats.record_error()
+
+
+def test_window_expiry():
+    """Events leave the 1m window after 60 s but stay in the 5m/15m windows"""
+    counter = SlidingWindowCounter(900, bucket_seconds=1.0)
+    counter.add(1000.0, 5)
+    counter.add(1000.5)
+    assert counter.total(1000.9, 60) == 6
+    assert counter.total(1059.0, 60) == 6
+    assert counter.total(1060.0, 60) == 0
+    assert counter.total(1060.0, 300) == 6
+    assert counter.total(1899.0, 900) == 6
+    assert counter.total(1900.0, 900) == 0
+
+
+def test_idle_gap():
+    """A gap longer than the whole ring clears every bucket and decays the EWMA"""
+    counter = SlidingWindowCounter(900, bucket_seconds=1.0)
+    for second in range(900):
+        counter.add(1000.0 + second)
+    assert counter.total(1899.0, 900) == 900
+    assert counter.total(100000.0, 900) == 0
+    counter.add(100000.5, 3)
+    assert counter.total(100000.5, 60) == 3
+
+    ewma = EwmaRate(60, tick_seconds=5.0)
+    for tick in range(120):
+        ewma.add(1000.0 + 5 * tick, 10)
+    assert math.isclose(ewma.value(1600.0), 2.0, rel_tol=0.01)
+    assert ewma.value(1600.0 + 3600.0) < 1e-20
+
+
+def test_rates():
+    """Request counts, error rates and EWMA rates under steady traffic"""
+    clock = FakeClock()
+    stats = SlidingWindowStats(clock=clock)
+    steady_traffic(stats, clock, seconds=900)
+
+    snapshot = stats.snapshot()
+    assert snapshot['total_requests'] == 1800
+    assert snapshot['total_errors'] == 180
+    assert snapshot['requests_per_minute'] == 120
+    assert math.isclose(snapshot['error_rate_percent'], 10.0)
+    for name, seconds in SlidingWindowStats.WINDOWS.items():
+        window = snapshot['windows'][name]
+        assert window['requests'] == 2 * seconds
+        assert window['errors'] == 2 * seconds // 10
+        assert math.isclose(window['error_rate_percent'], 10.0)
+    # The 15m EWMA has seen about one time constant of traffic, 1m and 5m have converged
+    assert math.isclose(snapshot['windows']['1m']['ewma_requests_per_minute'], 120, rel_tol=0.01)
+    assert math.isclose(snapshot['windows']['5m']['ewma_requests_per_minute'], 120, rel_tol=0.1)
+    assert math.isclose(snapshot['windows']['1m']['ewma_error_rate_percent'], 10.0, rel_tol=0.05)
+
+    # Two idle minutes: the 1m window is empty, the lifetime totals are not
+    clock.now += 120
+    snapshot = stats.snapshot()
+    assert snapshot['requests_per_minute'] == 0
+    assert snapshot['windows']['1m']['error_rate_percent'] == 0.0
+    assert snapshot['windows']['5m']['requests'] == 2 * 180
+    assert snapshot['total_requests'] == 1800
+
+
+def main():
+    for test in (test_window_expiry, test_idle_gap, test_rates):
+        test()
+        print(f"✓ {test.__name__}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
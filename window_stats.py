@@ -0,0 +1,168 @@
+"""
+Sliding Window Statistics
+Constant-memory, thread-safe request/error rates over 1m/5m/15m windows
+"""
+
+import math
+import threading
+import time
+
+
+class SlidingWindowCounter:
+    """
+    Event counter over a sliding window made of a fixed ring of buckets
+
+    Memory is ``window_seconds / bucket_seconds`` integers regardless of
+    traffic. ``add`` is O(1) amortised: stale buckets are cleared lazily
+    as the clock moves forward. Not thread-safe on its own.
+    """
+
+    def __init__(self, window_seconds=900, bucket_seconds=1.0):
+        self.bucket_seconds = bucket_seconds
+        self.size = max(1, int(math.ceil(window_seconds / bucket_seconds)))
+        self._buckets = [0] * self.size
+        self._head = None  # absolute index of the newest bucket
+
+    def _advance(self, now):
+        index = int(now // self.bucket_seconds)
+        if self._head is None:
+            self._head = index
+        elif index > self._head:
+            stale = min(index - self._head, self.size)
+            for i in range(1, stale + 1):
+                self._buckets[(self._head + i) % self.size] = 0
+            self._head = index
+        return self._head
+
+    def add(self, now, n=1):
+        head = self._advance(now)
+        self._buckets[head % self.size] += n
+
+    def total(self, now, seconds):
+        """Number of events in the last ``seconds`` seconds"""
+        head = self._advance(now)
+        count = min(self.size, int(math.ceil(seconds / self.bucket_seconds)))
+        return sum(self._buckets[(head - i) % self.size] for i in range(count))
+
+
+class EwmaRate:
+    """
+    Exponentially weighted events-per-second, like the Unix load average
+
+    Events are accumulated per ``tick_seconds`` tick and folded into the
+    average when the tick closes. Idle gaps are decayed in closed form,
+    so an update never loops over the elapsed ticks.
+    """
+
+    def __init__(self, window_seconds, tick_seconds=5.0):
+        self.tick = tick_seconds
+        self.alpha = 1.0 - math.exp(-tick_seconds / window_seconds)
+        self.rate = 0.0
+        self._pending = 0
+        self._tick_index = None
+
+    def _advance(self, now):
+        index = int(now // self.tick)
+        if self._tick_index is None:
+            self._tick_index = index
+            return
+        elapsed = index - self._tick_index
+        if elapsed <= 0:
+            return
+        instant = self._pending / self.tick
+        self.rate += self.alpha * (instant - self.rate)
+        if elapsed > 1:
+            self.rate *= (1.0 - self.alpha) ** (elapsed - 1)
+        self._pending = 0
+        self._tick_index = index
+
+    def add(self, now, n=1):
+        self._advance(now)
+        self._pending += n
+
+    def value(self, now):
+        self._advance(now)
+        return self.rate
+
+
+class SlidingWindowStats:
+    """
+    Request and error rates for the inference API
+
+    Keeps one bucketed counter per series plus EWMA rates for every
+    window, all behind one lock. Lifetime totals are kept alongside so
+    callers never need to read prometheus_client internals.
+    """
+
+    WINDOWS = {'1m': 60, '5m': 300, '15m': 900}
+
+    def __init__(self, bucket_seconds=1.0, tick_seconds=5.0, clock=time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        longest = max(self.WINDOWS.values())
+
+        self._requests = SlidingWindowCounter(longest, bucket_seconds)
+        self._errors = SlidingWindowCounter(longest, bucket_seconds)
+        self._request_ewma = {
+            name: EwmaRate(seconds, tick_seconds) for name, seconds in self.WINDOWS.items()
+        }
+        self._error_ewma = {
+            name: EwmaRate(seconds, tick_seconds) for name, seconds in self.WINDOWS.items()
+        }
+        self.total_requests = 0
+        self.total_errors = 0
+
+    def record_request(self):
+        now = self._clock()
+        with self._lock:
+            self.total_requests += 1
+            self._requests.add(now)
+            for ewma in self._request_ewma.values():
+                ewma.add(now)
+
+    def record_error(self):
+        now = self._clock()
+        with self._lock:
+            self.total_errors += 1
+            self._errors.add(now)
+            for ewma in self._error_ewma.values():
+                ewma.add(now)
+
+    def snapshot(self):
+        """
+        Current rates::
+
+            {'requests_per_minute': ..., 'error_rate_percent': ...,
+             'windows': {'1m': {'requests': ..., 'errors': ...,
+                                'error_rate_percent': ...,
+                                'ewma_requests_per_minute': ...,
+                                'ewma_error_rate_percent': ...}, ...}}
+        """
+        now = self._clock()
+        with self._lock:
+            windows = {}
+            for name, seconds in self.WINDOWS.items():
+                requests = self._requests.total(now, seconds)
+                errors = self._errors.total(now, seconds)
+                ewma_requests = self._request_ewma[name].value(now)
+                ewma_errors = self._error_ewma[name].value(now)
+                windows[name] = {
+                    'requests': requests,
+                    'errors': errors,
+                    'error_rate_percent': _percent(errors, requests),
+                    'ewma_requests_per_minute': ewma_requests * 60,
+                    'ewma_error_rate_percent': _percent(ewma_errors, ewma_requests),
+                }
+            return {
+                'total_requests': self.total_requests,
+                'total_errors': self.total_errors,
+                'requests_per_minute': windows['1m']['requests'],
+                'error_rate_percent': _percent(self.total_errors, self.total_requests),
+                'windows': windows,
+            }
+
+
+def _percent(part, whole):
+    if whole <= 0:
+        return 0.0
+    return min(100.0, (part / whole) * 100)
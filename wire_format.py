@@ -0,0 +1,226 @@
+"""
+Wire Format untuk Spam Detection Services
+Content negotiation and encodings for /invocations between the inference
+API and the serving endpoint
+
+  json      application/json (default, what every client understands)
+  msgpack   application/msgpack, the JSON payload in MessagePack (only
+            when the optional msgpack package is installed)
+  columnar  application/vnd.spam-detector.columnar, a fixed binary layout
+            with one array per field (17 bytes per row, stdlib only):
+
+              b'SPW1' | uint32 rows | uint16 n + model_version (utf-8)
+              | uint16 n + timestamp (utf-8) | uint8[rows] label index
+              | float64[rows] p_ham | float64[rows] p_spam
+
+            all little-endian; confidence is max(p_ham, p_spam). A
+            "shape=columnar" Content-Type parameter marks a response to
+            a "format": "columnar" request, decoded back into that shape
+
+The client lists the formats it can decode in Accept and decodes by the
+response Content-Type, so an older serving endpoint that ignores Accept
+simply keeps answering JSON. Large responses are gzip-compressed when the
+client sends Accept-Encoding: gzip.
+"""
+
+import gzip
+import json
+import struct
+
+try:
+    import orjson
+except ImportError:  # optional, falls back to the stdlib decoder
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional, the msgpack format is not offered without it
+    msgpack = None
+
+
+JSON = 'json'
+MSGPACK = 'msgpack'
+COLUMNAR = 'columnar'
+
+MEDIA_TYPES = {
+    JSON: 'application/json',
+    MSGPACK: 'application/msgpack',
+    COLUMNAR: 'application/vnd.spam-detector.columnar',
+}
+# Also accepted in Content-Type / Accept
+_ALIASES = {
+    'application/x-msgpack': MSGPACK,
+}
+
+# Indexed by the label byte of the columnar layout
+LABELS = ('ham', 'spam')
+
+_MAGIC = b'SPW1'
+_HEADER = struct.Struct('<4sI')
+_LENGTH = struct.Struct('<H')
+
+
+def available_formats():
+    """Formats this process can encode and decode, preferred first"""
+    formats = [COLUMNAR]
+    if msgpack is not None:
+        formats.append(MSGPACK)
+    formats.append(JSON)
+    return formats
+
+
+def format_for_media_type(content_type):
+    """Wire format of a Content-Type header value (None if unknown)"""
+    media_type = (content_type or '').split(';', 1)[0].strip().lower()
+    for name, known in MEDIA_TYPES.items():
+        if media_type == known:
+            return name
+    return _ALIASES.get(media_type)
+
+
+def media_type(wire, columnar=False):
+    """Content-Type of an /invocations response body in ``wire``"""
+    if wire == COLUMNAR and columnar:
+        return f"{MEDIA_TYPES[COLUMNAR]}; shape=columnar"
+    return MEDIA_TYPES[wire]
+
+
+def _media_type_param(content_type, name):
+    for param in (content_type or '').split(';')[1:]:
+        key, _, value = param.strip().partition('=')
+        if key.lower() == name:
+            return value.strip().strip('"').lower()
+    return None
+
+
+def negotiate(accept, supported=None):
+    """Best supported format for an Accept header; JSON when nothing matches"""
+    supported = supported or available_formats()
+    best, best_q = JSON, 0.0
+    for position, entry in enumerate((accept or '').split(',')):
+        media_type, _, params = entry.partition(';')
+        name = format_for_media_type(media_type)
+        if name is None or name not in supported:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        # Earlier entries win ties, like most servers
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def accept_header(preferred):
+    """Accept header asking for ``preferred`` with JSON as the fallback"""
+    if preferred == JSON:
+        return MEDIA_TYPES[JSON]
+    return f"{MEDIA_TYPES[preferred]}, {MEDIA_TYPES[JSON]};q=0.5"
+
+
+def accepts_gzip(accept_encoding):
+    for entry in (accept_encoding or '').split(','):
+        coding, _, params = entry.partition(';')
+        if coding.strip().lower() == 'gzip':
+            return 'q=0' not in params.replace(' ', '')
+    return False
+
+
+# ==================================================================
+# ENCODING (serving side)
+# ==================================================================
+
+def encode_columnar(predictions, probabilities, model_version, timestamp):
+    """Columnar binary body from the (predictions, probabilities) arrays of ModelBundle.score"""
+    import numpy as np  # serving side only; decoding needs just struct
+
+    version = str(model_version).encode('utf-8')
+    stamp = timestamp.encode('utf-8')
+    return b''.join((
+        _HEADER.pack(_MAGIC, len(predictions)),
+        _LENGTH.pack(len(version)), version,
+        _LENGTH.pack(len(stamp)), stamp,
+        np.asarray(predictions, dtype=np.uint8).tobytes(),
+        np.ascontiguousarray(probabilities[:, 0], dtype='<f8').tobytes(),
+        np.ascontiguousarray(probabilities[:, 1], dtype='<f8').tobytes(),
+    ))
+
+
+def dumps_json(payload):
+    """Serialize to compact JSON bytes, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+
+def encode_payload(payload, wire):
+    """Serialize a JSON-shaped payload as JSON or msgpack bytes"""
+    if wire == MSGPACK:
+        return msgpack.packb(payload, use_bin_type=True)
+    return dumps_json(payload)
+
+
+def compress(body, level=1):
+    return gzip.compress(body, compresslevel=level)
+
+
+# ==================================================================
+# DECODING (client side)
+# ==================================================================
+
+def decode_columnar(body, columnar=False):
+    """Columnar binary body -> the /invocations JSON payload (records or columnar shape)"""
+    magic, rows = _HEADER.unpack_from(body, 0)
+    if magic != _MAGIC:
+        raise ValueError("Not a columnar wire payload")
+    offset = _HEADER.size
+    (length,) = _LENGTH.unpack_from(body, offset)
+    offset += _LENGTH.size
+    version = body[offset:offset + length].decode('utf-8')
+    offset += length
+    (length,) = _LENGTH.unpack_from(body, offset)
+    offset += _LENGTH.size
+    timestamp = body[offset:offset + length].decode('utf-8')
+    offset += length
+
+    labels = [LABELS[index] for index in body[offset:offset + rows]]
+    offset += rows
+    ham = struct.unpack_from(f'<{rows}d', body, offset)
+    spam = struct.unpack_from(f'<{rows}d', body, offset + 8 * rows)
+
+    if columnar:
+        predictions = {
+            'prediction': labels,
+            'confidence': [max(h, s) for h, s in zip(ham, spam)],
+            'probability_ham': list(ham),
+            'probability_spam': list(spam),
+        }
+    else:
+        predictions = [
+            {
+                'prediction': label,
+                'confidence': h if h > s else s,
+                'probabilities': {'ham': h, 'spam': s}
+            }
+            for label, h, s in zip(labels, ham, spam)
+        ]
+    return {'predictions': predictions, 'model_version': version, 'timestamp': timestamp}
+
+
+def decode_body(body, content_type):
+    """Decode a request or response body by its Content-Type (JSON when unknown)"""
+    wire = format_for_media_type(content_type)
+    if wire == COLUMNAR:
+        return decode_columnar(body, columnar=_media_type_param(content_type, 'shape') == 'columnar')
+    if wire == MSGPACK:
+        if msgpack is None:
+            raise ValueError("msgpack payload received but msgpack is not installed")
+        return msgpack.unpackb(body, raw=False)
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)